@@ -0,0 +1,29 @@
+from __future__ import print_function
+# Microbenchmark of the overhead of calling a C function in ABI mode,
+# i.e. through a function pointer cdata.  The C functions called here
+# do almost nothing, so the time is dominated by cffi itself.
+import sys
+import timeit
+import cffi
+
+ffi = cffi.FFI()
+ffi.cdef("""
+    int abs(int);
+    long labs(long);
+    int memcmp(const void *, const void *, size_t);
+    double ldexp(double, int);
+""")
+if sys.platform == 'win32':
+    C = ffi.dlopen('msvcrt')
+else:
+    C = ffi.dlopen(None)
+
+def bench(name, stmt, number=1000000):
+    namespace = {'C': C, 'ffi': ffi, 'p': ffi.new("char[]", b"abc")}
+    best = min(timeit.repeat(stmt, number=number, repeat=5, globals=namespace))
+    print("%-12s %8.1f ns per call" % (name, best * 1e9 / number))
+
+bench("abs", "C.abs(-42)")
+bench("labs", "C.labs(-42)")
+bench("ldexp", "C.ldexp(1.5, 3)")
+bench("memcmp", "C.memcmp(p, p, 3)")
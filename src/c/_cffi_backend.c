@@ -204,6 +204,10 @@
 # define USE_WRITEUNRAISABLEMSG
 #endif
 
+#if PY_VERSION_HEX >= 0x03090000
+# define CFFI_USE_VECTORCALL
+#endif
+
 /************************************************************/
 
 /* base type flag: exactly one of the following: */
@@ -253,6 +257,8 @@ typedef struct _ctypedescr {
     void *ct_extra;                    /* structs: first field (not a ref!)
                                           function types: cif_description
                                           primitives: prebuilt "cif" object */
+    struct varcif_cache_s *ct_varcif_cache;  /* functions with '...': lazily,
+                                                cache of cif_descriptions */
 
     PyObject *ct_weakreflist;    /* weakref support */
 
@@ -274,8 +280,35 @@ typedef struct {
     CTypeDescrObject *c_type;
     char *c_data;
     PyObject *c_weakreflist;
+#ifdef CFFI_USE_VECTORCALL
+    vectorcallfunc c_vectorcall;    /* non-NULL only for function pointers */
+#endif
 } CDataObject;
 
+#ifdef CFFI_USE_VECTORCALL
+static PyObject *cdata_vectorcall(PyObject *, PyObject *const *, size_t,
+                                  PyObject *);
+static PyObject *cdata_vectorcall_keepgil(PyObject *, PyObject *const *,
+                                          size_t, PyObject *);
+# define CDATA_SET_VECTORCALL(cd)                                       \
+    ((cd)->c_vectorcall = ((cd)->c_type->ct_flags & CT_FUNCTIONPTR) ?   \
+                          cdata_vectorcall : NULL)
+/* function pointers loaded with load_function(..., release_gil=False)
+   are called without releasing the GIL and without saving errno */
+# define CDATA_SET_KEEPGIL(cd)                                          \
+    ((cd)->c_vectorcall = cdata_vectorcall_keepgil)
+# define CDATA_RELEASES_GIL(cd)                                         \
+    ((cd)->c_vectorcall != cdata_vectorcall_keepgil)
+# define CDATA_VECTORCALL_OFFSET   offsetof(CDataObject, c_vectorcall)
+# define CDATA_TPFLAGS_VECTORCALL  Py_TPFLAGS_HAVE_VECTORCALL
+#else
+# define CDATA_SET_VECTORCALL(cd)  /* nothing */
+# define CDATA_SET_KEEPGIL(cd)     /* nothing: always release the GIL */
+# define CDATA_RELEASES_GIL(cd)    1
+# define CDATA_VECTORCALL_OFFSET   0
+# define CDATA_TPFLAGS_VECTORCALL  0
+#endif
+
 typedef struct cfieldobject_s {
     PyObject_HEAD
     CTypeDescrObject *cf_type;
@@ -349,6 +382,8 @@ typedef struct {
     Py_ssize_t length;     /* same as CDataObject_own_length up to here */
     PyObject *origobj;
     PyObject *destructor;
+    Py_ssize_t external_size;    /* the 'size' argument to ffi.gc() */
+    int deferred;                /* ffi.gc(..., deferred=True) */
 } CDataObject_gcp;
 
 typedef struct {
@@ -359,7 +394,7 @@ typedef struct {
 typedef struct {
     ffi_cif cif;
     /* the following information is used when doing the call:
-       - a buffer of size 'exchange_size' is malloced
+       - a buffer of size 'exchange_size' is malloced (or on the stack)
        - the arguments are converted from Python objects to raw data
        - the i'th raw data is stored at 'buffer + exchange_offset_arg[1+i]'
        - the call is done
@@ -368,6 +403,111 @@ typedef struct {
     Py_ssize_t exchange_offset_arg[1];
 } cif_description_t;
 
+/* Calls to a function with '...' need a cif_description built from the
+   actual types passed in.  We keep the most recently used ones in a small
+   cache attached to the function type, keyed by the tuple of all argument
+   ctypes (which are unique, so they are compared by identity).  An entry
+   is removed from the cache while a call uses it, and put back at the
+   front afterwards; this is needed because the GIL is released during
+   the call, and another thread might otherwise evict and free it. */
+#define VARCIF_CACHE_SIZE   8
+
+struct varcif_cache_s {
+    int vc_count;
+    struct {
+        PyObject *key;                  /* tuple of all argument ctypes */
+        cif_description_t *cif_descr;
+    } vc_entries[VARCIF_CACHE_SIZE];    /* most recently used first */
+};
+
+static int varcif_key_equal(PyObject *key1, PyObject *key2)
+{
+    Py_ssize_t i, n = PyTuple_GET_SIZE(key1);
+    if (PyTuple_GET_SIZE(key2) != n)
+        return 0;
+    for (i = 0; i < n; i++)
+        if (PyTuple_GET_ITEM(key1, i) != PyTuple_GET_ITEM(key2, i))
+            return 0;
+    return 1;
+}
+
+static cif_description_t *varcif_cache_take(CTypeDescrObject *ct,
+                                            PyObject *key)
+{
+    /* returns a cif_description for the argument ctypes 'key' and
+       removes it from the cache, or returns NULL if not found */
+    struct varcif_cache_s *cache = ct->ct_varcif_cache;
+    cif_description_t *cif_descr;
+    int i;
+
+    if (cache == NULL)
+        return NULL;
+    for (i = 0; i < cache->vc_count; i++) {
+        if (varcif_key_equal(cache->vc_entries[i].key, key)) {
+            cif_descr = cache->vc_entries[i].cif_descr;
+            Py_DECREF(cache->vc_entries[i].key);
+            cache->vc_count--;
+            memmove(&cache->vc_entries[i], &cache->vc_entries[i + 1],
+                    (cache->vc_count - i) * sizeof(cache->vc_entries[0]));
+            return cif_descr;
+        }
+    }
+    return NULL;
+}
+
+static void varcif_cache_give(CTypeDescrObject *ct, PyObject *key,
+                              cif_description_t *cif_descr)
+{
+    /* puts 'cif_descr' in the cache, in front, possibly evicting the
+       least recently used entry.  Takes ownership of 'cif_descr'. */
+    struct varcif_cache_s *cache = ct->ct_varcif_cache;
+    PyObject *evicted_key = NULL;
+    int i;
+
+    if (cache == NULL) {
+        cache = PyMem_Malloc(sizeof(struct varcif_cache_s));
+        if (cache == NULL) {
+            PyObject_Free(cif_descr);     /* no cache, no error either */
+            return;
+        }
+        cache->vc_count = 0;
+        ct->ct_varcif_cache = cache;
+    }
+    for (i = 0; i < cache->vc_count; i++) {
+        if (varcif_key_equal(cache->vc_entries[i].key, key)) {
+            /* already put back by a concurrent or reentrant call */
+            PyObject_Free(cif_descr);
+            return;
+        }
+    }
+    if (cache->vc_count == VARCIF_CACHE_SIZE) {
+        cache->vc_count--;
+        evicted_key = cache->vc_entries[cache->vc_count].key;
+        PyObject_Free(cache->vc_entries[cache->vc_count].cif_descr);
+    }
+    memmove(&cache->vc_entries[1], &cache->vc_entries[0],
+            cache->vc_count * sizeof(cache->vc_entries[0]));
+    Py_INCREF(key);
+    cache->vc_entries[0].key = key;
+    cache->vc_entries[0].cif_descr = cif_descr;
+    cache->vc_count++;
+    Py_XDECREF(evicted_key);    /* last, when the cache is consistent */
+}
+
+static void varcif_cache_clear(CTypeDescrObject *ct)
+{
+    struct varcif_cache_s *cache = ct->ct_varcif_cache;
+    if (cache != NULL) {
+        ct->ct_varcif_cache = NULL;
+        while (cache->vc_count > 0) {
+            cache->vc_count--;
+            Py_DECREF(cache->vc_entries[cache->vc_count].key);
+            PyObject_Free(cache->vc_entries[cache->vc_count].cif_descr);
+        }
+        PyMem_Free(cache);
+    }
+}
+
 #define ADD_WRAPAROUND(x, y)  ((Py_ssize_t)(((size_t)(x)) + ((size_t)(y))))
 #define MUL_WRAPAROUND(x, y)  ((Py_ssize_t)(((size_t)(x)) * ((size_t)(y))))
 
@@ -392,11 +532,17 @@ typedef struct {
 
 #include "../cffi/_cffi_errors.h"
 
+typedef struct ArenaObject_s ArenaObject;   /* forward, in arena.c */
+
 typedef struct _cffi_allocator_s {
     PyObject *ca_alloc, *ca_free;
     int ca_dont_clear;
+    ArenaObject *ca_arena;
+    void *(*ca_c_alloc)(size_t);   /* set if 'alloc' and 'free' are
+                                      C functions, called directly */
 } cffi_allocator_t;
-static const cffi_allocator_t default_allocator = { NULL, NULL, 0 };
+static const cffi_allocator_t default_allocator = { NULL, NULL, 0, NULL,
+                                                     NULL };
 static PyObject *FFIError;
 static PyObject *unique_cache;
 
@@ -415,6 +561,7 @@ ctypedescr_new(int name_size)
     ct->ct_stuff = NULL;
     ct->ct_weakreflist = NULL;
     ct->ct_unique_key = NULL;
+    ct->ct_varcif_cache = NULL;
     PyObject_GC_Track(ct);
     return ct;
 }
@@ -468,8 +615,10 @@ ctypedescr_dealloc(CTypeDescrObject *ct)
     }
     Py_XDECREF(ct->ct_itemdescr);
     Py_XDECREF(ct->ct_stuff);
-    if (ct->ct_flags & CT_FUNCTIONPTR)
+    if (ct->ct_flags & CT_FUNCTIONPTR) {
         PyObject_Free(ct->ct_extra);
+        varcif_cache_clear(ct);
+    }
     Py_TYPE(ct)->tp_free((PyObject *)ct);
 }
 
@@ -478,6 +627,11 @@ ctypedescr_traverse(CTypeDescrObject *ct, visitproc visit, void *arg)
 {
     Py_VISIT(ct->ct_itemdescr);
     Py_VISIT(ct->ct_stuff);
+    if (ct->ct_varcif_cache != NULL) {
+        int i;
+        for (i = 0; i < ct->ct_varcif_cache->vc_count; i++)
+            Py_VISIT(ct->ct_varcif_cache->vc_entries[i].key);
+    }
     return 0;
 }
 
@@ -486,6 +640,7 @@ ctypedescr_clear(CTypeDescrObject *ct)
 {
     Py_CLEAR(ct->ct_itemdescr);
     Py_CLEAR(ct->ct_stuff);
+    varcif_cache_clear(ct);
     return 0;
 }
 
@@ -1062,6 +1217,7 @@ new_simple_cdata(char *data, CTypeDescrObject *ct)
     cd->c_data = data;
     cd->c_type = ct;
     cd->c_weakreflist = NULL;
+    CDATA_SET_VECTORCALL(cd);
     return (PyObject *)cd;
 }
 
@@ -1078,6 +1234,7 @@ new_sized_cdata(char *data, CTypeDescrObject *ct, Py_ssize_t length)
     scd->head.c_type = ct;
     scd->head.c_data = data;
     scd->head.c_weakreflist = NULL;
+    CDATA_SET_VECTORCALL(&scd->head);
     scd->length = length;
     return (PyObject *)scd;
 }
@@ -1474,6 +1631,87 @@ get_array_length(CDataObject *cd)
         return cd->c_type->ct_length;
 }
 
+static int
+convert_primitive_array_from_list(char *data, CTypeDescrObject *ctitem,
+                                  PyObject **items, Py_ssize_t n)
+{
+    /* Fast paths for convert_array_from_object() of a list or tuple into
+       an array of integers, floats or doubles, with one loop per kind of
+       item.  Exact ints and floats that fit are written directly; any
+       other item goes through the general convert_from_object().
+       Returns 1 if 'ctitem' or the alignment of 'data' is not handled
+       here; otherwise returns 0, or -1 if an error occurred. */
+    Py_ssize_t i;
+    PyObject *x;
+
+    if (!(ctitem->ct_flags & (CT_PRIMITIVE_SIGNED | CT_PRIMITIVE_UNSIGNED |
+                              CT_PRIMITIVE_FLOAT)) ||
+            (ctitem->ct_flags & CT_IS_LONGDOUBLE))
+        return 1;
+    if ((((uintptr_t)data) & (ctitem->ct_length - 1)) != 0 ||
+            (ctitem->ct_length & (ctitem->ct_length - 1)) != 0)
+        return 1;    /* unaligned: use the general path */
+
+#define _FAST_LOOP(type, fast_check, fast_value)                        \
+    for (i = 0; i < n; i++, data += sizeof(type)) {                     \
+        x = items[i];                                                   \
+        if (fast_check)                                                 \
+            *(type *)data = (type)(fast_value);                         \
+        else if (convert_from_object(data, ctitem, x) < 0)              \
+            return -1;                                                  \
+    }                                                                   \
+    return 0
+
+#define _FAST_INT_LOOP(type, is_signed)                                 \
+    for (i = 0; i < n; i++, data += sizeof(type)) {                     \
+        x = items[i];                                                   \
+        if (PyLong_CheckExact(x)) {                                     \
+            int overflow;                                               \
+            PY_LONG_LONG value = PyLong_AsLongLongAndOverflow(x, &overflow);\
+            if (!overflow && (is_signed || value >= 0) &&               \
+                    (PY_LONG_LONG)(type)value == value) {               \
+                *(type *)data = (type)value;                            \
+                continue;                                               \
+            }                                                           \
+        }                                                               \
+        if (convert_from_object(data, ctitem, x) < 0)                   \
+            return -1;                                                  \
+    }                                                                   \
+    return 0
+
+    if (ctitem->ct_flags & CT_IS_BOOL) {
+        _FAST_LOOP(unsigned char, x == Py_True || x == Py_False,
+                   x == Py_True);
+    }
+    else if (ctitem->ct_flags & CT_PRIMITIVE_SIGNED) {
+        switch (ctitem->ct_size) {
+        case 1: _FAST_INT_LOOP(int8_t, 1);
+        case 2: _FAST_INT_LOOP(int16_t, 1);
+        case 4: _FAST_INT_LOOP(int32_t, 1);
+        case 8: _FAST_INT_LOOP(int64_t, 1);
+        }
+    }
+    else if (ctitem->ct_flags & CT_PRIMITIVE_UNSIGNED) {
+        switch (ctitem->ct_size) {
+        case 1: _FAST_INT_LOOP(uint8_t, 0);
+        case 2: _FAST_INT_LOOP(uint16_t, 0);
+        case 4: _FAST_INT_LOOP(uint32_t, 0);
+        case 8: _FAST_INT_LOOP(uint64_t, 0);
+        }
+    }
+    else {
+        switch (ctitem->ct_size) {
+        case sizeof(float):
+            _FAST_LOOP(float, PyFloat_CheckExact(x), PyFloat_AS_DOUBLE(x));
+        case sizeof(double):
+            _FAST_LOOP(double, PyFloat_CheckExact(x), PyFloat_AS_DOUBLE(x));
+        }
+    }
+#undef _FAST_INT_LOOP
+#undef _FAST_LOOP
+    return 1;
+}
+
 static int
 convert_array_from_object(char *data, CTypeDescrObject *ct, PyObject *init)
 {
@@ -1494,6 +1732,12 @@ convert_array_from_object(char *data, CTypeDescrObject *ct, PyObject *init)
             return -1;
         }
         items = PySequence_Fast_ITEMS(init);
+        if (ctitem->ct_flags & CT_PRIMITIVE_ANY) {
+            int res = convert_primitive_array_from_list(data, ctitem,
+                                                        items, n);
+            if (res <= 0)
+                return res;
+        }
         for (i=0; i<n; i++) {
             if (convert_from_object(data, ctitem, items[i]) < 0)
                 return -1;
@@ -1906,6 +2150,107 @@ get_alignment(CTypeDescrObject *ct)
     return align;
 }
 
+/* Free lists for the small objects of type CDataOwning_Type, i.e. the
+   ones from ffi.new() whose size depends only on their ctype: they are
+   kept in one free list per size class (multiples of 16 bytes) instead
+   of being given back to free(), up to 'owning_fl_limit' per class. */
+#define OWNING_FL_STEP         16
+#define OWNING_FL_CLASSES      16     /* objects up to 256 bytes */
+#define OWNING_FL_DEFAULT_LIMIT  256
+
+static void *owning_fl_heads[OWNING_FL_CLASSES];
+static Py_ssize_t owning_fl_counts[OWNING_FL_CLASSES];
+static Py_ssize_t owning_fl_limit = OWNING_FL_DEFAULT_LIMIT;
+static Py_ssize_t owning_fl_hits, owning_fl_misses;
+
+static Py_ssize_t owning_fixed_size(CTypeDescrObject *ct)
+{
+    /* Returns the size of the CDataOwning_Type objects of the ctype 'ct',
+       as allocated by direct_newp() or convert_struct_to_owning_object(),
+       or -1 if it depends on the length of the object */
+    Py_ssize_t size;
+    if (ct->ct_flags & CT_IS_PTR_TO_OWNED)
+        return sizeof(CDataObject_own_structptr);
+    if (ct->ct_flags & CT_POINTER) {
+        size = ct->ct_itemdescr->ct_size;
+        if (size < 0)
+            return -1;
+        if (ct->ct_itemdescr->ct_flags & CT_PRIMITIVE_CHAR)
+            size *= 2;
+    }
+    else if (ct->ct_flags & (CT_ARRAY | CT_STRUCT | CT_UNION)) {
+        if (ct->ct_size < 0 || (ct->ct_flags & CT_WITH_VAR_ARRAY))
+            return -1;
+        size = ct->ct_size;
+    }
+    else
+        return -1;
+    return offsetof(CDataObject_own_nolength, alignment) + size;
+}
+
+static int owning_fl_class(Py_ssize_t size)
+{
+    /* the size class, or -1 if there is none */
+    if (size <= 0 || size > OWNING_FL_STEP * OWNING_FL_CLASSES)
+        return -1;
+    return (int)((size - 1) / OWNING_FL_STEP);
+}
+
+static void *owning_fl_malloc(Py_ssize_t size, int dont_clear)
+{
+    int cls = owning_fl_class(size);
+    void *p;
+
+    if (cls < 0)
+        return dont_clear ? malloc(size) : calloc(size, 1);
+
+    p = owning_fl_heads[cls];
+    if (p != NULL) {
+        owning_fl_heads[cls] = *(void **)p;
+        owning_fl_counts[cls]--;
+        owning_fl_hits++;
+        if (!dont_clear)
+            memset(p, 0, size);
+        return p;
+    }
+    owning_fl_misses++;
+    /* allocate the full size class, so that the block can be reused
+       for any object of the same class */
+    size = (cls + 1) * OWNING_FL_STEP;
+    return dont_clear ? malloc(size) : calloc(size, 1);
+}
+
+static int owning_fl_free(void *p, Py_ssize_t size)
+{
+    /* Returns 1 if 'p' was stored in a free list, or 0 if it still
+       needs to be freed */
+    int cls = owning_fl_class(size);
+    if (cls < 0 || owning_fl_counts[cls] >= owning_fl_limit)
+        return 0;
+    *(void **)p = owning_fl_heads[cls];
+    owning_fl_heads[cls] = p;
+    owning_fl_counts[cls]++;
+    return 1;
+}
+
+static Py_ssize_t owning_fl_trim(void)
+{
+    Py_ssize_t total = 0;
+    int cls;
+    for (cls = 0; cls < OWNING_FL_CLASSES; cls++) {
+        void *p = owning_fl_heads[cls];
+        while (p != NULL) {
+            void *next = *(void **)p;
+            free(p);
+            p = next;
+            total++;
+        }
+        owning_fl_heads[cls] = NULL;
+        owning_fl_counts[cls] = 0;
+    }
+    return total;
+}
+
 static void cdata_dealloc(CDataObject *cd)
 {
     if (cd->c_weakreflist != NULL)
@@ -1937,10 +2282,26 @@ static void cdataowning_dealloc(CDataObject *cd)
         assert(x >= 0);
         memset(cd->c_data, 0xDD, x);
     }
+#endif
+#ifndef CFFI_MEM_LEAK
+    {
+        Py_ssize_t size = owning_fixed_size(cd->c_type);
+        if (size >= 0) {
+            if (cd->c_weakreflist != NULL)
+                PyObject_ClearWeakRefs((PyObject *) cd);
+            Py_DECREF(cd->c_type);
+            if (!owning_fl_free(cd, size))
+                free(cd);
+            return;
+        }
+    }
 #endif
     cdata_dealloc(cd);
 }
 
+static int cbfactory_recycle(PyObject *factory, ffi_closure *closure,
+                             char *fnptr);   /* forward, in callback_factory.c */
+
 static void cdataowninggc_dealloc(CDataObject *cd)
 {
     PyObject_GC_UnTrack(cd);
@@ -1952,13 +2313,22 @@ static void cdataowninggc_dealloc(CDataObject *cd)
     else if (cd->c_type->ct_flags & CT_FUNCTIONPTR) {   /* a callback */
         ffi_closure *closure = ((CDataObject_closure *)cd)->closure;
         PyObject *args = (PyObject *)(closure->user_data);
+        if (args != NULL && PyTuple_GET_SIZE(args) > 4 &&
+                cbfactory_recycle(PyTuple_GET_ITEM(args, 4), closure,
+                                  cd->c_data) == 0) {
+            /* the closure was put back into the pool of the
+               ffi.callback_factory() that made it */
+            closure = NULL;
+        }
         Py_XDECREF(args);
+        if (closure != NULL) {
 #if CFFI_CHECK_FFI_CLOSURE_ALLOC_MAYBE
-        if (CFFI_CHECK_FFI_CLOSURE_ALLOC) {
-            ffi_closure_free(closure);
-        } else
+            if (CFFI_CHECK_FFI_CLOSURE_ALLOC) {
+                ffi_closure_free(closure);
+            } else
 #endif
-            cffi_closure_free(closure);
+                cffi_closure_free(closure);
+        }
     }
     else {
         Py_FatalError("cdata CDataOwningGC_Type with unexpected type flags");
@@ -2028,11 +2398,17 @@ static void _my_PyErr_WriteUnraisable(PyObject *t, PyObject *v, PyObject *tb,
                                       char *extra_error_line);
 
 
-static void gcp_finalize(PyObject *destructor, PyObject *origobj)
+static void gcp_finalize(PyObject *destructor, PyObject *origobj, char *data)
 {
     /* NOTE: this decrements the reference count of the two arguments */
 
-    if (destructor != NULL) {
+    if (origobj == NULL && destructor != NULL) {
+        /* ffi.new_allocator() with C functions: 'destructor' is the
+           cdata of the C 'free' function, called directly on 'data' */
+        ((void(*)(void *))((CDataObject *)destructor)->c_data)(data);
+        Py_DECREF(destructor);
+    }
+    else if (destructor != NULL) {
         PyObject *result;
         PyObject *error_type, *error_value, *error_traceback;
 
@@ -2062,23 +2438,111 @@ static void gcp_finalize(PyObject *destructor, PyObject *origobj)
     Py_XDECREF(origobj);
 }
 
+/* Accounting of the external memory declared with ffi.gc(..., size=n).
+   When it grows by more than 'gcp_external_threshold' bytes since the
+   last collection, a full collection is scheduled with
+   Py_AddPendingCall(), in order to free earlier the cycles that keep
+   such cdata objects alive. */
+#define GCP_EXTERNAL_DEFAULT_THRESHOLD  (64 * 1024 * 1024)
+
+static Py_ssize_t gcp_external_bytes;
+static Py_ssize_t gcp_external_bytes_at_collect;
+static Py_ssize_t gcp_external_threshold = GCP_EXTERNAL_DEFAULT_THRESHOLD;
+static Py_ssize_t gcp_external_collections;
+static int gcp_external_collect_pending;
+
+static int gcp_external_collect(void *arg)
+{
+    gcp_external_collect_pending = 0;
+    gcp_external_collections++;
+    PyGC_Collect();
+    gcp_external_bytes_at_collect = gcp_external_bytes;
+    return 0;
+}
+
+static void gcp_external_add(CDataObject_gcp *cd, Py_ssize_t size)
+{
+    if (size <= 0)
+        return;
+    cd->external_size = size;
+    gcp_external_bytes += size;
+    if (gcp_external_threshold > 0 && !gcp_external_collect_pending &&
+            gcp_external_bytes - gcp_external_bytes_at_collect >=
+                gcp_external_threshold) {
+        if (Py_AddPendingCall(gcp_external_collect, NULL) == 0)
+            gcp_external_collect_pending = 1;
+    }
+}
+
+static void gcp_external_remove(CDataObject_gcp *cd)
+{
+    gcp_external_bytes -= cd->external_size;
+    if (gcp_external_bytes_at_collect > gcp_external_bytes)
+        gcp_external_bytes_at_collect = gcp_external_bytes;
+    cd->external_size = 0;
+}
+
+/* The queue of the destructors of ffi.gc(..., deferred=True): a list
+   of (destructor, origobj) tuples, in the order in which the objects
+   died, emptied by ffi.drain_destructors(). */
+static PyObject *gcp_deferred_queue;
+
+static int gcp_defer(CDataObject_gcp *cd, PyObject *destructor,
+                     PyObject *origobj)
+{
+    /* If 'cd' is deferred, queue the call to the destructor and return
+       1, stealing the references to 'destructor' and 'origobj'.  If it
+       is not, or if queuing fails, return 0. */
+    PyObject *error_type, *error_value, *error_traceback;
+    PyObject *item;
+    int res = -1;
+
+    if (!cd->deferred || destructor == NULL || origobj == NULL)
+        return 0;
+
+    PyErr_Fetch(&error_type, &error_value, &error_traceback);
+    if (gcp_deferred_queue == NULL)
+        gcp_deferred_queue = PyList_New(0);
+    if (gcp_deferred_queue != NULL) {
+        item = PyTuple_Pack(2, destructor, origobj);
+        if (item != NULL) {
+            res = PyList_Append(gcp_deferred_queue, item);
+            Py_DECREF(item);
+        }
+    }
+    PyErr_Clear();
+    PyErr_Restore(error_type, error_value, error_traceback);
+    if (res < 0)
+        return 0;     /* call it now */
+    Py_DECREF(destructor);
+    Py_DECREF(origobj);
+    return 1;
+}
+
 static void cdatagcp_finalize(CDataObject_gcp *cd)
 {
     PyObject *destructor = cd->destructor;
     PyObject *origobj = cd->origobj;
     cd->destructor = NULL;
     cd->origobj = NULL;
-    gcp_finalize(destructor, origobj);
+    gcp_external_remove(cd);
+    /* explicit release: the destructor is called now even if deferred */
+    gcp_finalize(destructor, origobj, cd->head.c_data);
 }
 
 static void cdatagcp_dealloc(CDataObject_gcp *cd)
 {
     PyObject *destructor = cd->destructor;
     PyObject *origobj = cd->origobj;
+    char *data = cd->head.c_data;
+    int deferred;
     PyObject_GC_UnTrack(cd);
+    gcp_external_remove(cd);
+    deferred = gcp_defer(cd, destructor, origobj);
     cdata_dealloc((CDataObject *)cd);
 
-    gcp_finalize(destructor, origobj);
+    if (!deferred)
+        gcp_finalize(destructor, origobj, data);
 }
 
 static int cdatagcp_traverse(CDataObject_gcp *cd, visitproc visit, void *arg)
@@ -2982,9 +3446,79 @@ static CTypeDescrObject *_get_ct_int(void)
     return ct_int;
 }
 
+static const char *_primitive_struct_format(CTypeDescrObject *ct)
+{
+    /* return the native struct-module format character for the
+       primitive type 'ct', or NULL if there is none */
+    Py_ssize_t size = ct->ct_size;
+
+    if (ct->ct_flags & CT_IS_BOOL)
+        return "?";
+    if (ct->ct_flags & CT_PRIMITIVE_SIGNED) {
+        if (size == sizeof(signed char))  return "b";
+        if (size == sizeof(short))        return "h";
+        if (size == sizeof(int))          return "i";
+        if (size == sizeof(long))         return "l";
+        if (size == sizeof(PY_LONG_LONG)) return "q";
+    }
+    else if (ct->ct_flags & CT_PRIMITIVE_UNSIGNED) {
+        if (size == sizeof(unsigned char))  return "B";
+        if (size == sizeof(unsigned short)) return "H";
+        if (size == sizeof(unsigned int))   return "I";
+        if (size == sizeof(unsigned long))  return "L";
+        if (size == sizeof(unsigned PY_LONG_LONG)) return "Q";
+    }
+    else if (ct->ct_flags & CT_PRIMITIVE_FLOAT) {
+        if (ct->ct_flags & CT_IS_LONGDOUBLE)
+            return NULL;
+        if (size == sizeof(float))  return "f";
+        if (size == sizeof(double)) return "d";
+    }
+    else if (ct->ct_flags & CT_PRIMITIVE_CHAR) {
+        if (size == sizeof(char))   return "c";
+    }
+    return NULL;
+}
+
+static int _buffer_format_matches(CTypeDescrObject *ctitem, Py_buffer *view)
+{
+    /* check that the items of the buffer 'view' are of the C type
+       'ctitem', as far as the PEP 3118 format allows us to tell.
+       Only native formats of primitive types are recognized. */
+    const char *fmt = view->format;
+
+    if (ctitem->ct_flags & CT_VOID)
+        return 1;     /* 'void *': any buffer */
+    if (view->itemsize != ctitem->ct_size)
+        return 0;
+    if (fmt == NULL)
+        fmt = "B";
+    if (*fmt == '@')
+        fmt++;
+    if (fmt[0] == 0 || fmt[1] != 0)
+        return 0;
+
+    if (ctitem->ct_flags & CT_IS_BOOL)
+        return fmt[0] == '?';
+    if (ctitem->ct_size == 1 &&
+            (ctitem->ct_flags & (CT_PRIMITIVE_SIGNED | CT_PRIMITIVE_UNSIGNED |
+                                 CT_PRIMITIVE_CHAR)))
+        return strchr("bBc", fmt[0]) != NULL;
+    if (ctitem->ct_flags & CT_PRIMITIVE_SIGNED)
+        return strchr("hilqn", fmt[0]) != NULL;
+    if (ctitem->ct_flags & CT_PRIMITIVE_UNSIGNED)
+        return strchr("HILQN", fmt[0]) != NULL;
+    if (ctitem->ct_flags & CT_PRIMITIVE_FLOAT) {
+        if (ctitem->ct_flags & CT_IS_LONGDOUBLE)
+            return fmt[0] == 'g';
+        return fmt[0] == (ctitem->ct_size == sizeof(float) ? 'f' : 'd');
+    }
+    return 0;
+}
+
 static Py_ssize_t
-_prepare_pointer_call_argument(CTypeDescrObject *ctptr, PyObject *init,
-                               char **output_data)
+_prepare_pointer_call_argument_ex(CTypeDescrObject *ctptr, PyObject *init,
+                                  char **output_data, Py_buffer **pview)
 {
     /* 'ctptr' is here a pointer type 'ITEM *'.  Accept as argument an
        initializer for an array 'ITEM[]'.  This includes the case of
@@ -2993,6 +3527,11 @@ _prepare_pointer_call_argument(CTypeDescrObject *ctptr, PyObject *init,
        This function returns -1 if an error occurred,
        0 if conversion succeeded (into *output_data),
        or N > 0 if conversion would require N bytes of storage.
+
+       If 'pview' is not NULL, objects with the buffer interface are
+       accepted too.  In that case, '*pview' is set to a newly allocated
+       Py_buffer, which the caller must release and free only after the
+       call; it is left NULL in all other cases.
     */
     Py_ssize_t length, datasize;
     CTypeDescrObject *ctitem;
@@ -3039,6 +3578,37 @@ _prepare_pointer_call_argument(CTypeDescrObject *ctptr, PyObject *init,
             return -1;
         return 0;
     }
+    else if (pview != NULL && PyObject_CheckBuffer(init)) {
+        /* from an object with the buffer interface, like an array.array
+           or a numpy array: pass the address of its data, without copy.
+           The buffer stays exported until the caller releases it after
+           the call, so that the object cannot be resized or closed by
+           another thread in the meantime. */
+        Py_buffer *view = PyObject_Malloc(sizeof(Py_buffer));
+        if (view == NULL) {
+            PyErr_NoMemory();
+            return -1;
+        }
+        if (PyObject_GetBuffer(init, view,
+                               PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0) {
+            PyObject_Free(view);
+            return -1;
+        }
+        if (!_buffer_format_matches(ctitem, view)) {
+            PyErr_Format(PyExc_TypeError,
+                         "initializer for ctype '%s': buffer of format "
+                         "'%.40s' and itemsize %zd does not match",
+                         ctptr->ct_name,
+                         view->format != NULL ? view->format : "B",
+                         view->itemsize);
+            PyBuffer_Release(view);
+            PyObject_Free(view);
+            return -1;
+        }
+        *output_data = (char *)view->buf;
+        *pview = view;
+        return 0;
+    }
     else {
         /* refuse to receive just an integer (and interpret it
            as the array size) */
@@ -3061,21 +3631,64 @@ _prepare_pointer_call_argument(CTypeDescrObject *ctptr, PyObject *init,
     return convert_from_object((char *)output_data, ctptr, init);
 }
 
+static Py_ssize_t
+_prepare_pointer_call_argument(CTypeDescrObject *ctptr, PyObject *init,
+                               char **output_data)
+{
+    /* for the API-mode modules generated by older versions of cffi:
+       they cannot keep a buffer exported until the call returns, so
+       buffer objects are refused */
+    return _prepare_pointer_call_argument_ex(ctptr, init, output_data, NULL);
+}
+
+static PyObject *_cdata_from_buffer_view(CTypeDescrObject *ct,
+                                         Py_buffer *view,
+                                         Py_ssize_t length);  /* forward */
+
+static Py_ssize_t
+_prepare_pointer_call_argument_keepalive(CTypeDescrObject *ctptr,
+                                         PyObject *init, char **output_data,
+                                         PyObject **keepalive)
+{
+    /* for the API-mode modules: like _prepare_pointer_call_argument_ex(),
+       but a buffer is returned in '*keepalive' as a cdata object that
+       owns it.  The caller releases it with Py_DECREF after the call. */
+    Py_buffer *view = NULL;
+    Py_ssize_t datasize = _prepare_pointer_call_argument_ex(ctptr, init,
+                                                            output_data,
+                                                            &view);
+    if (view != NULL) {
+        *keepalive = _cdata_from_buffer_view(ctptr, view, view->len);
+        if (*keepalive == NULL)
+            return -1;
+    }
+    return datasize;
+}
+
+#define CFFI_CALL_SMALL_BUFFER   256
+
 static PyObject*
-cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
+cdata_call_args(CDataObject *cd, PyObject *const *args, Py_ssize_t nargs,
+                int release_gil)
 {
+    /* common part of cdata_call() and cdata_vectorcall(): call the
+       function pointer 'cd' with the 'nargs' arguments in 'args' */
     char *buffer;
     void** buffer_array;
     cif_description_t *cif_descr;
-    Py_ssize_t i, nargs, nargs_declared;
+    Py_ssize_t i, nargs_declared;
     PyObject *signature, *res = NULL, *fvarargs;
     CTypeDescrObject *fresult;
     char *resultdata;
     char *errormsg;
     struct freeme_s {
         struct freeme_s *next;
+        Py_buffer *view;      /* if not NULL, a buffer to release */
         union_alignment alignment;
     } *freeme = NULL;
+    /* most functions have a small enough 'exchange_size' to use this */
+    union_alignment small_buffer[CFFI_CALL_SMALL_BUFFER /
+                                 sizeof(union_alignment)];
 
     if (!(cd->c_type->ct_flags & CT_FUNCTIONPTR)) {
         PyErr_Format(PyExc_TypeError, "cdata '%s' is not callable",
@@ -3088,15 +3701,7 @@ cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
                      cd->c_type->ct_name);
         return NULL;
     }
-    if (kwds != NULL && PyDict_Size(kwds) != 0) {
-        PyErr_SetString(PyExc_TypeError,
-                "a cdata function cannot be called with keyword arguments");
-        return NULL;
-    }
     signature = cd->c_type->ct_stuff;
-    nargs = PyTuple_Size(args);
-    if (nargs < 0)
-        return NULL;
     nargs_declared = PyTuple_GET_SIZE(signature) - 2;
     fresult = (CTypeDescrObject *)PyTuple_GET_ITEM(signature, 1);
     fvarargs = NULL;
@@ -3130,7 +3735,7 @@ cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
             PyTuple_SET_ITEM(fvarargs, i, o);
         }
         for (i = nargs_declared; i < nargs; i++) {
-            PyObject *obj = PyTuple_GET_ITEM(args, i);
+            PyObject *obj = args[i];
             CTypeDescrObject *ct;
 
             if (CData_Check(obj)) {
@@ -3157,20 +3762,29 @@ cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
             }
             PyTuple_SET_ITEM(fvarargs, i, (PyObject *)ct);
         }
+        cif_descr = varcif_cache_take(cd->c_type, fvarargs);
+        if (cif_descr == NULL) {
 #if PY_MAJOR_VERSION < 3
-        fabi = PyInt_AS_LONG(PyTuple_GET_ITEM(signature, 0));
+            fabi = PyInt_AS_LONG(PyTuple_GET_ITEM(signature, 0));
 #else
-        fabi = PyLong_AS_LONG(PyTuple_GET_ITEM(signature, 0));
+            fabi = PyLong_AS_LONG(PyTuple_GET_ITEM(signature, 0));
 #endif
-        cif_descr = fb_prepare_cif(fvarargs, fresult, nargs_declared, fabi);
-        if (cif_descr == NULL)
-            goto error;
+            cif_descr = fb_prepare_cif(fvarargs, fresult, nargs_declared,
+                                       fabi);
+            if (cif_descr == NULL)
+                goto error;
+        }
     }
 
-    buffer = PyObject_Malloc(cif_descr->exchange_size);
-    if (buffer == NULL) {
-        PyErr_NoMemory();
-        goto error;
+    if (cif_descr->exchange_size <= (Py_ssize_t)sizeof(small_buffer)) {
+        buffer = (char *)small_buffer;
+    }
+    else {
+        buffer = PyObject_Malloc(cif_descr->exchange_size);
+        if (buffer == NULL) {
+            PyErr_NoMemory();
+            goto error;
+        }
     }
 
     buffer_array = (void **)buffer;
@@ -3178,7 +3792,7 @@ cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
     for (i=0; i<nargs; i++) {
         CTypeDescrObject *argtype;
         char *data = buffer + cif_descr->exchange_offset_arg[1 + i];
-        PyObject *obj = PyTuple_GET_ITEM(args, i);
+        PyObject *obj = args[i];
 
         buffer_array[i] = data;
 
@@ -3189,8 +3803,24 @@ cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
 
         if (argtype->ct_flags & CT_POINTER) {
             char *tmpbuf;
-            Py_ssize_t datasize = _prepare_pointer_call_argument(
-                                            argtype, obj, (char **)data);
+            Py_buffer *view = NULL;
+            Py_ssize_t datasize = _prepare_pointer_call_argument_ex(
+                                            argtype, obj, (char **)data,
+                                            &view);
+            if (view != NULL) {
+                /* keep the buffer exported until the call returns */
+                struct freeme_s *fp = (struct freeme_s *)PyObject_Malloc(
+                    offsetof(struct freeme_s, alignment));
+                if (fp == NULL) {
+                    PyBuffer_Release(view);
+                    PyObject_Free(view);
+                    PyErr_NoMemory();
+                    goto error;
+                }
+                fp->next = freeme;
+                fp->view = view;
+                freeme = fp;
+            }
             if (datasize == 0)
                 ;    /* successfully filled '*data' */
             else if (datasize < 0)
@@ -3208,6 +3838,7 @@ cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
                         goto error;
                     }
                     fp->next = freeme;
+                    fp->view = NULL;
                     freeme = fp;
                     tmpbuf = (char *)&fp->alignment;
                 }
@@ -3224,12 +3855,20 @@ cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
     resultdata = buffer + cif_descr->exchange_offset_arg[0];
     /*READ(cd->c_data, sizeof(void(*)(void)))*/
 
-    Py_BEGIN_ALLOW_THREADS
-    restore_errno();
-    ffi_call(&cif_descr->cif, CFFI_CLOSURE_TO_FNPTR(void (*)(void), cd->c_data),
-             resultdata, buffer_array);
-    save_errno();
-    Py_END_ALLOW_THREADS
+    if (release_gil) {
+        Py_BEGIN_ALLOW_THREADS
+        restore_errno();
+        ffi_call(&cif_descr->cif,
+                 CFFI_CLOSURE_TO_FNPTR(void (*)(void), cd->c_data),
+                 resultdata, buffer_array);
+        save_errno();
+        Py_END_ALLOW_THREADS
+    }
+    else {
+        ffi_call(&cif_descr->cif,
+                 CFFI_CLOSURE_TO_FNPTR(void (*)(void), cd->c_data),
+                 resultdata, buffer_array);
+    }
 
     if (fresult->ct_flags & (CT_PRIMITIVE_CHAR | CT_PRIMITIVE_SIGNED |
                              CT_PRIMITIVE_UNSIGNED)) {
@@ -3257,19 +3896,71 @@ cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
  error:
     while (freeme != NULL) {
         void *p = (void *)freeme;
+        if (freeme->view != NULL) {
+            PyBuffer_Release(freeme->view);
+            PyObject_Free(freeme->view);
+        }
         freeme = freeme->next;
         PyObject_Free(p);
     }
-    if (buffer)
+    if (buffer != NULL && buffer != (char *)small_buffer)
         PyObject_Free(buffer);
     if (fvarargs != NULL) {
+        /* but only if fvarargs != NULL, if variadic */
+        if (cif_descr != NULL) {
+            if (res != NULL)
+                varcif_cache_give(cd->c_type, fvarargs, cif_descr);
+            else
+                PyObject_Free(cif_descr);
+        }
         Py_DECREF(fvarargs);
-        if (cif_descr != NULL)  /* but only if fvarargs != NULL, if variadic */
-            PyObject_Free(cif_descr);
     }
     return res;
 }
 
+static PyObject*
+cdata_call(CDataObject *cd, PyObject *args, PyObject *kwds)
+{
+    if (kwds != NULL && PyDict_Size(kwds) != 0) {
+        PyErr_SetString(PyExc_TypeError,
+                "a cdata function cannot be called with keyword arguments");
+        return NULL;
+    }
+    return cdata_call_args(cd, &PyTuple_GET_ITEM(args, 0),
+                           PyTuple_GET_SIZE(args), CDATA_RELEASES_GIL(cd));
+}
+
+#ifdef CFFI_USE_VECTORCALL
+static PyObject*
+_cdata_vectorcall(PyObject *cd, PyObject *const *args, size_t nargsf,
+                  PyObject *kwnames, int release_gil)
+{
+    /* only installed on function pointer cdatas; avoids building the
+       tuple of arguments that cdata_call() needs */
+    if (kwnames != NULL && PyTuple_GET_SIZE(kwnames) != 0) {
+        PyErr_SetString(PyExc_TypeError,
+                "a cdata function cannot be called with keyword arguments");
+        return NULL;
+    }
+    return cdata_call_args((CDataObject *)cd, args,
+                           PyVectorcall_NARGS(nargsf), release_gil);
+}
+
+static PyObject*
+cdata_vectorcall(PyObject *cd, PyObject *const *args, size_t nargsf,
+                 PyObject *kwnames)
+{
+    return _cdata_vectorcall(cd, args, nargsf, kwnames, 1);
+}
+
+static PyObject*
+cdata_vectorcall_keepgil(PyObject *cd, PyObject *const *args, size_t nargsf,
+                         PyObject *kwnames)
+{
+    return _cdata_vectorcall(cd, args, nargsf, kwnames, 0);
+}
+#endif
+
 static PyObject *cdata_dir(PyObject *cd, PyObject *noarg)
 {
     CTypeDescrObject *ct = ((CDataObject *)cd)->c_type;
@@ -3439,7 +4130,7 @@ static PyTypeObject CData_Type = {
     sizeof(CDataObject),
     0,
     (destructor)cdata_dealloc,                  /* tp_dealloc */
-    0,                                          /* tp_print */
+    CDATA_VECTORCALL_OFFSET,                    /* tp_vectorcall_offset */
     0,                                          /* tp_getattr */
     0,                                          /* tp_setattr */
     0,                                          /* tp_compare */
@@ -3453,7 +4144,8 @@ static PyTypeObject CData_Type = {
     (getattrofunc)cdata_getattro,               /* tp_getattro */
     (setattrofunc)cdata_setattro,               /* tp_setattro */
     0,                                          /* tp_as_buffer */
-    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_CHECKTYPES, /* tp_flags */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_CHECKTYPES  /* tp_flags */
+                       | CDATA_TPFLAGS_VECTORCALL,
     "The internal base type for CData objects.  Use FFI.CData to access "
     "it.  Always check with isinstance(): subtypes are sometimes returned "
     "on CPython, for performance reasons.",     /* tp_doc */
@@ -3483,7 +4175,7 @@ static PyTypeObject CDataOwning_Type = {
     sizeof(CDataObject),
     0,
     (destructor)cdataowning_dealloc,            /* tp_dealloc */
-    0,                                          /* tp_print */
+    CDATA_VECTORCALL_OFFSET,                    /* tp_vectorcall_offset */
     0,                                          /* tp_getattr */
     0,                                          /* tp_setattr */
     0,                                          /* tp_compare */
@@ -3497,7 +4189,8 @@ static PyTypeObject CDataOwning_Type = {
     0,  /* inherited */                         /* tp_getattro */
     0,  /* inherited */                         /* tp_setattro */
     0,                                          /* tp_as_buffer */
-    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_CHECKTYPES, /* tp_flags */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_CHECKTYPES  /* tp_flags */
+                       | CDATA_TPFLAGS_VECTORCALL,
     "This is an internal subtype of _CDataBase for performance only on "
     "CPython.  Check with isinstance(x, ffi.CData).",   /* tp_doc */
     0,                                          /* tp_traverse */
@@ -3526,7 +4219,7 @@ static PyTypeObject CDataOwningGC_Type = {
     sizeof(CDataObject_own_structptr),
     0,
     (destructor)cdataowninggc_dealloc,          /* tp_dealloc */
-    0,                                          /* tp_print */
+    CDATA_VECTORCALL_OFFSET,                    /* tp_vectorcall_offset */
     0,                                          /* tp_getattr */
     0,                                          /* tp_setattr */
     0,                                          /* tp_compare */
@@ -3541,6 +4234,7 @@ static PyTypeObject CDataOwningGC_Type = {
     0,  /* inherited */                         /* tp_setattro */
     0,                                          /* tp_as_buffer */
     Py_TPFLAGS_DEFAULT | Py_TPFLAGS_CHECKTYPES  /* tp_flags */
+                       | CDATA_TPFLAGS_VECTORCALL
                        | Py_TPFLAGS_HAVE_GC,
     "This is an internal subtype of _CDataBase for performance only on "
     "CPython.  Check with isinstance(x, ffi.CData).",   /* tp_doc */
@@ -3570,7 +4264,7 @@ static PyTypeObject CDataFromBuf_Type = {
     sizeof(CDataObject_frombuf),
     0,
     (destructor)cdatafrombuf_dealloc,           /* tp_dealloc */
-    0,                                          /* tp_print */
+    CDATA_VECTORCALL_OFFSET,                    /* tp_vectorcall_offset */
     0,                                          /* tp_getattr */
     0,                                          /* tp_setattr */
     0,                                          /* tp_compare */
@@ -3585,6 +4279,7 @@ static PyTypeObject CDataFromBuf_Type = {
     0,  /* inherited */                         /* tp_setattro */
     0,                                          /* tp_as_buffer */
     Py_TPFLAGS_DEFAULT | Py_TPFLAGS_CHECKTYPES  /* tp_flags */
+                       | CDATA_TPFLAGS_VECTORCALL
                        | Py_TPFLAGS_HAVE_GC,
     "This is an internal subtype of _CDataBase for performance only on "
     "CPython.  Check with isinstance(x, ffi.CData).",   /* tp_doc */
@@ -3614,7 +4309,7 @@ static PyTypeObject CDataGCP_Type = {
     sizeof(CDataObject_gcp),
     0,
     (destructor)cdatagcp_dealloc,               /* tp_dealloc */
-    0,                                          /* tp_print */
+    CDATA_VECTORCALL_OFFSET,                    /* tp_vectorcall_offset */
     0,                                          /* tp_getattr */
     0,                                          /* tp_setattr */
     0,                                          /* tp_compare */
@@ -3629,6 +4324,7 @@ static PyTypeObject CDataGCP_Type = {
     0,  /* inherited */                         /* tp_setattro */
     0,                                          /* tp_as_buffer */
     Py_TPFLAGS_DEFAULT | Py_TPFLAGS_CHECKTYPES  /* tp_flags */
+                       | CDATA_TPFLAGS_VECTORCALL
 #ifdef Py_TPFLAGS_HAVE_FINALIZE
                        | Py_TPFLAGS_HAVE_FINALIZE
 #endif
@@ -3754,18 +4450,26 @@ static CDataObject *allocate_owning_object(Py_ssize_t size,
                                            int dont_clear)
 {
     /* note: objects with &CDataOwning_Type are always allocated with
-       either a plain malloc() or calloc(), and freed with free(). */
+       either a plain malloc() or calloc(), and freed with free().  The
+       small ones whose size depends only on 'ct' go via the free lists */
     CDataObject *cd;
-    if (dont_clear)
+    if (owning_fixed_size(ct) == size)
+        cd = owning_fl_malloc(size, dont_clear);
+    else if (dont_clear)
         cd = malloc(size);
     else
         cd = calloc(size, 1);
-    if (PyObject_Init((PyObject *)cd, &CDataOwning_Type) == NULL)
+    if (cd == NULL) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    if (PyObject_Init((PyObject *)cd, &CDataOwning_Type) == NULL)
         return NULL;
 
     Py_INCREF(ct);
     cd->c_type = ct;
     cd->c_weakreflist = NULL;
+    CDATA_SET_VECTORCALL(cd);
     return cd;
 }
 
@@ -3810,13 +4514,18 @@ static CDataObject *allocate_gcp_object(CDataObject *origobj,
     cd->head.c_data = origobj->c_data;
     cd->head.c_type = ct;
     cd->head.c_weakreflist = NULL;
+    CDATA_SET_VECTORCALL(&cd->head);
     cd->origobj = (PyObject *)origobj;
     cd->destructor = destructor;
+    cd->external_size = 0;
+    cd->deferred = 0;
 
     PyObject_GC_Track(cd);
     return (CDataObject *)cd;
 }
 
+static char *arena_alloc(ArenaObject *ar, Py_ssize_t size);   /* forward */
+
 static CDataObject *allocate_with_allocator(Py_ssize_t basesize,
                                             Py_ssize_t datasize,
                                             CTypeDescrObject *ct,
@@ -3824,7 +4533,63 @@ static CDataObject *allocate_with_allocator(Py_ssize_t basesize,
 {
     CDataObject *cd;
 
-    if (allocator->ca_alloc == NULL) {
+    if (allocator->ca_arena != NULL) {
+        /* carve the memory out of the arena; the cdata keeps the arena
+           alive, but the memory is freed by arena.release() */
+        CDataObject_gcp *cdg;
+        char *data = arena_alloc(allocator->ca_arena, datasize);
+        if (data == NULL)
+            return NULL;
+        cdg = PyObject_GC_New(CDataObject_gcp, &CDataGCP_Type);
+        if (cdg == NULL)
+            return NULL;
+        Py_INCREF(allocator->ca_arena);
+        Py_INCREF(ct);
+        cdg->head.c_data = data;
+        cdg->head.c_type = ct;
+        cdg->head.c_weakreflist = NULL;
+        CDATA_SET_VECTORCALL(&cdg->head);
+        cdg->origobj = (PyObject *)allocator->ca_arena;
+        cdg->destructor = NULL;
+        cdg->external_size = 0;
+        cdg->deferred = 0;
+        PyObject_GC_Track(cdg);
+        memset(data, 0, datasize);
+        cd = (CDataObject *)cdg;
+    }
+    else if (allocator->ca_c_alloc != NULL) {
+        /* 'alloc' and 'free' are C functions: call them directly,
+           without going through Python.  'origobj' is left NULL, which
+           tells gcp_finalize() that 'destructor' is the C 'free' */
+        CDataObject_gcp *cdg;
+        char *data = allocator->ca_c_alloc(datasize);
+        if (data == NULL) {
+            PyErr_SetString(PyExc_MemoryError, "alloc() returned NULL");
+            return NULL;
+        }
+        cdg = PyObject_GC_New(CDataObject_gcp, &CDataGCP_Type);
+        if (cdg == NULL) {
+            if (allocator->ca_free != NULL)
+                ((void(*)(void *))((CDataObject *)allocator->ca_free)->c_data)(
+                                                                        data);
+            return NULL;
+        }
+        Py_XINCREF(allocator->ca_free);
+        Py_INCREF(ct);
+        cdg->head.c_data = data;
+        cdg->head.c_type = ct;
+        cdg->head.c_weakreflist = NULL;
+        CDATA_SET_VECTORCALL(&cdg->head);
+        cdg->origobj = NULL;
+        cdg->destructor = allocator->ca_free;
+        cdg->external_size = 0;
+        cdg->deferred = 0;
+        PyObject_GC_Track(cdg);
+        if (!allocator->ca_dont_clear)
+            memset(data, 0, datasize);
+        cd = (CDataObject *)cdg;
+    }
+    else if (allocator->ca_alloc == NULL) {
         cd = allocate_owning_object(basesize + datasize, ct,
                                     allocator->ca_dont_clear);
         if (cd == NULL)
@@ -4054,6 +4819,7 @@ static CDataObject *_new_casted_primitive(CTypeDescrObject *ct)
     cd->c_type = ct;
     cd->c_data = ((char*)cd) + dataoffset;
     cd->c_weakreflist = NULL;
+    CDATA_SET_VECTORCALL(cd);
     return cd;
 }
 
@@ -4362,9 +5128,11 @@ static PyObject *dl_load_function(DynLibObject *dlobj, PyObject *args)
     CTypeDescrObject *ct;
     char *funcname;
     void *funcptr;
+    int release_gil = 1;
+    PyObject *res;
 
-    if (!PyArg_ParseTuple(args, "O!s:load_function",
-                          &CTypeDescr_Type, &ct, &funcname))
+    if (!PyArg_ParseTuple(args, "O!s|i:load_function",
+                          &CTypeDescr_Type, &ct, &funcname, &release_gil))
         return NULL;
 
     if (dl_check_closed(dlobj) < 0)
@@ -4389,7 +5157,10 @@ static PyObject *dl_load_function(DynLibObject *dlobj, PyObject *args)
     if ((ct->ct_flags & CT_ARRAY) && ct->ct_length < 0) {
         ct = (CTypeDescrObject *)ct->ct_stuff;
     }
-    return new_simple_cdata(funcptr, ct);
+    res = new_simple_cdata(funcptr, ct);
+    if (res != NULL && !release_gil && (ct->ct_flags & CT_FUNCTIONPTR))
+        CDATA_SET_KEEPGIL((CDataObject *)res);
+    return res;
 }
 
 static PyObject *dl_read_variable(DynLibObject *dlobj, PyObject *args)
@@ -6207,6 +6978,33 @@ static void _my_PyErr_WriteUnraisable(PyObject *t, PyObject *v, PyObject *tb,
 #endif
 }
 
+/* callbacks with up to this number of arguments don't need to allocate
+   an array for the arguments */
+#define CB_STACK_ARGS   8
+
+static PyObject *_call_with_args_array(PyObject *py_ob, PyObject **py_args,
+                                       Py_ssize_t n)
+{
+    /* 'py_args[-1]' must be available as scratch space */
+#ifdef CFFI_USE_VECTORCALL
+    return PyObject_Vectorcall(py_ob, py_args,
+                               n | PY_VECTORCALL_ARGUMENTS_OFFSET, NULL);
+#else
+    PyObject *res, *tup;
+    Py_ssize_t i;
+    tup = PyTuple_New(n);
+    if (tup == NULL)
+        return NULL;
+    for (i = 0; i < n; i++) {
+        Py_INCREF(py_args[i]);
+        PyTuple_SET_ITEM(tup, i, py_args[i]);
+    }
+    res = PyObject_Call(py_ob, tup, NULL);
+    Py_DECREF(tup);
+    return res;
+#endif
+}
+
 static void general_invoke_callback(int decode_args_from_libffi,
                                     void *result, char *args, void *userdata)
 {
@@ -6214,11 +7012,13 @@ static void general_invoke_callback(int decode_args_from_libffi,
     CTypeDescrObject *ct = (CTypeDescrObject *)PyTuple_GET_ITEM(cb_args, 0);
     PyObject *signature = ct->ct_stuff;
     PyObject *py_ob = PyTuple_GET_ITEM(cb_args, 1);
-    PyObject *py_args = NULL;
+    PyObject *stack_args[1 + CB_STACK_ARGS];
+    PyObject **heap_args = NULL;
+    PyObject **py_args = stack_args + 1;
     PyObject *py_res = NULL;
     PyObject *py_rawerr;
     PyObject *onerror_cb;
-    Py_ssize_t i, n;
+    Py_ssize_t i, n, n_done = 0;
     char *extra_error_line = NULL;
 
 #define SIGNATURE(i)  ((CTypeDescrObject *)PyTuple_GET_ITEM(signature, i))
@@ -6226,9 +7026,14 @@ static void general_invoke_callback(int decode_args_from_libffi,
     Py_INCREF(cb_args);
 
     n = PyTuple_GET_SIZE(signature) - 2;
-    py_args = PyTuple_New(n);
-    if (py_args == NULL)
-        goto error;
+    if (n > CB_STACK_ARGS) {
+        heap_args = PyMem_Malloc((1 + n) * sizeof(PyObject *));
+        if (heap_args == NULL) {
+            PyErr_NoMemory();
+            goto error;
+        }
+        py_args = heap_args + 1;
+    }
 
     for (i=0; i<n; i++) {
         char *a_src;
@@ -6246,10 +7051,11 @@ static void general_invoke_callback(int decode_args_from_libffi,
         a = convert_to_object(a_src, a_ct);
         if (a == NULL)
             goto error;
-        PyTuple_SET_ITEM(py_args, i, a);
+        py_args[i] = a;
+        n_done = i + 1;
     }
 
-    py_res = PyObject_Call(py_ob, py_args, NULL);
+    py_res = _call_with_args_array(py_ob, py_args, n);
     if (py_res == NULL)
         goto error;
     if (convert_from_object_fficallback(result, SIGNATURE(1), py_res,
@@ -6262,7 +7068,9 @@ static void general_invoke_callback(int decode_args_from_libffi,
         goto error;
     }
  done:
-    Py_XDECREF(py_args);
+    for (i = 0; i < n_done; i++)
+        Py_DECREF(py_args[i]);
+    PyMem_Free(heap_args);
     Py_XDECREF(py_res);
     Py_DECREF(cb_args);
     return;
@@ -6340,15 +7148,42 @@ static void invoke_callback(ffi_cif *cif, void *result, void **args,
     restore_errno();
 }
 
+static PyObject *prepare_callback_rawerr(CTypeDescrObject *ct,
+                                         PyObject *error_ob,
+                                         int decode_args_from_libffi)
+{
+    /* returns the raw bytes that are returned to C if the callback
+       raises an exception: 'error_ob' converted to the result type */
+    CTypeDescrObject *ctresult;
+    PyObject *py_rawerr;
+    Py_ssize_t size;
+
+    ctresult = (CTypeDescrObject *)PyTuple_GET_ITEM(ct->ct_stuff, 1);
+    size = ctresult->ct_size;
+    if (size < (Py_ssize_t)sizeof(ffi_arg))
+        size = sizeof(ffi_arg);
+    py_rawerr = PyBytes_FromStringAndSize(NULL, size);
+    if (py_rawerr == NULL)
+        return NULL;
+    memset(PyBytes_AS_STRING(py_rawerr), 0, size);
+    if (error_ob != Py_None) {
+        if (convert_from_object_fficallback(
+                PyBytes_AS_STRING(py_rawerr), ctresult, error_ob,
+                decode_args_from_libffi) < 0) {
+            Py_DECREF(py_rawerr);
+            return NULL;
+        }
+    }
+    return py_rawerr;
+}
+
 static PyObject *prepare_callback_info_tuple(CTypeDescrObject *ct,
                                              PyObject *ob,
                                              PyObject *error_ob,
                                              PyObject *onerror_ob,
                                              int decode_args_from_libffi)
 {
-    CTypeDescrObject *ctresult;
     PyObject *py_rawerr, *infotuple;
-    Py_ssize_t size;
 
     if (!(ct->ct_flags & CT_FUNCTIONPTR)) {
         PyErr_Format(PyExc_TypeError, "expected a function ctype, got '%s'",
@@ -6368,22 +7203,9 @@ static PyObject *prepare_callback_info_tuple(CTypeDescrObject *ct,
         return NULL;
     }
 
-    ctresult = (CTypeDescrObject *)PyTuple_GET_ITEM(ct->ct_stuff, 1);
-    size = ctresult->ct_size;
-    if (size < (Py_ssize_t)sizeof(ffi_arg))
-        size = sizeof(ffi_arg);
-    py_rawerr = PyBytes_FromStringAndSize(NULL, size);
+    py_rawerr = prepare_callback_rawerr(ct, error_ob, decode_args_from_libffi);
     if (py_rawerr == NULL)
         return NULL;
-    memset(PyBytes_AS_STRING(py_rawerr), 0, size);
-    if (error_ob != Py_None) {
-        if (convert_from_object_fficallback(
-                PyBytes_AS_STRING(py_rawerr), ctresult, error_ob,
-                decode_args_from_libffi) < 0) {
-            Py_DECREF(py_rawerr);
-            return NULL;
-        }
-    }
     infotuple = Py_BuildValue("OOOO", ct, ob, py_rawerr, onerror_ob);
     Py_DECREF(py_rawerr);
 
@@ -6409,25 +7231,16 @@ static PyObject *prepare_callback_info_tuple(CTypeDescrObject *ct,
 #  pragma GCC diagnostic push
 #  pragma GCC diagnostic ignored "-Wdeprecated-declarations"
 #endif
-static PyObject *b_callback(PyObject *self, PyObject *args)
+static PyObject *new_callback_object(CTypeDescrObject *ct,
+                                     PyObject *infotuple)
 {
-    CTypeDescrObject *ct;
+    /* steals the reference to 'infotuple' */
     CDataObject_closure *cd;
-    PyObject *ob, *error_ob = Py_None, *onerror_ob = Py_None;
-    PyObject *infotuple;
     cif_description_t *cif_descr;
     ffi_closure *closure;
     ffi_status status;
     void *closure_exec;
 
-    if (!PyArg_ParseTuple(args, "O!O|OO:callback", &CTypeDescr_Type, &ct, &ob,
-                          &error_ob, &onerror_ob))
-        return NULL;
-
-    infotuple = prepare_callback_info_tuple(ct, ob, error_ob, onerror_ob, 1);
-    if (infotuple == NULL)
-        return NULL;
-
 #if CFFI_CHECK_FFI_CLOSURE_ALLOC_MAYBE
     if (CFFI_CHECK_FFI_CLOSURE_ALLOC) {
         closure = ffi_closure_alloc(sizeof(ffi_closure), &closure_exec);
@@ -6454,6 +7267,7 @@ static PyObject *b_callback(PyObject *self, PyObject *args)
     cd->head.c_type = ct;
     cd->head.c_data = CFFI_CLOSURE_TO_FNPTR(char *, closure_exec);
     cd->head.c_weakreflist = NULL;
+    CDATA_SET_VECTORCALL(&cd->head);
     closure->user_data = NULL;
     cd->closure = closure;
 
@@ -6527,6 +7341,22 @@ static PyObject *b_callback(PyObject *self, PyObject *args)
 #  pragma GCC diagnostic pop
 #endif
 
+static PyObject *b_callback(PyObject *self, PyObject *args)
+{
+    CTypeDescrObject *ct;
+    PyObject *ob, *error_ob = Py_None, *onerror_ob = Py_None;
+    PyObject *infotuple;
+
+    if (!PyArg_ParseTuple(args, "O!O|OO:callback", &CTypeDescr_Type, &ct, &ob,
+                          &error_ob, &onerror_ob))
+        return NULL;
+
+    infotuple = prepare_callback_info_tuple(ct, ob, error_ob, onerror_ob, 1);
+    if (infotuple == NULL)
+        return NULL;
+    return new_callback_object(ct, infotuple);
+}
+
 static PyObject *b_new_enum_type(PyObject *self, PyObject *args)
 {
     char *ename;
@@ -6930,79 +7760,26 @@ static PyObject *b_string(PyObject *self, PyObject *args, PyObject *kwds)
     return NULL;
 }
 
-static PyObject *b_unpack(PyObject *self, PyObject *args, PyObject *kwds)
+static PyObject *_unpack_items(char *src, CTypeDescrObject *ctitem,
+                               Py_ssize_t length, Py_ssize_t stride)
 {
-    CDataObject *cd;
-    CTypeDescrObject *ctitem;
-    Py_ssize_t i, length, itemsize;
+    /* return a list of the 'length' items of type 'ctitem' found at
+       'src', 'src + stride', 'src + 2 * stride', etc. */
+    Py_ssize_t i, itemsize = ctitem->ct_size;
     PyObject *result;
-    char *src;
     int casenum;
-    static char *keywords[] = {"cdata", "length", NULL};
-
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!n:unpack", keywords,
-                                     &CData_Type, &cd, &length))
-        return NULL;
-
-    if (!(cd->c_type->ct_flags & (CT_ARRAY|CT_POINTER))) {
-        PyErr_Format(PyExc_TypeError,
-                     "expected a pointer or array, got '%s'",
-                     cd->c_type->ct_name);
-        return NULL;
-    }
-    if (length < 0) {
-        PyErr_SetString(PyExc_ValueError, "'length' cannot be negative");
-        return NULL;
-    }
-    if (cd->c_data == NULL) {
-        PyObject *s = cdata_repr(cd);
-        if (s != NULL) {
-            PyErr_Format(PyExc_RuntimeError,
-                         "cannot use unpack() on %s",
-                         PyText_AS_UTF8(s));
-            Py_DECREF(s);
-        }
-        return NULL;
-    }
-
-    /* byte- and unicode strings */
-    ctitem = cd->c_type->ct_itemdescr;
-    if (ctitem->ct_flags & CT_PRIMITIVE_CHAR) {
-        switch (ctitem->ct_size) {
-        case sizeof(char):
-            return PyBytes_FromStringAndSize(cd->c_data, length);
-        case 2:
-            return _my_PyUnicode_FromChar16((cffi_char16_t *)cd->c_data,length);
-        case 4:
-            return _my_PyUnicode_FromChar32((cffi_char32_t *)cd->c_data,length);
-        }
-    }
 
-    /* else, the result is a list.  This implementation should be
-       equivalent to but much faster than '[p[i] for i in range(length)]'.
-       (Note that on PyPy, 'list(p[0:length])' should be equally fast,
-       but arguably, finding out that there *is* such an unexpected way
-       to write things down is the real problem.)
-    */
     result = PyList_New(length);
     if (result == NULL)
         return NULL;
 
-    src = cd->c_data;
-    itemsize = ctitem->ct_size;
-    if (itemsize < 0) {
-        Py_DECREF(result);
-        PyErr_Format(PyExc_ValueError, "'%s' points to items of unknown size",
-                     cd->c_type->ct_name);
-        return NULL;
-    }
-
     /* Determine some common fast-paths for the loop below.  The case -1
        is the fall-back, which always gives the right answer. */
 
 #define ALIGNMENT_CHECK(align)                          \
         (((align) & ((align) - 1)) == 0 &&              \
-         (((uintptr_t)src) & ((align) - 1)) == 0)
+         (((uintptr_t)src) & ((align) - 1)) == 0 &&     \
+         (stride & ((align) - 1)) == 0)
 
     casenum = -1;
 
@@ -7016,6 +7793,7 @@ static PyObject *b_unpack(PyObject *self, PyObject *args, PyObject *kwds)
         */
         if (ctitem->ct_flags & CT_PRIMITIVE_SIGNED) {
             if (itemsize == sizeof(long))             casenum = 3;
+            else if (itemsize == sizeof(PY_LONG_LONG)) casenum = 12;
             else if (itemsize == sizeof(int))         casenum = 2;
             else if (itemsize == sizeof(short))       casenum = 1;
             else if (itemsize == sizeof(signed char)) casenum = 0;
@@ -7026,6 +7804,7 @@ static PyObject *b_unpack(PyObject *self, PyObject *args, PyObject *kwds)
                would always fit in a 'signed long'. */
             if (ctitem->ct_flags & CT_IS_BOOL)           casenum = 11;
             else if (itemsize == sizeof(unsigned long))  casenum = 7;
+            else if (itemsize == sizeof(unsigned PY_LONG_LONG)) casenum = 13;
             else if (itemsize == sizeof(unsigned int))   casenum = 6;
             else if (itemsize == sizeof(unsigned short)) casenum = 5;
             else if (itemsize == sizeof(unsigned char))  casenum = 4;
@@ -7065,108 +7844,709 @@ static PyObject *b_unpack(PyObject *self, PyObject *args, PyObject *kwds)
             default: x = convert_to_object(src, ctitem); /* error */
             }
             break;
+        case 12: x = PyLong_FromLongLong(*(PY_LONG_LONG *)src); break;
+        case 13:
+            x = PyLong_FromUnsignedLongLong(*(unsigned PY_LONG_LONG *)src);
+            break;
         }
         if (x == NULL) {
             Py_DECREF(result);
             return NULL;
         }
         PyList_SET_ITEM(result, i, x);
-        src += itemsize;
+        src += stride;
     }
     return result;
 }
 
-static PyObject *
-b_buffer_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+
+static PyObject *_unpack_as(CDataObject *cd, Py_ssize_t length,
+                            const char *as)
 {
-    /* this is the constructor of the type implemented in minibuffer.h */
-    CDataObject *cd;
-    Py_ssize_t size = -1;
-    int explicit_size;
-    static char *keywords[] = {"cdata", "size", NULL};
+    /* implements unpack(..., as_='bytes'|'array'|'memoryview') */
+    CTypeDescrObject *ctitem = cd->c_type->ct_itemdescr;
+    Py_ssize_t itemsize = ctitem->ct_size;
+    const char *fmt;
+    PyObject *mb, *x, *result;
+    int as_array;
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!|n:buffer", keywords,
-                                     &CData_Type, &cd, &size))
+    if (strcmp(as, "array") == 0)
+        as_array = 1;
+    else if (strcmp(as, "memoryview") == 0)
+        as_array = 0;
+    else if (strcmp(as, "bytes") != 0) {
+        PyErr_Format(PyExc_ValueError,
+                     "unpack(): 'as_' must be 'bytes', 'array' or "
+                     "'memoryview', not '%.200s'", as);
         return NULL;
-
-    explicit_size = size >= 0;
-    if (size < 0)
-        size = _cdata_var_byte_size(cd);
-
-    if (cd->c_type->ct_flags & CT_POINTER) {
-        if (size < 0)
-            size = cd->c_type->ct_itemdescr->ct_size;
-    }
-    else if (cd->c_type->ct_flags & CT_ARRAY) {
-        if (size < 0)
-            size = get_array_length(cd) * cd->c_type->ct_itemdescr->ct_size;
     }
-    else {
-        PyErr_Format(PyExc_TypeError,
-                     "expected a pointer or array cdata, got '%s'",
+    else
+        as_array = -1;
+
+    if (itemsize < 0) {
+        PyErr_Format(PyExc_ValueError, "'%s' points to items of unknown size",
                      cd->c_type->ct_name);
         return NULL;
     }
-    if (size < 0) {
+    if (itemsize > 0 && length > PY_SSIZE_T_MAX / itemsize) {
+        PyErr_SetString(PyExc_OverflowError, "unpack(): length too large");
+        return NULL;
+    }
+    if (as_array < 0)
+        return PyBytes_FromStringAndSize(cd->c_data, length * itemsize);
+
+    fmt = NULL;
+    if (ctitem->ct_flags & CT_PRIMITIVE_ANY)
+        fmt = _primitive_struct_format(ctitem);
+    if (fmt == NULL || (as_array && (*fmt == 'c' || *fmt == '?'))) {
         PyErr_Format(PyExc_TypeError,
-                     "don't know the size pointed to by '%s'",
-                     cd->c_type->ct_name);
+                     "unpack(as_='%s'): not supported for items of type '%s'",
+                     as, ctitem->ct_name);
         return NULL;
     }
 
-    if (explicit_size && CDataOwn_Check(cd)) {
-        Py_ssize_t size_max = cdataowning_size_bytes(cd);
-        if (size > size_max) {
-            char msg[256];
-            sprintf(msg, "ffi.buffer(cdata, bytes): creating a buffer of %llu "
-                         "bytes over a cdata that owns only %llu bytes.  This "
-                         "will crash if you access the extra memory",
-                         (unsigned PY_LONG_LONG)size,
-                         (unsigned PY_LONG_LONG)size_max);
-            if (PyErr_WarnEx(PyExc_UserWarning, msg, 1))
-                return NULL;
+    mb = minibuffer_new(cd->c_data, length * itemsize, (PyObject *)cd);
+    if (mb == NULL)
+        return NULL;
+
+    if (as_array) {
+        /* a copy: array.array(fmt) followed by frombytes() */
+        x = PyImport_ImportModule("array");
+        if (x == NULL)
+            goto error;
+        result = PyObject_CallMethod(x, "array", "s", fmt);
+        Py_DECREF(x);
+        if (result == NULL)
+            goto error;
+        x = PyObject_CallMethod(result, "frombytes", "O", mb);
+        if (x == NULL) {
+            Py_DECREF(result);
+            goto error;
         }
+        Py_DECREF(x);
     }
-    /*WRITE(cd->c_data, size)*/
-    return minibuffer_new(cd->c_data, size, (PyObject *)cd);
-}
+    else {
+        /* no copy: a typed memoryview of the original memory */
+        x = PyMemoryView_FromObject(mb);
+        if (x == NULL)
+            goto error;
+        result = PyObject_CallMethod(x, "cast", "s", fmt);
+        Py_DECREF(x);
+    }
+    Py_DECREF(mb);
+    return result;
 
-static PyObject *b_get_errno(PyObject *self, PyObject *noarg)
-{
-    int err;
-    restore_errno_only();
-    err = errno;
-    errno = 0;
-    return PyInt_FromLong(err);
+ error:
+    Py_DECREF(mb);
+    return NULL;
 }
 
-static PyObject *b_set_errno(PyObject *self, PyObject *arg)
+static PyObject *b_unpack(PyObject *self, PyObject *args, PyObject *kwds)
 {
-    long ival = PyInt_AsLong(arg);
-    if (ival == -1 && PyErr_Occurred())
+    CDataObject *cd;
+    CTypeDescrObject *ctitem;
+    Py_ssize_t length, itemsize;
+    const char *as = NULL;
+    static char *keywords[] = {"cdata", "length", "as_", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!n|z:unpack", keywords,
+                                     &CData_Type, &cd, &length, &as))
         return NULL;
-    else if (ival < INT_MIN || ival > INT_MAX) {
-        PyErr_SetString(PyExc_OverflowError, "errno value too large");
+
+    if (!(cd->c_type->ct_flags & (CT_ARRAY|CT_POINTER))) {
+        PyErr_Format(PyExc_TypeError,
+                     "expected a pointer or array, got '%s'",
+                     cd->c_type->ct_name);
         return NULL;
     }
-    errno = (int)ival;
-    save_errno_only();
-    errno = 0;
-    Py_INCREF(Py_None);
-    return Py_None;
-}
-
-static PyObject *newp_handle(CTypeDescrObject *ct_voidp, PyObject *x)
-{
-    CDataObject_own_structptr *cd;
-    cd = (CDataObject_own_structptr *)PyObject_GC_New(CDataObject_own_structptr,
-                                                      &CDataOwningGC_Type);
-    if (cd == NULL)
+    if (length < 0) {
+        PyErr_SetString(PyExc_ValueError, "'length' cannot be negative");
+        return NULL;
+    }
+    if (cd->c_data == NULL) {
+        PyObject *s = cdata_repr(cd);
+        if (s != NULL) {
+            PyErr_Format(PyExc_RuntimeError,
+                         "cannot use unpack() on %s",
+                         PyText_AS_UTF8(s));
+            Py_DECREF(s);
+        }
+        return NULL;
+    }
+    if (as != NULL)
+        return _unpack_as(cd, length, as);
+
+    /* byte- and unicode strings */
+    ctitem = cd->c_type->ct_itemdescr;
+    if (ctitem->ct_flags & CT_PRIMITIVE_CHAR) {
+        switch (ctitem->ct_size) {
+        case sizeof(char):
+            return PyBytes_FromStringAndSize(cd->c_data, length);
+        case 2:
+            return _my_PyUnicode_FromChar16((cffi_char16_t *)cd->c_data,length);
+        case 4:
+            return _my_PyUnicode_FromChar32((cffi_char32_t *)cd->c_data,length);
+        }
+    }
+
+    /* else, the result is a list.  This implementation should be
+       equivalent to but much faster than '[p[i] for i in range(length)]'.
+       (Note that on PyPy, 'list(p[0:length])' should be equally fast,
+       but arguably, finding out that there *is* such an unexpected way
+       to write things down is the real problem.)
+    */
+    itemsize = ctitem->ct_size;
+    if (itemsize < 0) {
+        PyErr_Format(PyExc_ValueError, "'%s' points to items of unknown size",
+                     cd->c_type->ct_name);
+        return NULL;
+    }
+    return _unpack_items(cd->c_data, ctitem, length, itemsize);
+}
+
+static CFieldObject *_struct_array_field(CDataObject *cd, PyObject *fieldname,
+                                         const char *funcname)
+{
+    /* common part of gather() and scatter(): check that 'cd' is a
+       pointer or array of structs and return the named field */
+    CTypeDescrObject *ct = cd->c_type;
+    CFieldObject *cf;
+
+    if (!(ct->ct_flags & (CT_ARRAY|CT_POINTER)) ||
+            !(ct->ct_itemdescr->ct_flags & (CT_STRUCT|CT_UNION))) {
+        PyErr_Format(PyExc_TypeError,
+                     "%s(): expected a pointer or array of structs or "
+                     "unions, got '%s'", funcname, ct->ct_name);
+        return NULL;
+    }
+    ct = ct->ct_itemdescr;
+    switch (force_lazy_struct(ct)) {
+    case 1:
+        break;
+    case -1:
+        return NULL;
+    default:
+        PyErr_Format(PyExc_TypeError, "%s(): '%s' is opaque",
+                     funcname, ct->ct_name);
+        return NULL;
+    }
+    cf = (CFieldObject *)PyDict_GetItemWithError(ct->ct_stuff, fieldname);
+    if (cf == NULL) {
+        if (!PyErr_Occurred())
+            PyErr_Format(PyExc_KeyError, "'%s' has no field '%S'",
+                         ct->ct_name, fieldname);
+        return NULL;
+    }
+    if (cd->c_data == NULL) {
+        PyErr_Format(PyExc_RuntimeError, "cannot use %s() on a NULL pointer",
+                     funcname);
+        return NULL;
+    }
+    return cf;
+}
+
+static int _field_matches_buffer(CFieldObject *cf, Py_buffer *view)
+{
+    /* common part of gather() and scatter() with a buffer: the items of
+       the buffer can be copied directly if the field is a regular
+       primitive field of the same type */
+    return cf->cf_bitshift == BS_REGULAR &&
+           (cf->cf_type->ct_flags & CT_PRIMITIVE_ANY) &&
+           _buffer_format_matches(cf->cf_type, view);
+}
+
+static PyObject *_gather_into(CDataObject *cd, CFieldObject *cf,
+                              Py_ssize_t length, PyObject *out)
+{
+    /* implements gather(..., out=buffer) */
+    Py_buffer view;
+    Py_ssize_t i, count, stride, itemsize = cf->cf_type->ct_size;
+    char *src, *dst;
+
+    if (PyObject_GetBuffer(out, &view, PyBUF_WRITABLE | PyBUF_C_CONTIGUOUS |
+                                       PyBUF_FORMAT) < 0)
+        return NULL;
+    if (!_field_matches_buffer(cf, &view)) {
+        PyErr_Format(PyExc_TypeError,
+                     "gather(): 'out' must be a buffer of items of type "
+                     "'%s', got format '%.200s' with itemsize %zd",
+                     cf->cf_type->ct_name,
+                     view.format != NULL ? view.format : "B", view.itemsize);
+        goto error;
+    }
+    count = view.len / itemsize;
+    if (length < 0)
+        length = count;
+    else if (length > count) {
+        PyErr_Format(PyExc_IndexError,
+                     "gather(): 'out' has room for %zd items, not %zd",
+                     count, length);
+        goto error;
+    }
+    stride = cd->c_type->ct_itemdescr->ct_size;
+    src = cd->c_data + cf->cf_offset;
+    dst = view.buf;
+    for (i = 0; i < length; i++) {
+        memcpy(dst, src, itemsize);
+        src += stride;
+        dst += itemsize;
+    }
+    PyBuffer_Release(&view);
+    Py_INCREF(out);
+    return out;
+
+ error:
+    PyBuffer_Release(&view);
+    return NULL;
+}
+
+static PyObject *b_gather(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    CDataObject *cd;
+    CFieldObject *cf;
+    PyObject *fieldname, *result, *x, *out = Py_None;
+    Py_ssize_t i, length = -1, stride;
+    char *src;
+    static char *keywords[] = {"cdata", "fieldname", "length", "out", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O|nO:gather", keywords,
+                                     &CData_Type, &cd, &fieldname, &length,
+                                     &out))
+        return NULL;
+
+    cf = _struct_array_field(cd, fieldname, "gather");
+    if (cf == NULL)
+        return NULL;
+    if (cd->c_type->ct_flags & CT_ARRAY) {
+        if (length < 0)
+            length = get_array_length(cd);
+        else if (length > get_array_length(cd)) {
+            PyErr_Format(PyExc_IndexError,
+                         "gather(): length %zd is larger than the array "
+                         "length %zd", length, get_array_length(cd));
+            return NULL;
+        }
+    }
+    if (out != Py_None)
+        return _gather_into(cd, cf, length, out);
+    if (length < 0) {
+        PyErr_SetString(PyExc_TypeError,
+                        "gather(): 'length' is required for a pointer");
+        return NULL;
+    }
+    stride = cd->c_type->ct_itemdescr->ct_size;
+    src = cd->c_data + cf->cf_offset;
+
+    if (cf->cf_bitshift == BS_REGULAR)
+        return _unpack_items(src, cf->cf_type, length, stride);
+
+    /* bit fields and variable-length arrays: the general case */
+    result = PyList_New(length);
+    if (result == NULL)
+        return NULL;
+    for (i = 0; i < length; i++) {
+        if (cf->cf_bitshift == BS_EMPTY_ARRAY)
+            x = new_simple_cdata(src,
+                                 (CTypeDescrObject *)cf->cf_type->ct_stuff);
+        else
+            x = convert_to_object_bitfield(src, cf);
+        if (x == NULL) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        PyList_SET_ITEM(result, i, x);
+        src += stride;
+    }
+    return result;
+}
+
+static int _scatter_from_buffer(CDataObject *cd, CFieldObject *cf,
+                                PyObject *values)
+{
+    /* implements scatter() with a buffer of items of the field's type.
+       Returns 1 if done, 0 if 'values' should be used as a sequence
+       instead, or -1 on error. */
+    Py_buffer view;
+    Py_ssize_t i, length, stride, itemsize = cf->cf_type->ct_size;
+    char *src, *dst;
+
+    if (PyObject_GetBuffer(values, &view, PyBUF_C_CONTIGUOUS |
+                                          PyBUF_FORMAT) < 0) {
+        PyErr_Clear();
+        return 0;
+    }
+    if (!_field_matches_buffer(cf, &view)) {
+        PyBuffer_Release(&view);
+        return 0;
+    }
+    length = view.len / itemsize;
+    if ((cd->c_type->ct_flags & CT_ARRAY) &&
+            length > get_array_length(cd)) {
+        PyErr_Format(PyExc_IndexError,
+                     "scatter(): got %zd values for an array of length %zd",
+                     length, get_array_length(cd));
+        PyBuffer_Release(&view);
+        return -1;
+    }
+    stride = cd->c_type->ct_itemdescr->ct_size;
+    src = view.buf;
+    dst = cd->c_data + cf->cf_offset;
+    for (i = 0; i < length; i++) {
+        memcpy(dst, src, itemsize);
+        src += itemsize;
+        dst += stride;
+    }
+    PyBuffer_Release(&view);
+    return 1;
+}
+
+static PyObject *b_scatter(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    CDataObject *cd;
+    CFieldObject *cf;
+    PyObject *fieldname, *values, *seq;
+    Py_ssize_t i, length, stride;
+    char *data;
+    static char *keywords[] = {"cdata", "fieldname", "values", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!OO:scatter", keywords,
+                                     &CData_Type, &cd, &fieldname, &values))
+        return NULL;
+
+    cf = _struct_array_field(cd, fieldname, "scatter");
+    if (cf == NULL)
+        return NULL;
+
+    if (PyObject_CheckBuffer(values)) {
+        int res = _scatter_from_buffer(cd, cf, values);
+        if (res < 0)
+            return NULL;
+        if (res > 0) {
+            Py_INCREF(Py_None);
+            return Py_None;
+        }
+        /* else, not a buffer of the right type: use it as a sequence */
+    }
+
+    seq = PySequence_Fast(values, "scatter(): 'values' must be a sequence");
+    if (seq == NULL)
+        return NULL;
+    length = PySequence_Fast_GET_SIZE(seq);
+    if ((cd->c_type->ct_flags & CT_ARRAY) &&
+            length > get_array_length(cd)) {
+        PyErr_Format(PyExc_IndexError,
+                     "scatter(): got %zd values for an array of length %zd",
+                     length, get_array_length(cd));
+        Py_DECREF(seq);
+        return NULL;
+    }
+    stride = cd->c_type->ct_itemdescr->ct_size;
+    data = cd->c_data;
+    for (i = 0; i < length; i++) {
+        PyObject *x = PySequence_Fast_GET_ITEM(seq, i);
+        if (convert_field_from_object(data, cf, x) < 0) {
+            Py_DECREF(seq);
+            return NULL;
+        }
+        data += stride;
+    }
+    Py_DECREF(seq);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject *
+b_buffer_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    /* this is the constructor of the type implemented in minibuffer.h */
+    CDataObject *cd;
+    Py_ssize_t size = -1;
+    int explicit_size;
+    static char *keywords[] = {"cdata", "size", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!|n:buffer", keywords,
+                                     &CData_Type, &cd, &size))
+        return NULL;
+
+    explicit_size = size >= 0;
+    if (size < 0)
+        size = _cdata_var_byte_size(cd);
+
+    if (cd->c_type->ct_flags & CT_POINTER) {
+        if (size < 0)
+            size = cd->c_type->ct_itemdescr->ct_size;
+    }
+    else if (cd->c_type->ct_flags & CT_ARRAY) {
+        if (size < 0)
+            size = get_array_length(cd) * cd->c_type->ct_itemdescr->ct_size;
+    }
+    else {
+        PyErr_Format(PyExc_TypeError,
+                     "expected a pointer or array cdata, got '%s'",
+                     cd->c_type->ct_name);
+        return NULL;
+    }
+    if (size < 0) {
+        PyErr_Format(PyExc_TypeError,
+                     "don't know the size pointed to by '%s'",
+                     cd->c_type->ct_name);
+        return NULL;
+    }
+
+    if (explicit_size && CDataOwn_Check(cd)) {
+        Py_ssize_t size_max = cdataowning_size_bytes(cd);
+        if (size > size_max) {
+            char msg[256];
+            sprintf(msg, "ffi.buffer(cdata, bytes): creating a buffer of %llu "
+                         "bytes over a cdata that owns only %llu bytes.  This "
+                         "will crash if you access the extra memory",
+                         (unsigned PY_LONG_LONG)size,
+                         (unsigned PY_LONG_LONG)size_max);
+            if (PyErr_WarnEx(PyExc_UserWarning, msg, 1))
+                return NULL;
+        }
+    }
+    /*WRITE(cd->c_data, size)*/
+    return minibuffer_new(cd->c_data, size, (PyObject *)cd);
+}
+
+static int _buffer_format_append(PyObject **pfmt, const char *text)
+{
+    PyBytes_ConcatAndDel(pfmt, PyBytes_FromString(text));
+    return *pfmt == NULL ? -1 : 0;
+}
+
+static int _buffer_format_add(PyObject **pfmt, CTypeDescrObject *ct)
+{
+    /* append to '*pfmt' the PEP 3118 format string describing 'ct'.
+       Struct fields get explicit 'x' padding.  Returns 0 or -1. */
+    char tmp[64];
+    const char *fmt;
+
+    if (ct->ct_flags & CT_PRIMITIVE_ANY) {
+        if (ct->ct_flags & CT_IS_LONGDOUBLE)
+            fmt = "g";
+        else if ((ct->ct_flags & CT_PRIMITIVE_CHAR) && ct->ct_size == 2)
+            fmt = "u";
+        else if ((ct->ct_flags & CT_PRIMITIVE_CHAR) && ct->ct_size == 4)
+            fmt = "w";
+        else
+            fmt = _primitive_struct_format(ct);
+        if (fmt == NULL)
+            goto unsupported;
+        return _buffer_format_append(pfmt, fmt);
+    }
+    if (ct->ct_flags & CT_PRIMITIVE_COMPLEX) {
+        if (ct->ct_size == 2 * sizeof(float))
+            return _buffer_format_append(pfmt, "Zf");
+        if (ct->ct_size == 2 * sizeof(double))
+            return _buffer_format_append(pfmt, "Zd");
+        goto unsupported;
+    }
+    if (ct->ct_flags & (CT_POINTER | CT_FUNCTIONPTR))
+        return _buffer_format_append(pfmt, "P");
+
+    if (ct->ct_flags & CT_ARRAY) {
+        const char *sep = "(";
+        while (ct->ct_flags & CT_ARRAY) {
+            if (ct->ct_length < 0)
+                goto unsupported;
+            sprintf(tmp, "%s%zd", sep, ct->ct_length);
+            if (_buffer_format_append(pfmt, tmp) < 0)
+                return -1;
+            sep = ",";
+            ct = ct->ct_itemdescr;
+        }
+        if (_buffer_format_append(pfmt, ")") < 0)
+            return -1;
+        return _buffer_format_add(pfmt, ct);
+    }
+
+    if ((ct->ct_flags & CT_STRUCT) && force_lazy_struct(ct) > 0) {
+        CFieldObject *cf;
+        Py_ssize_t pos = 0;
+        int align, natural = 1;
+
+        /* if the fields are not all at their natural alignment (e.g. in
+           packed structures), we need the '^' mode: no implicit padding */
+        for (cf = (CFieldObject *)ct->ct_extra; cf; cf = cf->cf_next) {
+            if (cf->cf_bitshift == BS_EMPTY_ARRAY)
+                continue;
+            align = get_alignment(cf->cf_type);
+            if (align < 0)
+                return -1;
+            if (cf->cf_offset % align != 0)
+                natural = 0;
+        }
+        if (_buffer_format_append(pfmt, natural ? "T{" : "T{^") < 0)
+            return -1;
+
+        for (cf = (CFieldObject *)ct->ct_extra; cf; cf = cf->cf_next) {
+            if (cf->cf_bitshift == BS_EMPTY_ARRAY)
+                continue;
+            if (cf->cf_bitshift >= 0) {
+                PyErr_Format(PyExc_TypeError,
+                             "cannot describe '%s' as a buffer format: "
+                             "it contains bit fields", ct->ct_name);
+                return -1;
+            }
+            if (cf->cf_offset < pos) {
+                PyErr_Format(PyExc_TypeError,
+                             "cannot describe '%s' as a buffer format: "
+                             "it contains overlapping fields", ct->ct_name);
+                return -1;
+            }
+            if (cf->cf_offset > pos) {
+                sprintf(tmp, "%zdx", cf->cf_offset - pos);
+                if (_buffer_format_append(pfmt, tmp) < 0)
+                    return -1;
+            }
+            if (_buffer_format_add(pfmt, cf->cf_type) < 0 ||
+                _buffer_format_append(pfmt, ":") < 0 ||
+                _buffer_format_append(pfmt,
+                            PyText_AS_UTF8(get_field_name(ct, cf))) < 0 ||
+                _buffer_format_append(pfmt, ":") < 0)
+                return -1;
+            pos = cf->cf_offset + cf->cf_type->ct_size;
+        }
+        if (ct->ct_size > pos) {
+            sprintf(tmp, "%zdx", ct->ct_size - pos);
+            if (_buffer_format_append(pfmt, tmp) < 0)
+                return -1;
+        }
+        return _buffer_format_append(pfmt, "}");
+    }
+
+ unsupported:
+    if (!PyErr_Occurred())
+        PyErr_Format(PyExc_TypeError,
+                     "cannot describe '%s' as a buffer format", ct->ct_name);
+    return -1;
+}
+
+static PyObject *b_typed_memoryview(PyObject *self, PyObject *args,
+                                    PyObject *kwds)
+{
+    CDataObject *cd;
+    CTypeDescrObject *ctitem, *ct;
+    Py_ssize_t length = -1, itemsize, stride;
+    PyObject *fmt, *result;
+    MiniBufferObj *mb;
+    int i, ndim;
+    static char *keywords[] = {"cdata", "length", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!|n:memoryview", keywords,
+                                     &CData_Type, &cd, &length))
+        return NULL;
+
+    if (cd->c_type->ct_flags & CT_ARRAY) {
+        if (length < 0)
+            length = get_array_length(cd);
+    }
+    else if (cd->c_type->ct_flags & CT_POINTER) {
+        if (length < 0)
+            length = 1;
+    }
+    else {
+        PyErr_Format(PyExc_TypeError,
+                     "expected a pointer or array cdata, got '%s'",
+                     cd->c_type->ct_name);
+        return NULL;
+    }
+    ctitem = cd->c_type->ct_itemdescr;
+    itemsize = ctitem->ct_size;
+    if (itemsize <= 0) {
+        PyErr_Format(PyExc_TypeError,
+                     "don't know the size pointed to by '%s'",
+                     cd->c_type->ct_name);
+        return NULL;
+    }
+    if (length > PY_SSIZE_T_MAX / itemsize) {
+        PyErr_SetString(PyExc_OverflowError, "memoryview(): length too large");
+        return NULL;
+    }
+    if (cd->c_data == NULL && length > 0) {
+        PyErr_SetString(PyExc_RuntimeError,
+                        "cannot use memoryview() on a NULL pointer");
+        return NULL;
+    }
+
+    /* nested arrays of known length become extra dimensions */
+    ndim = 1;
+    for (ct = ctitem; (ct->ct_flags & CT_ARRAY) && ct->ct_length >= 0;
+         ct = ct->ct_itemdescr)
+        ndim++;
+
+    fmt = PyBytes_FromString("");
+    if (fmt == NULL || _buffer_format_add(&fmt, ct) < 0) {
+        Py_XDECREF(fmt);
+        return NULL;
+    }
+
+    mb = (MiniBufferObj *)minibuffer_new(cd->c_data, length * itemsize,
+                                         (PyObject *)cd);
+    if (mb == NULL) {
+        Py_DECREF(fmt);
+        return NULL;
+    }
+    mb->mb_format = fmt;
+    mb->mb_itemsize = ct->ct_size;
+    mb->mb_ndim = ndim;
+    mb->mb_shape = PyMem_Malloc(2 * ndim * sizeof(Py_ssize_t));
+    if (mb->mb_shape == NULL) {
+        Py_DECREF(mb);
+        return PyErr_NoMemory();
+    }
+    mb->mb_shape[0] = length;
+    mb->mb_shape[ndim] = stride = itemsize;
+    for (i = 1, ct = ctitem; i < ndim; i++, ct = ct->ct_itemdescr) {
+        stride /= ct->ct_length > 0 ? ct->ct_length : 1;
+        mb->mb_shape[i] = ct->ct_length;
+        mb->mb_shape[ndim + i] = stride;
+    }
+
+    result = PyMemoryView_FromObject((PyObject *)mb);
+    Py_DECREF(mb);
+    return result;
+}
+
+static PyObject *b_get_errno(PyObject *self, PyObject *noarg)
+{
+    int err;
+    restore_errno_only();
+    err = errno;
+    errno = 0;
+    return PyInt_FromLong(err);
+}
+
+static PyObject *b_set_errno(PyObject *self, PyObject *arg)
+{
+    long ival = PyInt_AsLong(arg);
+    if (ival == -1 && PyErr_Occurred())
+        return NULL;
+    else if (ival < INT_MIN || ival > INT_MAX) {
+        PyErr_SetString(PyExc_OverflowError, "errno value too large");
+        return NULL;
+    }
+    errno = (int)ival;
+    save_errno_only();
+    errno = 0;
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject *newp_handle(CTypeDescrObject *ct_voidp, PyObject *x)
+{
+    CDataObject_own_structptr *cd;
+    cd = (CDataObject_own_structptr *)PyObject_GC_New(CDataObject_own_structptr,
+                                                      &CDataOwningGC_Type);
+    if (cd == NULL)
         return NULL;
     Py_INCREF(ct_voidp);        /* must be "void *" */
     cd->head.c_type = ct_voidp;
     cd->head.c_data = (char *)cd;
     cd->head.c_weakreflist = NULL;
+    CDATA_SET_VECTORCALL(&cd->head);
     Py_INCREF(x);
     cd->structobj = x;
     PyObject_GC_Track(cd);
@@ -7276,10 +8656,34 @@ static int _my_PyObject_GetContiguousBuffer(PyObject *x, Py_buffer *view,
     return 0;
 }
 
+static PyObject *_cdata_from_buffer_view(CTypeDescrObject *ct,
+                                         Py_buffer *view, Py_ssize_t length)
+{
+    /* make a cdata that owns 'view'.  In case of error, 'view' is
+       released and freed here. */
+    CDataObject *cd;
+
+    cd = (CDataObject *)PyObject_GC_New(CDataObject_frombuf,
+                                        &CDataFromBuf_Type);
+    if (cd == NULL) {
+        PyBuffer_Release(view);
+        PyObject_Free(view);
+        return NULL;
+    }
+    Py_INCREF(ct);
+    cd->c_type = ct;
+    cd->c_data = view->buf;
+    cd->c_weakreflist = NULL;
+    CDATA_SET_VECTORCALL(cd);
+    ((CDataObject_frombuf *)cd)->length = length;
+    ((CDataObject_frombuf *)cd)->bufferview = view;
+    PyObject_GC_Track(cd);
+    return (PyObject *)cd;
+}
+
 static PyObject *direct_from_buffer(CTypeDescrObject *ct, PyObject *x,
                                     int require_writable)
 {
-    CDataObject *cd;
     Py_buffer *view;
     Py_ssize_t arraylength, minimumlength = 0;
 
@@ -7351,19 +8755,7 @@ static PyObject *direct_from_buffer(CTypeDescrObject *ct, PyObject *x,
         goto error2;
     }
 
-    cd = (CDataObject *)PyObject_GC_New(CDataObject_frombuf,
-                                        &CDataFromBuf_Type);
-    if (cd == NULL)
-        goto error2;
-
-    Py_INCREF(ct);
-    cd->c_type = ct;
-    cd->c_data = view->buf;
-    cd->c_weakreflist = NULL;
-    ((CDataObject_frombuf *)cd)->length = arraylength;
-    ((CDataObject_frombuf *)cd)->bufferview = view;
-    PyObject_GC_Track(cd);
-    return (PyObject *)cd;
+    return _cdata_from_buffer_view(ct, view, arraylength);
 
  error2:
     PyBuffer_Release(view);
@@ -7449,12 +8841,14 @@ static PyObject *b_gcp(PyObject *self, PyObject *args, PyObject *kwds)
     CDataObject *cd;
     CDataObject *origobj;
     PyObject *destructor;
-    Py_ssize_t ignored;   /* for pypy */
-    static char *keywords[] = {"cdata", "destructor", "size", NULL};
+    Py_ssize_t size = 0;
+    int deferred = 0;
+    static char *keywords[] = {"cdata", "destructor", "size", "deferred",
+                               NULL};
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O|n:gc", keywords,
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O|ni:gc", keywords,
                                      &CData_Type, &origobj, &destructor,
-                                     &ignored))
+                                     &size, &deferred))
         return NULL;
 
     if (destructor == Py_None) {
@@ -7465,13 +8859,80 @@ static PyObject *b_gcp(PyObject *self, PyObject *args, PyObject *kwds)
 	    return NULL;
 	}
 	Py_CLEAR(((CDataObject_gcp *)origobj)->destructor);
+	gcp_external_remove((CDataObject_gcp *)origobj);
 	Py_RETURN_NONE;
     }
 
     cd = allocate_gcp_object(origobj, origobj->c_type, destructor);
+    if (cd != NULL) {
+        gcp_external_add((CDataObject_gcp *)cd, size);
+        ((CDataObject_gcp *)cd)->deferred = deferred;
+    }
     return (PyObject *)cd;
 }
 
+static PyObject *b_drain_destructors(PyObject *self, PyObject *noarg)
+{
+    /* Take the whole queue at once: if several threads call this
+       function, each destructor is still called only once, and the
+       destructors of one batch are called in order */
+    PyObject *queue = gcp_deferred_queue;
+    Py_ssize_t i, n;
+
+    if (queue == NULL || PyList_GET_SIZE(queue) == 0)
+        return PyInt_FromLong(0);
+    gcp_deferred_queue = NULL;
+
+    n = PyList_GET_SIZE(queue);
+    for (i = 0; i < n; i++) {
+        PyObject *item = PyList_GET_ITEM(queue, i);
+        PyObject *destructor = PyTuple_GET_ITEM(item, 0);
+        PyObject *origobj = PyTuple_GET_ITEM(item, 1);
+        Py_INCREF(destructor);
+        Py_INCREF(origobj);
+        gcp_finalize(destructor, origobj, NULL);
+    }
+    Py_DECREF(queue);
+    return PyInt_FromSsize_t(n);
+}
+
+static PyObject *b_closure_stats(PyObject *self, PyObject *noarg)
+{
+    struct closure_chunk_s *chunk;
+    Py_ssize_t num_chunks = 0;
+    for (chunk = closure_chunks; chunk != NULL; chunk = chunk->next_chunk)
+        num_chunks++;
+    return Py_BuildValue("{s:n,s:n,s:n,s:n,s:n}",
+                         "mapped_pages", closure_mapped_pages,
+                         "page_size", _pagesize,
+                         "chunks", num_chunks,
+                         "live_closures", closure_num_used,
+                         "free_slots", closure_num_free);
+}
+
+static PyObject *b_external_memory_stats(PyObject *self, PyObject *noarg)
+{
+    return Py_BuildValue("{s:n,s:n,s:n}",
+                         "bytes", gcp_external_bytes,
+                         "threshold", gcp_external_threshold,
+                         "collections", gcp_external_collections);
+}
+
+static PyObject *b_set_external_memory_threshold(PyObject *self,
+                                                 PyObject *arg)
+{
+    Py_ssize_t old = gcp_external_threshold;
+    Py_ssize_t threshold = PyNumber_AsSsize_t(arg, PyExc_OverflowError);
+    if (threshold == -1 && PyErr_Occurred())
+        return NULL;
+    if (threshold < 0) {
+        PyErr_SetString(PyExc_ValueError, "threshold must be >= 0");
+        return NULL;
+    }
+    gcp_external_threshold = threshold;
+    return PyInt_FromSsize_t(old);
+}
+
 static PyObject *b_release(PyObject *self, PyObject *arg)
 {
     if (!CData_Check(arg)) {
@@ -7481,6 +8942,35 @@ static PyObject *b_release(PyObject *self, PyObject *arg)
     return cdata_exit(arg, NULL);
 }
 
+static PyObject *b_free_list_stats(PyObject *self, PyObject *noarg)
+{
+    Py_ssize_t cached = 0, cached_bytes = 0;
+    int cls;
+    for (cls = 0; cls < OWNING_FL_CLASSES; cls++) {
+        cached += owning_fl_counts[cls];
+        cached_bytes += owning_fl_counts[cls] * (cls + 1) * OWNING_FL_STEP;
+    }
+    return Py_BuildValue("{s:n,s:n,s:n,s:n,s:n}",
+                         "hits", owning_fl_hits,
+                         "misses", owning_fl_misses,
+                         "cached", cached,
+                         "cached_bytes", cached_bytes,
+                         "limit", owning_fl_limit);
+}
+
+static PyObject *b_trim_free_lists(PyObject *self, PyObject *args,
+                                   PyObject *kwds)
+{
+    Py_ssize_t limit = -1;
+    static char *keywords[] = {"limit", NULL};
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|n:trim_free_lists",
+                                     keywords, &limit))
+        return NULL;
+    if (limit >= 0)
+        owning_fl_limit = limit;
+    return PyInt_FromSsize_t(owning_fl_trim());
+}
+
 /************************************************************/
 
 static char _testfunc0(char a, char b)
@@ -7799,6 +9289,10 @@ static PyMethodDef FFIBackendMethods[] = {
     {"getcname", b_getcname, METH_VARARGS},
     {"string", (PyCFunction)b_string, METH_VARARGS | METH_KEYWORDS},
     {"unpack", (PyCFunction)b_unpack, METH_VARARGS | METH_KEYWORDS},
+    {"typed_memoryview", (PyCFunction)b_typed_memoryview,
+                                          METH_VARARGS | METH_KEYWORDS},
+    {"gather", (PyCFunction)b_gather, METH_VARARGS | METH_KEYWORDS},
+    {"scatter", (PyCFunction)b_scatter, METH_VARARGS | METH_KEYWORDS},
     {"get_errno", b_get_errno, METH_NOARGS},
     {"set_errno", b_set_errno, METH_O},
     {"newp_handle", b_newp_handle, METH_VARARGS},
@@ -7807,6 +9301,14 @@ static PyMethodDef FFIBackendMethods[] = {
     {"memmove", (PyCFunction)b_memmove, METH_VARARGS | METH_KEYWORDS},
     {"gcp", (PyCFunction)b_gcp, METH_VARARGS | METH_KEYWORDS},
     {"release", b_release, METH_O},
+    {"free_list_stats", b_free_list_stats, METH_NOARGS},
+    {"external_memory_stats", b_external_memory_stats, METH_NOARGS},
+    {"closure_stats", b_closure_stats, METH_NOARGS},
+    {"drain_destructors", b_drain_destructors, METH_NOARGS},
+    {"set_external_memory_threshold", b_set_external_memory_threshold,
+                                          METH_O},
+    {"trim_free_lists", (PyCFunction)b_trim_free_lists,
+                                          METH_VARARGS | METH_KEYWORDS},
 #ifdef MS_WIN32
     {"getwinerror", (PyCFunction)b_getwinerror, METH_VARARGS | METH_KEYWORDS},
 #endif
@@ -7998,6 +9500,7 @@ static void *cffi_exports[] = {
     cffi_call_python,
     _cffi_to_c_wchar3216_t,
     _cffi_from_c_wchar3216_t,
+    _prepare_pointer_call_argument_keepalive,
 };
 
 static struct { const char *name; int value; } all_dlopen_flags[] = {
@@ -8065,6 +9568,9 @@ init_cffi_backend(void)
         &FFI_Type,
         &Lib_Type,
         &GlobSupport_Type,
+        &Arena_Type,
+        &HandleTable_Type,
+        &CallbackFactory_Type,
         NULL
     };
 
@@ -0,0 +1,277 @@
+/* Implementation of ffi.new_arena(): an object with a new() method
+ * that works like ffi.new(), but carves the memory out of large
+ * chunks.  All the memory is freed at once by release(), or by
+ * leaving the 'with' block, or when the arena object is deallocated
+ * (which occurs only after all cdata allocated from it are gone).
+ *
+ * In debug mode, release() does not free the chunks but fills them
+ * with a poison byte.  They are checked and freed when the arena is
+ * deallocated; if they were modified, a RuntimeWarning is issued.
+ */
+
+#define ARENA_DEFAULT_CHUNK_SIZE  65536
+#define ARENA_POISON              0xDD
+
+struct arena_align_s { char c; union_alignment u; };
+#define ARENA_ALIGN   ((Py_ssize_t)offsetof(struct arena_align_s, u))
+
+struct arena_chunk_s {
+    struct arena_chunk_s *next;
+    Py_ssize_t size;
+    union_alignment alignment;   /* the data starts here */
+};
+#define ARENA_CHUNK_HEADER \
+                     ((Py_ssize_t)offsetof(struct arena_chunk_s, alignment))
+
+struct ArenaObject_s {
+    PyObject_HEAD
+    FFIObject *ar_ffi;
+    struct arena_chunk_s *ar_chunks;   /* the first one is the current one */
+    Py_ssize_t ar_used;          /* bytes used in the current chunk */
+    Py_ssize_t ar_chunk_size;
+    Py_ssize_t ar_allocated;     /* total bytes given out */
+    char ar_debug;
+    char ar_released;
+};
+
+static PyTypeObject Arena_Type;
+
+static void arena_free_chunks(struct arena_chunk_s *chunk)
+{
+    while (chunk != NULL) {
+        struct arena_chunk_s *next = chunk->next;
+        PyMem_Free(chunk);
+        chunk = next;
+    }
+}
+
+static char *arena_alloc(ArenaObject *ar, Py_ssize_t size)
+{
+    struct arena_chunk_s *chunk;
+    Py_ssize_t chunk_size;
+    char *result;
+
+    if (ar->ar_released) {
+        PyErr_SetString(PyExc_ValueError,
+                        "cannot allocate from an arena that was released");
+        return NULL;
+    }
+    if (size > PY_SSIZE_T_MAX - ARENA_CHUNK_HEADER - ARENA_ALIGN) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    size = (size + ARENA_ALIGN - 1) & ~(Py_ssize_t)(ARENA_ALIGN - 1);
+
+    chunk = ar->ar_chunks;
+    if (chunk == NULL || size > chunk->size - ar->ar_used) {
+        /* need a new chunk.  Allocations larger than the chunk size get
+           a chunk of their own, which is inserted after the current one
+           in order not to waste the rest of the current one. */
+        chunk_size = size > ar->ar_chunk_size ? size : ar->ar_chunk_size;
+        chunk = PyMem_Malloc(ARENA_CHUNK_HEADER + chunk_size);
+        if (chunk == NULL) {
+            PyErr_NoMemory();
+            return NULL;
+        }
+        chunk->size = chunk_size;
+        if (ar->ar_chunks != NULL && chunk_size > ar->ar_chunk_size) {
+            chunk->next = ar->ar_chunks->next;
+            ar->ar_chunks->next = chunk;
+            ar->ar_allocated += size;
+            return (char *)chunk + ARENA_CHUNK_HEADER;
+        }
+        chunk->next = ar->ar_chunks;
+        ar->ar_chunks = chunk;
+        ar->ar_used = 0;
+    }
+    result = (char *)chunk + ARENA_CHUNK_HEADER + ar->ar_used;
+    ar->ar_used += size;
+    ar->ar_allocated += size;
+    return result;
+}
+
+static void arena_do_release(ArenaObject *ar)
+{
+    struct arena_chunk_s *chunk;
+
+    if (ar->ar_released)
+        return;
+    ar->ar_released = 1;
+    if (ar->ar_debug) {
+        for (chunk = ar->ar_chunks; chunk != NULL; chunk = chunk->next)
+            memset((char *)chunk + ARENA_CHUNK_HEADER, ARENA_POISON,
+                   chunk->size);
+    }
+    else {
+        arena_free_chunks(ar->ar_chunks);
+        ar->ar_chunks = NULL;
+    }
+}
+
+static int arena_check_poison(ArenaObject *ar)
+{
+    /* returns 0 if the released chunks were not modified */
+    struct arena_chunk_s *chunk;
+    Py_ssize_t i;
+
+    for (chunk = ar->ar_chunks; chunk != NULL; chunk = chunk->next) {
+        unsigned char *p = (unsigned char *)chunk + ARENA_CHUNK_HEADER;
+        for (i = 0; i < chunk->size; i++)
+            if (p[i] != ARENA_POISON)
+                return -1;
+    }
+    return 0;
+}
+
+static void arena_dealloc(ArenaObject *ar)
+{
+    PyObject_GC_UnTrack(ar);
+    if (ar->ar_debug && ar->ar_released && arena_check_poison(ar) < 0) {
+        PyObject *t, *v, *tb;
+        PyErr_Fetch(&t, &v, &tb);
+        if (PyErr_WarnEx(PyExc_RuntimeWarning,
+                         "ffi.new_arena(debug=True): the memory of the "
+                         "arena was modified after release()", 1) < 0)
+            PyErr_WriteUnraisable((PyObject *)ar);
+        PyErr_Restore(t, v, tb);
+    }
+    arena_free_chunks(ar->ar_chunks);
+    Py_XDECREF(ar->ar_ffi);
+    Py_TYPE(ar)->tp_free((PyObject *)ar);
+}
+
+static int arena_traverse(ArenaObject *ar, visitproc visit, void *arg)
+{
+    Py_VISIT(ar->ar_ffi);
+    return 0;
+}
+
+static PyObject *_ffi_new(FFIObject *self, PyObject *args, PyObject *kwds,
+                          const cffi_allocator_t *allocator);   /* forward */
+
+static PyObject *arena_new_cdata(ArenaObject *ar, PyObject *args,
+                                 PyObject *kwds)
+{
+    cffi_allocator_t alloc1;
+    alloc1.ca_alloc = NULL;
+    alloc1.ca_free = NULL;
+    alloc1.ca_dont_clear = 0;
+    alloc1.ca_arena = ar;
+    alloc1.ca_c_alloc = NULL;
+    return _ffi_new(ar->ar_ffi, args, kwds, &alloc1);
+}
+
+static PyObject *arena_release(ArenaObject *ar, PyObject *noarg)
+{
+    arena_do_release(ar);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject *arena_enter(ArenaObject *ar, PyObject *noarg)
+{
+    Py_INCREF(ar);
+    return (PyObject *)ar;
+}
+
+static PyObject *arena_exit(ArenaObject *ar, PyObject *args)
+{
+    /* 'args' ignored */
+    arena_do_release(ar);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject *arena_get_released(ArenaObject *ar, void *context)
+{
+    return PyBool_FromLong(ar->ar_released);
+}
+
+static PyObject *arena_get_allocated(ArenaObject *ar, void *context)
+{
+    return PyInt_FromSsize_t(ar->ar_allocated);
+}
+
+PyDoc_STRVAR(arena_new_doc,
+"Allocate an instance according to the specified C type, like\n"
+"ffi.new(), but carving the memory out of this arena.  The memory is\n"
+"not freed when the returned cdata object goes away, but only when\n"
+"the whole arena is released.");
+
+PyDoc_STRVAR(arena_release_doc,
+"Free all the memory allocated from this arena.  The cdata objects\n"
+"returned by new() must not be used any more.");
+
+static PyMethodDef arena_methods[] = {
+    {"new",       (PyCFunction)arena_new_cdata, METH_VARARGS | METH_KEYWORDS,
+                                                          arena_new_doc},
+    {"release",   (PyCFunction)arena_release,   METH_NOARGS, arena_release_doc},
+    {"__enter__", (PyCFunction)arena_enter,     METH_NOARGS},
+    {"__exit__",  (PyCFunction)arena_exit,      METH_VARARGS},
+    {NULL}
+};
+
+static PyGetSetDef arena_getsets[] = {
+    {"released",  (getter)arena_get_released, NULL,
+     "True after release() was called"},
+    {"allocated", (getter)arena_get_allocated, NULL,
+     "number of bytes allocated from this arena"},
+    {NULL}
+};
+
+static PyTypeObject Arena_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_cffi_backend.Arena",
+    sizeof(ArenaObject),
+    0,
+    (destructor)arena_dealloc,                  /* tp_dealloc */
+    0,                                          /* tp_print */
+    0,                                          /* tp_getattr */
+    0,                                          /* tp_setattr */
+    0,                                          /* tp_compare */
+    0,                                          /* tp_repr */
+    0,                                          /* tp_as_number */
+    0,                                          /* tp_as_sequence */
+    0,                                          /* tp_as_mapping */
+    0,                                          /* tp_hash */
+    0,                                          /* tp_call */
+    0,                                          /* tp_str */
+    PyObject_GenericGetAttr,                    /* tp_getattro */
+    0,                                          /* tp_setattro */
+    0,                                          /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC,    /* tp_flags */
+    0,                                          /* tp_doc */
+    (traverseproc)arena_traverse,               /* tp_traverse */
+    0,                                          /* tp_clear */
+    0,                                          /* tp_richcompare */
+    0,                                          /* tp_weaklistoffset */
+    0,                                          /* tp_iter */
+    0,                                          /* tp_iternext */
+    arena_methods,                              /* tp_methods */
+    0,                                          /* tp_members */
+    arena_getsets,                              /* tp_getset */
+};
+
+static PyObject *arena_create(FFIObject *ffi, Py_ssize_t chunk_size,
+                              int debug)
+{
+    ArenaObject *ar;
+
+    if (chunk_size <= 0) {
+        PyErr_SetString(PyExc_ValueError, "'chunk_size' must be positive");
+        return NULL;
+    }
+    ar = PyObject_GC_New(ArenaObject, &Arena_Type);
+    if (ar == NULL)
+        return NULL;
+    Py_INCREF(ffi);
+    ar->ar_ffi = ffi;
+    ar->ar_chunks = NULL;
+    ar->ar_used = 0;
+    ar->ar_chunk_size = chunk_size;
+    ar->ar_allocated = 0;
+    ar->ar_debug = debug;
+    ar->ar_released = 0;
+    PyObject_GC_Track(ar);
+    return (PyObject *)ar;
+}
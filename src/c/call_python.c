@@ -13,6 +13,40 @@ static PyObject *_current_interp_key(void)
 #endif
 }
 
+/* In the common case, ffi.def_extern() is only ever called from one
+   interpreter.  Then 'extern_py_single_interp' is the ID of this
+   interpreter, and cffi_call_python() can use the cache in the externpy
+   structure after only checking that it runs in this interpreter.  As
+   soon as ffi.def_extern() is called from a second interpreter, it is
+   set to -1 for the rest of the process, and cffi_call_python() goes
+   back to checking the interpreter key every time.
+
+   We compare interpreter IDs, not PyInterpreterState pointers, because
+   the address of a finished subinterpreter can be reused by the next
+   one, whereas IDs are never reused.
+*/
+static int64_t extern_py_single_interp = -1;
+static int extern_py_many_interps = 0;
+
+static int64_t _current_interp_id(void)
+{
+    return PyInterpreterState_GetID(PyThreadState_GET()->interp);
+}
+
+static void _note_def_extern_interp(void)
+{
+    int64_t interp_id = _current_interp_id();
+    if (extern_py_many_interps || interp_id < 0)
+        return;
+    if (extern_py_single_interp < 0) {
+        extern_py_single_interp = interp_id;
+    }
+    else if (extern_py_single_interp != interp_id) {
+        extern_py_single_interp = -1;
+        extern_py_many_interps = 1;
+    }
+}
+
 static PyObject *_get_interpstate_dict(void)
 {
     /* Hack around to return a dict that is subinterpreter-local.
@@ -139,6 +173,7 @@ static PyObject *_ffi_def_extern_decorator(PyObject *outer_args, PyObject *fn)
     Py_DECREF(infotuple);    /* interpstate_dict owns the last ref */
     if (err < 0)
         return NULL;
+    _note_def_extern_interp();
 
     /* force _update_cache_to_call_python() to be called the next time
        the C function invokes cffi_call_python, to update the cache */
@@ -266,7 +301,15 @@ static void cffi_call_python(struct _cffi_externpy_s *externpy, char *args)
     }
     else {
         PyGILState_STATE state = gil_ensure();
-        if (externpy->reserved1 != _current_interp_key()) {
+        if (extern_py_single_interp >= 0 &&
+                _current_interp_id() == extern_py_single_interp &&
+                externpy->reserved1 != Py_None &&
+                externpy->reserved2 != NULL) {
+            /* Fast path: the cache was filled in the only interpreter
+               that ever called @ffi.def_extern(), which is also the
+               current one, so it is up-to-date. */
+        }
+        else if (externpy->reserved1 != _current_interp_key()) {
             /* Update the (reserved1, reserved2) cache.  This will fail
                if we didn't call @ffi.def_extern() in this particular
                subinterpreter. */
@@ -0,0 +1,260 @@
+/* Implementation of ffi.callback_factory(): an object that makes
+ * callbacks of one given function type, like ffi.callback(), but
+ * faster.  The checks on the function type and the conversion of the
+ * 'error' argument are done only once, when the factory is created.
+ * Moreover, when a callback made by the factory is deallocated, its
+ * closure is not freed but kept in a pool; the next callback reuses it
+ * without calling ffi_prep_closure() again.  This works because the
+ * closure was already prepared for the same function type, i.e. the
+ * same 'ffi_cif'; only its 'user_data' needs to be set.
+ *
+ * The callbacks made by a factory have a 5-items info tuple instead of
+ * the usual 4-items one: (ct, python_callable, rawerr, onerror, factory).
+ */
+
+#define CBF_DEFAULT_POOL_SIZE   64
+
+struct cbf_slot_s {
+    ffi_closure *closure;
+    char *fnptr;             /* the 'c_data' of the callback cdata */
+};
+
+typedef struct {
+    PyObject_HEAD
+    CTypeDescrObject *cf_ct;
+    PyObject *cf_rawerr;
+    PyObject *cf_onerror;
+    struct cbf_slot_s *cf_pool;
+    Py_ssize_t cf_pool_len;    /* number of closures ready in 'cf_pool' */
+    Py_ssize_t cf_pool_size;   /* maximum number of closures in 'cf_pool' */
+} CallbackFactoryObject;
+
+static PyTypeObject CallbackFactory_Type;
+
+static void cbf_free_closure(ffi_closure *closure)
+{
+#if CFFI_CHECK_FFI_CLOSURE_ALLOC_MAYBE
+    if (CFFI_CHECK_FFI_CLOSURE_ALLOC) {
+        ffi_closure_free(closure);
+    } else
+#endif
+        cffi_closure_free(closure);
+}
+
+static int cbfactory_recycle(PyObject *factory, ffi_closure *closure,
+                             char *fnptr)
+{
+    /* called when a callback made by 'factory' is deallocated.  Returns
+       0 if the closure was put in the pool, or -1 if it must be freed */
+    CallbackFactoryObject *cf = (CallbackFactoryObject *)factory;
+    struct cbf_slot_s *slot;
+
+    if (Py_TYPE(factory) != &CallbackFactory_Type ||
+            cf->cf_pool_len >= cf->cf_pool_size)
+        return -1;
+    closure->user_data = NULL;
+    slot = &cf->cf_pool[cf->cf_pool_len++];
+    slot->closure = closure;
+    slot->fnptr = fnptr;
+    return 0;
+}
+
+static PyObject *cbf_call(CallbackFactoryObject *cf, PyObject *args,
+                          PyObject *kwds)
+{
+    CDataObject_closure *cd;
+    struct cbf_slot_s *slot;
+    PyObject *ob, *infotuple;
+    static char *keywords[] = {"python_callable", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O:callback_factory",
+                                     keywords, &ob))
+        return NULL;
+    if (!PyCallable_Check(ob)) {
+        PyErr_Format(PyExc_TypeError,
+                     "expected a callable object, not %.200s",
+                     Py_TYPE(ob)->tp_name);
+        return NULL;
+    }
+    infotuple = PyTuple_Pack(5, cf->cf_ct, ob, cf->cf_rawerr,
+                             cf->cf_onerror, cf);
+    if (infotuple == NULL)
+        return NULL;
+
+    if (cf->cf_pool_len == 0)
+        return new_callback_object(cf->cf_ct, infotuple);
+
+    /* reuse a closure from the pool: it is already prepared */
+    cd = PyObject_GC_New(CDataObject_closure, &CDataOwningGC_Type);
+    if (cd == NULL) {
+        Py_DECREF(infotuple);
+        return NULL;
+    }
+    slot = &cf->cf_pool[--cf->cf_pool_len];
+    Py_INCREF(cf->cf_ct);
+    cd->head.c_type = cf->cf_ct;
+    cd->head.c_data = slot->fnptr;
+    cd->head.c_weakreflist = NULL;
+    CDATA_SET_VECTORCALL(&cd->head);
+    slot->closure->user_data = infotuple;
+    cd->closure = slot->closure;
+    PyObject_GC_Track(cd);
+    return (PyObject *)cd;
+}
+
+static void cbf_free_pool(CallbackFactoryObject *cf)
+{
+    while (cf->cf_pool_len > 0)
+        cbf_free_closure(cf->cf_pool[--cf->cf_pool_len].closure);
+}
+
+static int cbf_traverse(CallbackFactoryObject *cf, visitproc visit, void *arg)
+{
+    Py_VISIT(cf->cf_onerror);
+    return 0;
+}
+
+static int cbf_clear(CallbackFactoryObject *cf)
+{
+    PyObject *x = cf->cf_onerror;
+    Py_INCREF(Py_None);
+    cf->cf_onerror = Py_None;
+    Py_DECREF(x);
+    return 0;
+}
+
+static void cbf_dealloc(CallbackFactoryObject *cf)
+{
+    PyObject_GC_UnTrack(cf);
+    cbf_free_pool(cf);
+    PyMem_Free(cf->cf_pool);
+    Py_DECREF(cf->cf_ct);
+    Py_DECREF(cf->cf_rawerr);
+    Py_DECREF(cf->cf_onerror);
+    Py_TYPE(cf)->tp_free((PyObject *)cf);
+}
+
+static PyObject *cbf_trim(CallbackFactoryObject *cf, PyObject *noarg)
+{
+    cbf_free_pool(cf);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject *cbf_get_ctype(CallbackFactoryObject *cf, void *context)
+{
+    Py_INCREF(cf->cf_ct);
+    return (PyObject *)cf->cf_ct;
+}
+
+static PyObject *cbf_get_pooled(CallbackFactoryObject *cf, void *context)
+{
+    return PyInt_FromSsize_t(cf->cf_pool_len);
+}
+
+PyDoc_STRVAR(cbf_trim_doc,
+"Free the closures that are kept in the pool of this factory.");
+
+static PyMethodDef cbf_methods[] = {
+    {"trim",      (PyCFunction)cbf_trim,      METH_NOARGS, cbf_trim_doc},
+    {NULL}
+};
+
+static PyGetSetDef cbf_getsets[] = {
+    {"ctype",     (getter)cbf_get_ctype, NULL,
+     "the function pointer ctype of the callbacks"},
+    {"pooled",    (getter)cbf_get_pooled, NULL,
+     "number of closures kept ready for the next callbacks"},
+    {NULL}
+};
+
+static PyTypeObject CallbackFactory_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_cffi_backend.CallbackFactory",
+    sizeof(CallbackFactoryObject),
+    0,
+    (destructor)cbf_dealloc,                    /* tp_dealloc */
+    0,                                          /* tp_print */
+    0,                                          /* tp_getattr */
+    0,                                          /* tp_setattr */
+    0,                                          /* tp_compare */
+    0,                                          /* tp_repr */
+    0,                                          /* tp_as_number */
+    0,                                          /* tp_as_sequence */
+    0,                                          /* tp_as_mapping */
+    0,                                          /* tp_hash */
+    (ternaryfunc)cbf_call,                      /* tp_call */
+    0,                                          /* tp_str */
+    PyObject_GenericGetAttr,                    /* tp_getattro */
+    0,                                          /* tp_setattro */
+    0,                                          /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC,    /* tp_flags */
+    0,                                          /* tp_doc */
+    (traverseproc)cbf_traverse,                 /* tp_traverse */
+    (inquiry)cbf_clear,                         /* tp_clear */
+    0,                                          /* tp_richcompare */
+    0,                                          /* tp_weaklistoffset */
+    0,                                          /* tp_iter */
+    0,                                          /* tp_iternext */
+    cbf_methods,                                /* tp_methods */
+    0,                                          /* tp_members */
+    cbf_getsets,                                /* tp_getset */
+};
+
+static PyObject *callback_factory_create(CTypeDescrObject *ct,
+                                         PyObject *error_ob,
+                                         PyObject *onerror_ob,
+                                         Py_ssize_t pool_size)
+{
+    CallbackFactoryObject *cf;
+    PyObject *py_rawerr;
+
+    if (!(ct->ct_flags & CT_FUNCTIONPTR)) {
+        PyErr_Format(PyExc_TypeError, "expected a function ctype, got '%s'",
+                     ct->ct_name);
+        return NULL;
+    }
+    if (ct->ct_extra == NULL) {
+        PyErr_Format(PyExc_NotImplementedError,
+                     "%s: callback with unsupported argument or "
+                     "return type or with '...'", ct->ct_name);
+        return NULL;
+    }
+    if (onerror_ob != Py_None && !PyCallable_Check(onerror_ob)) {
+        PyErr_Format(PyExc_TypeError,
+                     "expected a callable object for 'onerror', not %.200s",
+                     Py_TYPE(onerror_ob)->tp_name);
+        return NULL;
+    }
+    if (pool_size < 0) {
+        PyErr_SetString(PyExc_ValueError, "'pool_size' must be >= 0");
+        return NULL;
+    }
+    py_rawerr = prepare_callback_rawerr(ct, error_ob, 1);
+    if (py_rawerr == NULL)
+        return NULL;
+
+    cf = PyObject_GC_New(CallbackFactoryObject, &CallbackFactory_Type);
+    if (cf == NULL) {
+        Py_DECREF(py_rawerr);
+        return NULL;
+    }
+    Py_INCREF(ct);
+    cf->cf_ct = ct;
+    cf->cf_rawerr = py_rawerr;
+    Py_INCREF(onerror_ob);
+    cf->cf_onerror = onerror_ob;
+    cf->cf_pool = NULL;
+    cf->cf_pool_len = 0;
+    cf->cf_pool_size = 0;
+    if (pool_size > 0) {
+        cf->cf_pool = PyMem_New(struct cbf_slot_s, pool_size);
+        if (cf->cf_pool == NULL) {
+            Py_DECREF(cf);
+            return PyErr_NoMemory();
+        }
+        cf->cf_pool_size = pool_size;
+    }
+    PyObject_GC_Track(cf);
+    return (PyObject *)cf;
+}
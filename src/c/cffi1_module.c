@@ -4,7 +4,8 @@
 
 #define CFFI_VERSION_MIN            0x2601
 #define CFFI_VERSION_CHAR16CHAR32   0x2801
-#define CFFI_VERSION_MAX            0x28FF
+#define CFFI_VERSION_BUFFER_ARGS    0x2902
+#define CFFI_VERSION_MAX            0x29FF
 
 typedef struct FFIObject_s FFIObject;
 typedef struct LibObject_s LibObject;
@@ -12,6 +13,9 @@ typedef struct LibObject_s LibObject;
 static PyTypeObject FFI_Type;   /* forward */
 static PyTypeObject Lib_Type;   /* forward */
 
+#include "arena.c"
+#include "handle_table.c"
+#include "callback_factory.c"
 #include "ffi_obj.c"
 #include "cglob.c"
 #include "lib_obj.c"
@@ -171,6 +175,8 @@ static PyObject *b_init_cffi_1_0_external_module(PyObject *self, PyObject *arg)
         num_exports = 26;
     if (version >= CFFI_VERSION_CHAR16CHAR32)
         num_exports = 28;
+    if (version >= CFFI_VERSION_BUFFER_ARGS)
+        num_exports = 29;
     memcpy(exports, (char *)cffi_exports, num_exports * sizeof(void *));
 
     /* make the module object */
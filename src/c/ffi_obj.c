@@ -17,6 +17,7 @@
 */
 
 #define FFI_COMPLEXITY_OUTPUT   1200     /* xxx should grow as needed */
+#define FFI_TYPE_CACHE_DEFAULT_LIMIT  1000
 
 #define FFIObject_Check(op) PyObject_TypeCheck(op, &FFI_Type)
 #define LibObject_Check(ob)  ((Py_TYPE(ob) == &Lib_Type))
@@ -28,6 +29,9 @@ struct FFIObject_s {
     struct _cffi_parse_info_s info;
     char ctx_is_static, ctx_is_nonempty;
     builder_c_t types_builder;
+    PyObject *types_adhoc, *types_adhoc_old;  /* see _ffi_type_cache_store() */
+    Py_ssize_t types_adhoc_limit;
+    Py_ssize_t types_hits, types_misses;
 };
 
 static FFIObject *ffi_internal_new(PyTypeObject *ffitype,
@@ -54,6 +58,11 @@ static FFIObject *ffi_internal_new(PyTypeObject *ffitype,
     ffi->gc_wrefs = NULL;
     ffi->gc_wrefs_freelist = NULL;
     ffi->init_once_cache = NULL;
+    ffi->types_adhoc = NULL;
+    ffi->types_adhoc_old = NULL;
+    ffi->types_adhoc_limit = FFI_TYPE_CACHE_DEFAULT_LIMIT;
+    ffi->types_hits = 0;
+    ffi->types_misses = 0;
     ffi->info.ctx = &ffi->types_builder.ctx;
     ffi->info.output = internal_output;
     ffi->info.output_size = FFI_COMPLEXITY_OUTPUT;
@@ -68,6 +77,8 @@ static void ffi_dealloc(FFIObject *ffi)
     Py_XDECREF(ffi->gc_wrefs);
     Py_XDECREF(ffi->gc_wrefs_freelist);
     Py_XDECREF(ffi->init_once_cache);
+    Py_XDECREF(ffi->types_adhoc);
+    Py_XDECREF(ffi->types_adhoc_old);
 
     free_builder_c(&ffi->types_builder, ffi->ctx_is_static);
 
@@ -77,6 +88,8 @@ static void ffi_dealloc(FFIObject *ffi)
 static int ffi_traverse(FFIObject *ffi, visitproc visit, void *arg)
 {
     Py_VISIT(ffi->types_builder.types_dict);
+    Py_VISIT(ffi->types_adhoc);
+    Py_VISIT(ffi->types_adhoc_old);
     Py_VISIT(ffi->types_builder.included_ffis);
     Py_VISIT(ffi->types_builder.included_libs);
     Py_VISIT(ffi->gc_wrefs);
@@ -177,54 +190,138 @@ static CTypeDescrObject *_ffi_bad_type(FFIObject *ffi, const char *input_text)
     return NULL;
 }
 
+/* The strings given to _ffi_type() are cached in two places.  If the
+   string is exactly the name of a type (a primitive type, a typedef, or
+   a struct, union or enum), it goes to 'types_dict', where it stays for
+   the lifetime of the ffi; there are only a limited number of them.
+   Other strings, like "int *" or "char[%d]" % n, go to a bounded
+   cache of at most 'types_adhoc_limit' entries.  This cache is made of
+   two generations: when 'types_adhoc' is full, it becomes
+   'types_adhoc_old' and the previous 'types_adhoc_old' is dropped.  A
+   string found in 'types_adhoc_old' is moved back to 'types_adhoc'.
+   This approximates a LRU without any bookkeeping on the common path,
+   which is a hit in 'types_adhoc'.
+*/
+
+static int _ffi_type_cache_store(FFIObject *ffi, PyObject *arg, PyObject *x)
+{
+    Py_ssize_t generation_size = ffi->types_adhoc_limit / 2;
+    if (generation_size <= 0)
+        return 0;     /* the cache is disabled */
+
+    if (ffi->types_adhoc != NULL &&
+            PyDict_Size(ffi->types_adhoc) >= generation_size) {
+        /* start a new generation */
+        Py_CLEAR(ffi->types_adhoc_old);
+        ffi->types_adhoc_old = ffi->types_adhoc;
+        ffi->types_adhoc = NULL;
+    }
+    if (ffi->types_adhoc == NULL) {
+        ffi->types_adhoc = PyDict_New();
+        if (ffi->types_adhoc == NULL)
+            return -1;
+    }
+    return PyDict_SetItem(ffi->types_adhoc, arg, x);
+}
+
+static PyObject *_ffi_type_cache_lookup(FFIObject *ffi, PyObject *arg)
+{
+    /* Returns a new reference, or NULL without an exception set */
+    PyObject *x;
+
+    x = PyDict_GetItem(ffi->types_builder.types_dict, arg);
+    if (x == NULL && ffi->types_adhoc != NULL) {
+        x = PyDict_GetItem(ffi->types_adhoc, arg);
+        if (x == NULL && ffi->types_adhoc_old != NULL) {
+            x = PyDict_GetItem(ffi->types_adhoc_old, arg);
+            if (x != NULL) {
+                Py_INCREF(x);
+                if (PyDict_DelItem(ffi->types_adhoc_old, arg) < 0 ||
+                        _ffi_type_cache_store(ffi, arg, x) < 0)
+                    PyErr_Clear();
+                return x;
+            }
+        }
+    }
+    Py_XINCREF(x);
+    return x;
+}
+
 static CTypeDescrObject *_ffi_type(FFIObject *ffi, PyObject *arg,
                                    int accept)
 {
     /* Returns the CTypeDescrObject from the user-supplied 'arg'.
-       Does not return a new reference!
+       Returns a new reference.
     */
     if ((accept & ACCEPT_STRING) && PyText_Check(arg)) {
-        PyObject *types_dict = ffi->types_builder.types_dict;
-        PyObject *x = PyDict_GetItem(types_dict, arg);
+        PyObject *x = _ffi_type_cache_lookup(ffi, arg);
 
-        if (x == NULL) {
+        if (x != NULL) {
+            ffi->types_hits++;
+        }
+        else {
             const char *input_text = PyText_AS_UTF8(arg);
-            int err, index = parse_c_type(&ffi->info, input_text);
+            const char *name = NULL;
+            int err, op, index = parse_c_type(&ffi->info, input_text);
             if (index < 0)
                 return _ffi_bad_type(ffi, input_text);
+            op = _CFFI_GETOP(ffi->info.output[index]);
+            if (op == _CFFI_OP_TYPENAME)
+                name = ffi->types_builder.ctx.typenames[
+                           _CFFI_GETARG(ffi->info.output[index])].name;
 
             x = realize_c_type_or_func(&ffi->types_builder,
                                        ffi->info.output, index);
             if (x == NULL)
                 return NULL;
+            ffi->types_misses++;
 
             /* Cache under the name given by 'arg', in addition to the
                fact that the same ct is probably already cached under
                its standardized name.  In a few cases, it is not, e.g.
                if it is a primitive; for the purpose of this function,
                the important point is the following line, which makes
-               sure that in any case the next _ffi_type() with the same
-               'arg' will succeed early, in PyDict_GetItem() above.
+               sure that the next _ffi_type() with the same 'arg' will
+               usually succeed early, in _ffi_type_cache_lookup() above.
             */
-            err = PyDict_SetItem(types_dict, arg, x);
-            Py_DECREF(x); /* we know it was written in types_dict (unless out
-                             of mem), so there is at least that ref left */
-            if (err < 0)
+            if ((op == _CFFI_OP_PRIMITIVE || op == _CFFI_OP_STRUCT_UNION ||
+                 op == _CFFI_OP_ENUM) && CTypeDescr_Check(x))
+                name = ((CTypeDescrObject *)x)->ct_name;
+            /* only the exact name goes to the permanent cache, not the
+               variants like "int " or "const foo_t" */
+            if (name != NULL && strcmp(input_text, name) == 0)
+                err = PyDict_SetItem(ffi->types_builder.types_dict, arg, x);
+            else
+                err = _ffi_type_cache_store(ffi, arg, x);
+            if (err < 0) {
+                Py_DECREF(x);
                 return NULL;
+            }
         }
 
-        if (CTypeDescr_Check(x))
+        if (CTypeDescr_Check(x)) {
             return (CTypeDescrObject *)x;
-        else if (accept & CONSIDER_FN_AS_FNPTR)
-            return unwrap_fn_as_fnptr(x);
-        else
-            return unexpected_fn_type(x);
+        }
+        else {
+            CTypeDescrObject *ct = NULL;
+            if (accept & CONSIDER_FN_AS_FNPTR) {
+                ct = unwrap_fn_as_fnptr(x);
+                Py_INCREF(ct);
+            }
+            else
+                unexpected_fn_type(x);
+            Py_DECREF(x);
+            return ct;
+        }
     }
     else if ((accept & ACCEPT_CTYPE) && CTypeDescr_Check(arg)) {
+        Py_INCREF(arg);
         return (CTypeDescrObject *)arg;
     }
     else if ((accept & ACCEPT_CDATA) && CData_Check(arg)) {
-        return ((CDataObject *)arg)->c_type;
+        CTypeDescrObject *ct = ((CDataObject *)arg)->c_type;
+        Py_INCREF(ct);
+        return ct;
     }
 #if PY_MAJOR_VERSION < 3
     else if (PyUnicode_Check(arg)) {
@@ -269,8 +366,10 @@ static PyObject *ffi_sizeof(FFIObject *self, PyObject *arg)
         if (size < 0) {
             PyErr_Format(FFIError, "don't know the size of ctype '%s'",
                          ct->ct_name);
+            Py_DECREF(ct);
             return NULL;
         }
+        Py_DECREF(ct);
     }
     return PyInt_FromSsize_t(size);
 }
@@ -287,6 +386,7 @@ static PyObject *ffi_alignof(FFIObject *self, PyObject *arg)
         return NULL;
 
     align = get_alignment(ct);
+    Py_DECREF(ct);
     if (align < 0)
         return NULL;
     return PyInt_FromLong(align);
@@ -302,12 +402,8 @@ static PyObject *_cpyextfunc_type_index(PyObject *x);  /* forward */
 static PyObject *ffi_typeof(FFIObject *self, PyObject *arg)
 {
     PyObject *x = (PyObject *)_ffi_type(self, arg, ACCEPT_STRING|ACCEPT_CDATA);
-    if (x != NULL) {
-        Py_INCREF(x);
-    }
-    else {
+    if (x == NULL)
         x = _cpyextfunc_type_index(arg);
-    }
     return x;
 }
 
@@ -336,7 +432,7 @@ static PyObject *_ffi_new(FFIObject *self, PyObject *args, PyObject *kwds,
                           const cffi_allocator_t *allocator)
 {
     CTypeDescrObject *ct;
-    PyObject *arg, *init = Py_None;
+    PyObject *arg, *init = Py_None, *res;
     static char *keywords[] = {"cdecl", "init", NULL};
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|O:new", keywords,
                                      &arg, &init))
@@ -346,7 +442,9 @@ static PyObject *_ffi_new(FFIObject *self, PyObject *args, PyObject *kwds,
     if (ct == NULL)
         return NULL;
 
-    return direct_newp(ct, init, allocator);
+    res = direct_newp(ct, init, allocator);
+    Py_DECREF(ct);
+    return res;
 }
 
 static PyObject *ffi_new(FFIObject *self, PyObject *args, PyObject *kwds)
@@ -354,6 +452,44 @@ static PyObject *ffi_new(FFIObject *self, PyObject *args, PyObject *kwds)
     return _ffi_new(self, args, kwds, &default_allocator);
 }
 
+static void *_ffi_allocator_c_function(PyObject *x, int is_free)
+{
+    /* If 'x' is a cdata C function of type 'void *(*)(size_t)' (or
+       'void (*)(void *)' if 'is_free'), with any pointer types, return
+       its address.  Otherwise return NULL: it is then called via
+       Python like any other callable. */
+    CDataObject *cd;
+    CTypeDescrObject *ct, *ctres, *ctarg;
+
+    if (!CData_Check(x))
+        return NULL;
+    cd = (CDataObject *)x;
+    ct = cd->c_type;
+    if (!(ct->ct_flags & CT_FUNCTIONPTR) || cd->c_data == NULL)
+        return NULL;
+    if (ct->ct_extra == NULL)          /* variadic */
+        return NULL;
+    if (PyTuple_GET_SIZE(ct->ct_stuff) != 3)    /* (abi, result, arg) */
+        return NULL;
+    if (PyInt_AsLong(PyTuple_GET_ITEM(ct->ct_stuff, 0)) != FFI_DEFAULT_ABI)
+        return NULL;
+    ctres = (CTypeDescrObject *)PyTuple_GET_ITEM(ct->ct_stuff, 1);
+    ctarg = (CTypeDescrObject *)PyTuple_GET_ITEM(ct->ct_stuff, 2);
+    if (is_free) {
+        if (!(ctres->ct_flags & CT_VOID) || !(ctarg->ct_flags & CT_POINTER))
+            return NULL;
+    }
+    else {
+        if (!(ctres->ct_flags & CT_POINTER))
+            return NULL;
+        if (!(ctarg->ct_flags & (CT_PRIMITIVE_SIGNED|CT_PRIMITIVE_UNSIGNED))
+                || (ctarg->ct_flags & CT_IS_BOOL)
+                || ctarg->ct_size != sizeof(size_t))
+            return NULL;
+    }
+    return cd->c_data;
+}
+
 static PyObject *_ffi_new_with_allocator(PyObject *allocator, PyObject *args,
                                          PyObject *kwds)
 {
@@ -364,6 +500,13 @@ static PyObject *_ffi_new_with_allocator(PyObject *allocator, PyObject *args,
     alloc1.ca_alloc = (my_alloc == Py_None ? NULL : my_alloc);
     alloc1.ca_free  = (my_free  == Py_None ? NULL : my_free);
     alloc1.ca_dont_clear = (PyTuple_GET_ITEM(allocator, 3) == Py_False);
+    alloc1.ca_arena = NULL;
+    alloc1.ca_c_alloc = NULL;
+    if (alloc1.ca_alloc != NULL &&
+            (alloc1.ca_free == NULL ||
+             _ffi_allocator_c_function(alloc1.ca_free, 1) != NULL))
+        alloc1.ca_c_alloc = (void *(*)(size_t))_ffi_allocator_c_function(
+                                                        alloc1.ca_alloc, 0);
 
     return _ffi_new((FFIObject *)PyTuple_GET_ITEM(allocator, 0),
                     args, kwds, &alloc1);
@@ -376,7 +519,10 @@ PyDoc_STRVAR(ffi_new_allocator_doc,
 "'alloc' is called with the size as argument.  If it returns NULL, a\n"
 "MemoryError is raised.  'free' is called with the result of 'alloc'\n"
 "as argument.  Both can be either Python functions or directly C\n"
-"functions.  If 'free' is None, then no free function is called.\n"
+"functions.  If they are C functions with the signatures\n"
+"'void *(size_t)' and 'void(void *)', they are called directly\n"
+"without going through Python.  If 'free' is None, then no free\n"
+"function is called.\n"
 "If both 'alloc' and 'free' are None, the default is used.\n"
 "\n"
 "If 'should_clear_after_alloc' is set to False, then the memory\n"
@@ -419,6 +565,29 @@ static PyObject *ffi_new_allocator(FFIObject *self, PyObject *args,
     return result;
 }
 
+PyDoc_STRVAR(ffi_new_arena_doc,
+"Return a new arena.  Its method new() behaves like ffi.new(), but\n"
+"carves the memory out of chunks of 'chunk_size' bytes.  All this\n"
+"memory is freed at once by release(), or at the end of a 'with'\n"
+"statement.  The cdata objects obtained from the arena must not be used\n"
+"after that.\n"
+"\n"
+"If 'debug' is True, then release() fills the memory with the byte\n"
+"0xDD instead of freeing it, and a RuntimeWarning is issued if this\n"
+"memory is found modified when it is really freed.");
+
+static PyObject *ffi_new_arena(FFIObject *self, PyObject *args,
+                               PyObject *kwds)
+{
+    Py_ssize_t chunk_size = ARENA_DEFAULT_CHUNK_SIZE;
+    int debug = 0;
+    static char *keywords[] = {"chunk_size", "debug", NULL};
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|ni:new_arena", keywords,
+                                     &chunk_size, &debug))
+        return NULL;
+    return arena_create(self, chunk_size, debug);
+}
+
 PyDoc_STRVAR(ffi_cast_doc,
 "Similar to a C cast: returns an instance of the named C\n"
 "type initialized with the given 'source'.  The source is\n"
@@ -427,7 +596,7 @@ PyDoc_STRVAR(ffi_cast_doc,
 static PyObject *ffi_cast(FFIObject *self, PyObject *args)
 {
     CTypeDescrObject *ct;
-    PyObject *ob, *arg;
+    PyObject *ob, *arg, *res;
     if (!PyArg_ParseTuple(args, "OO:cast", &arg, &ob))
         return NULL;
 
@@ -435,7 +604,9 @@ static PyObject *ffi_cast(FFIObject *self, PyObject *args)
     if (ct == NULL)
         return NULL;
 
-    return do_cast(ct, ob);
+    res = do_cast(ct, ob);
+    Py_DECREF(ct);
+    return res;
 }
 
 PyDoc_STRVAR(ffi_string_doc,
@@ -470,11 +641,50 @@ PyDoc_STRVAR(ffi_unpack_doc,
 "\n"
 "If 'cdata' is a pointer to anything else, returns a list of\n"
 "'length' items.  This is a faster equivalent to:\n"
-"[cdata[i] for i in range(length)]");
+"[cdata[i] for i in range(length)]\n"
+"\n"
+"With 'as_', returns instead a copy of the raw bytes (as_='bytes'),\n"
+"an array.array copy (as_='array'), or a typed memoryview that\n"
+"refers to the original memory (as_='memoryview').  The last two\n"
+"are only for primitive number types.");
 
 #define ffi_unpack  b_unpack     /* ffi_unpack() => b_unpack()
                                     from _cffi_backend.c */
 
+PyDoc_STRVAR(ffi_memoryview_doc,
+"Return a memoryview of the C data pointed to by the given 'cdata',\n"
+"which must be a pointer or an array.  Unlike ffi.buffer(), the\n"
+"memoryview has the PEP 3118 format, itemsize and shape of the C type:\n"
+"for example 'd' for 'double[]', 'T{...}' for structs, and a shape of\n"
+"(4, 8) for 'int[4][8]'.  'length' is the number of items; by default\n"
+"it is the length of the array, or 1 for a pointer.");
+
+#define ffi_memoryview  b_typed_memoryview  /* ffi_memoryview() =>
+                                    b_typed_memoryview() from _cffi_backend.c */
+
+PyDoc_STRVAR(ffi_gather_doc,
+"Read the field 'fieldname' of all the structs in the array 'cdata',\n"
+"returning a Python list.  This is a faster equivalent to:\n"
+"[cdata[i].fieldname for i in range(length)]\n"
+"\n"
+"'length' defaults to the length of the array; it is required if\n"
+"'cdata' is a pointer.  If 'out' is given, it must be a writable buffer\n"
+"with items of the field's type; the values are copied into it and\n"
+"'out' is returned instead of a list.");
+
+#define ffi_gather  b_gather     /* ffi_gather() => b_gather()
+                                    from _cffi_backend.c */
+
+PyDoc_STRVAR(ffi_scatter_doc,
+"Write the field 'fieldname' of the structs in the array 'cdata' from\n"
+"the items of the sequence 'values'.  This is a faster equivalent to:\n"
+"for i, value in enumerate(values): cdata[i].fieldname = value\n"
+"\n"
+"'values' can also be a buffer with items of the field's type.");
+
+#define ffi_scatter  b_scatter   /* ffi_scatter() => b_scatter()
+                                    from _cffi_backend.c */
+
 
 PyDoc_STRVAR(ffi_offsetof_doc,
 "Return the offset of the named field inside the given structure or\n"
@@ -485,7 +695,7 @@ PyDoc_STRVAR(ffi_offsetof_doc,
 static PyObject *ffi_offsetof(FFIObject *self, PyObject *args)
 {
     PyObject *arg;
-    CTypeDescrObject *ct;
+    CTypeDescrObject *ct, *ct0;
     Py_ssize_t i, offset;
 
     if (PyTuple_Size(args) < 2) {
@@ -495,7 +705,7 @@ static PyObject *ffi_offsetof(FFIObject *self, PyObject *args)
     }
 
     arg = PyTuple_GET_ITEM(args, 0);
-    ct = _ffi_type(self, arg, ACCEPT_STRING|ACCEPT_CTYPE);
+    ct = ct0 = _ffi_type(self, arg, ACCEPT_STRING|ACCEPT_CTYPE);
     if (ct == NULL)
         return NULL;
 
@@ -503,10 +713,13 @@ static PyObject *ffi_offsetof(FFIObject *self, PyObject *args)
     for (i = 1; i < PyTuple_GET_SIZE(args); i++) {
         Py_ssize_t ofs1;
         ct = direct_typeoffsetof(ct, PyTuple_GET_ITEM(args, i), i > 1, &ofs1);
-        if (ct == NULL)
+        if (ct == NULL) {
+            Py_DECREF(ct0);
             return NULL;
+        }
         offset += ofs1;
     }
+    Py_DECREF(ct0);
     return PyInt_FromSsize_t(offset);
 }
 
@@ -547,6 +760,7 @@ static PyObject *ffi_addressof(FFIObject *self, PyObject *args)
     ct = _ffi_type(self, arg, ACCEPT_CDATA);
     if (ct == NULL)
         return NULL;
+    Py_DECREF(ct);    /* 'ct' is still kept alive by the cdata 'arg' */
 
     if (PyTuple_GET_SIZE(args) == 1) {
         /* case 1 in the docstring */
@@ -644,10 +858,13 @@ static PyObject *ffi_getctype(FFIObject *self, PyObject *args, PyObject *kwds)
                  replace_with[0] != '[' && replace_with[0] != '(');
 
     res = _combine_type_name_l(ct, replace_with_len + add_space + 2*add_paren);
-    if (res == NULL)
+    if (res == NULL) {
+        Py_DECREF(ct);
         return NULL;
+    }
 
     p = PyBytes_AS_STRING(res) + ct->ct_name_position;
+    Py_DECREF(ct);
     if (add_paren)
         *p++ = '(';
     if (add_space)
@@ -689,6 +906,19 @@ PyDoc_STRVAR(ffi_from_handle_doc,
 #define ffi_from_handle  b_from_handle   /* ffi_from_handle => b_from_handle
                                             from _cffi_backend.c */
 
+PyDoc_STRVAR(ffi_new_handle_table_doc,
+"Return a new handle table.  Its method new(x) returns a 'void *'\n"
+"handle that refers to the Python object 'x', like ffi.new_handle(),\n"
+"but the handle stays valid until it is explicitly released with\n"
+"release(handle).  get(handle) returns the Python object, or raises\n"
+"KeyError if the handle was already released.  The handles are small\n"
+"integers (a table index and a generation counter), not addresses.");
+
+static PyObject *ffi_new_handle_table(FFIObject *self, PyObject *noarg)
+{
+    return handle_table_create();
+}
+
 PyDoc_STRVAR(ffi_from_buffer_doc,
 "Return a <cdata 'char[]'> that points to the data of the given Python\n"
 "object, which must support the buffer interface.  Note that this is\n"
@@ -700,7 +930,7 @@ PyDoc_STRVAR(ffi_from_buffer_doc,
 static PyObject *ffi_from_buffer(FFIObject *self, PyObject *args,
                                  PyObject *kwds)
 {
-    PyObject *cdecl1, *python_buf = NULL;
+    PyObject *cdecl1, *python_buf = NULL, *res;
     CTypeDescrObject *ct;
     int require_writable = 0;
     static char *keywords[] = {"cdecl", "python_buffer",
@@ -713,13 +943,16 @@ static PyObject *ffi_from_buffer(FFIObject *self, PyObject *args,
     if (python_buf == NULL) {
         python_buf = cdecl1;
         ct = g_ct_chararray;
+        Py_INCREF(ct);
     }
     else {
         ct = _ffi_type(self, cdecl1, ACCEPT_STRING|ACCEPT_CTYPE);
         if (ct == NULL)
             return NULL;
     }
-    return direct_from_buffer(ct, python_buf, require_writable);
+    res = direct_from_buffer(ct, python_buf, require_writable);
+    Py_DECREF(ct);
+    return res;
 }
 
 PyDoc_STRVAR(ffi_gc_doc,
@@ -728,13 +961,57 @@ PyDoc_STRVAR(ffi_gc_doc,
 "'destructor(old_cdata_object)' will be called.\n"
 "\n"
 "The optional 'size' gives an estimate of the size, used to\n"
-"trigger the garbage collection more eagerly.  So far only used\n"
-"on PyPy.  It tells the GC that the returned object keeps alive\n"
-"roughly 'size' bytes of external memory.");
+"trigger the garbage collection more eagerly.  It tells the GC that\n"
+"the returned object keeps alive roughly 'size' bytes of external\n"
+"memory.  See ffi.external_memory_stats().\n"
+"\n"
+"If 'deferred' is True, the destructor is not called when the object\n"
+"is garbage-collected, but only queued; see ffi.drain_destructors().");
 
 #define ffi_gc  b_gcp     /* ffi_gc() => b_gcp()
                              from _cffi_backend.c */
 
+PyDoc_STRVAR(ffi_closure_stats_doc,
+"Return a dict about the memory used by ffi.callback(): 'mapped_pages'\n"
+"and 'chunks' give the number of pages of executable memory and the\n"
+"number of blocks of pages currently mapped, 'page_size' the size of\n"
+"a page, 'live_closures' the number of callbacks alive, and\n"
+"'free_slots' the number of callbacks that can still be created\n"
+"without mapping more pages.");
+
+#define ffi_closure_stats  b_closure_stats  /* ffi_closure_stats() =>
+                                       b_closure_stats() from _cffi_backend.c */
+
+PyDoc_STRVAR(ffi_drain_destructors_doc,
+"Call the destructors queued by the objects returned by\n"
+"ffi.gc(..., deferred=True) that were garbage-collected.  They are\n"
+"called in the order in which these objects were garbage-collected.\n"
+"Returns the number of destructors called.");
+
+#define ffi_drain_destructors  b_drain_destructors  /* ffi_drain_destructors()
+                                  => b_drain_destructors() from _cffi_backend.c */
+
+PyDoc_STRVAR(ffi_external_memory_stats_doc,
+"Return a dict about the external memory declared with\n"
+"ffi.gc(..., size=n): 'bytes' is the total size currently held by the\n"
+"living objects, 'threshold' is the growth of 'bytes' after which a\n"
+"full garbage collection is scheduled, and 'collections' counts these\n"
+"collections so far.");
+
+/* ffi_external_memory_stats() => b_external_memory_stats()
+   from _cffi_backend.c */
+#define ffi_external_memory_stats  b_external_memory_stats
+
+PyDoc_STRVAR(ffi_set_external_memory_threshold_doc,
+"Set the growth, in bytes, of the external memory declared with\n"
+"ffi.gc(..., size=n) after which a full garbage collection is\n"
+"scheduled.  0 disables these collections.  Returns the previous\n"
+"threshold.");
+
+/* ffi_set_external_memory_threshold() => b_set_external_memory_threshold()
+   from _cffi_backend.c */
+#define ffi_set_external_memory_threshold  b_set_external_memory_threshold
+
 PyDoc_STRVAR(ffi_def_extern_doc,
 "A decorator.  Attaches the decorated Python function to the C code\n"
 "generated for the 'extern \"Python\"' function of the same name.\n"
@@ -806,6 +1083,7 @@ static PyObject *ffi_callback(FFIObject *self, PyObject *args, PyObject *kwds)
         return NULL;
 
     args = Py_BuildValue("(OOOO)", c_decl, python_callable, error, onerror);
+    Py_DECREF(c_decl);
     if (args == NULL)
         return NULL;
 
@@ -821,6 +1099,37 @@ static PyObject *ffi_callback(FFIObject *self, PyObject *args, PyObject *kwds)
     return res;
 }
 
+PyDoc_STRVAR(ffi_callback_factory_doc,
+"Return a factory that makes callbacks of the C function pointer type\n"
+"'cdecl'.  Calling the factory with a Python callable returns a callback\n"
+"object, like ffi.callback(cdecl, python_callable, error, onerror).  It\n"
+"is faster if many callbacks are made with the same type: the closures\n"
+"of the callbacks that are gone are kept (up to 'pool_size') and reused.");
+
+static PyObject *ffi_callback_factory(FFIObject *self, PyObject *args,
+                                      PyObject *kwds)
+{
+    PyObject *c_decl, *error = Py_None, *onerror = Py_None, *res;
+    Py_ssize_t pool_size = CBF_DEFAULT_POOL_SIZE;
+    CTypeDescrObject *ct;
+    static char *keywords[] = {"cdecl", "error", "onerror", "pool_size",
+                               NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|OOn:callback_factory",
+                                     keywords, &c_decl, &error, &onerror,
+                                     &pool_size))
+        return NULL;
+
+    ct = _ffi_type(self, c_decl, ACCEPT_STRING | ACCEPT_CTYPE |
+                                 CONSIDER_FN_AS_FNPTR);
+    if (ct == NULL)
+        return NULL;
+
+    res = callback_factory_create(ct, error, onerror, pool_size);
+    Py_DECREF(ct);
+    return res;
+}
+
 #ifdef MS_WIN32
 PyDoc_STRVAR(ffi_getwinerror_doc,
 "Return either the GetLastError() or the error number given by the\n"
@@ -944,6 +1253,141 @@ static PyObject *ffi_list_types(FFIObject *self, PyObject *noargs)
     return result;
 }
 
+static PyObject *_ffi_perf_counter(void)
+{
+    /* returns the result of time.perf_counter() */
+    PyObject *time_mod, *result;
+
+    time_mod = PyImport_ImportModule("time");
+    if (time_mod == NULL)
+        return NULL;
+    result = PyObject_CallMethod(time_mod, "perf_counter", NULL);
+    Py_DECREF(time_mod);
+    return result;
+}
+
+static int _ffi_preload_type(FFIObject *self, const char *prefix,
+                             const char *name, int type_index)
+{
+    /* build the type, including the fields if it is a struct or union,
+       and cache it in 'types_dict' under the name 'prefix + name' */
+    builder_c_t *builder = &self->types_builder;
+    PyObject *x, *key;
+    int err = 0;
+
+    x = realize_c_type_or_func(builder, builder->ctx.types, type_index);
+    if (x == NULL)
+        return -1;
+    if (CTypeDescr_Check(x) &&
+            (((CTypeDescrObject *)x)->ct_flags & (CT_STRUCT | CT_UNION))) {
+        if (force_lazy_struct((CTypeDescrObject *)x) < 0)
+            err = -1;
+    }
+    if (err == 0 && name[0] != '$') {
+        key = PyText_FromFormat("%s%s", prefix, name);
+        if (key == NULL)
+            err = -1;
+        else {
+            err = PyDict_SetItem(builder->types_dict, key, x);
+            Py_DECREF(key);
+        }
+    }
+    Py_DECREF(x);
+    return err;
+}
+
+PyDoc_STRVAR(ffi_preload_types_doc,
+"Build now all the types declared in this FFI instance: the typedefs,\n"
+"the structs and unions with their fields, and the enums.  Otherwise,\n"
+"they are built lazily the first time they are used.  For example, call\n"
+"it before forking worker processes, so that they all start with the\n"
+"types already built.  Returns the time it took, in seconds.");
+
+static PyObject *ffi_preload_types(FFIObject *self, PyObject *noargs)
+{
+    const struct _cffi_type_context_s *ctx = &self->types_builder.ctx;
+    PyObject *t0, *t1, *result;
+    int i;
+
+    t0 = _ffi_perf_counter();
+    if (t0 == NULL)
+        return NULL;
+
+    for (i = 0; i < ctx->num_struct_unions; i++) {
+        const struct _cffi_struct_union_s *s = &ctx->struct_unions[i];
+        const char *prefix = (s->flags & _CFFI_F_UNION) ? "union " : "struct ";
+        if (_ffi_preload_type(self, prefix, s->name, s->type_index) < 0)
+            goto error;
+    }
+    for (i = 0; i < ctx->num_enums; i++) {
+        const struct _cffi_enum_s *e = &ctx->enums[i];
+        if (_ffi_preload_type(self, "enum ", e->name, e->type_index) < 0)
+            goto error;
+    }
+    for (i = 0; i < ctx->num_typenames; i++) {
+        const struct _cffi_typename_s *t = &ctx->typenames[i];
+        if (_ffi_preload_type(self, "", t->name, t->type_index) < 0)
+            goto error;
+    }
+
+    t1 = _ffi_perf_counter();
+    if (t1 == NULL)
+        goto error;
+    result = PyNumber_Subtract(t1, t0);
+    Py_DECREF(t1);
+    Py_DECREF(t0);
+    return result;
+
+ error:
+    Py_DECREF(t0);
+    return NULL;
+}
+
+PyDoc_STRVAR(ffi_type_cache_stats_doc,
+"Return a dict about the cache of the type strings given to ffi.new(),\n"
+"ffi.cast(), ffi.typeof() and so on: 'hits' and 'misses' count the\n"
+"lookups, 'names' is the number of cached plain type names, which are\n"
+"kept forever, and 'adhoc' is the number of other cached strings,\n"
+"which are kept in a cache of at most 'limit' entries.");
+
+static PyObject *ffi_type_cache_stats(FFIObject *self, PyObject *noargs)
+{
+    Py_ssize_t adhoc = 0;
+    if (self->types_adhoc != NULL)
+        adhoc += PyDict_Size(self->types_adhoc);
+    if (self->types_adhoc_old != NULL)
+        adhoc += PyDict_Size(self->types_adhoc_old);
+    return Py_BuildValue("{s:n,s:n,s:n,s:n,s:n}",
+                         "hits", self->types_hits,
+                         "misses", self->types_misses,
+                         "names", PyDict_Size(self->types_builder.types_dict),
+                         "adhoc", adhoc,
+                         "limit", self->types_adhoc_limit);
+}
+
+PyDoc_STRVAR(ffi_set_type_cache_limit_doc,
+"Set the maximum number of type strings, other than plain type names,\n"
+"that are cached (see ffi.type_cache_stats()).  The cache is emptied.\n"
+"A limit of 0 disables it.  Returns the previous limit.");
+
+static PyObject *ffi_set_type_cache_limit(FFIObject *self, PyObject *arg)
+{
+    Py_ssize_t limit, old_limit;
+
+    limit = PyInt_AsSsize_t(arg);
+    if (limit == -1 && PyErr_Occurred())
+        return NULL;
+    if (limit < 0) {
+        PyErr_SetString(PyExc_ValueError, "the limit must be >= 0");
+        return NULL;
+    }
+    old_limit = self->types_adhoc_limit;
+    self->types_adhoc_limit = limit;
+    Py_CLEAR(self->types_adhoc);
+    Py_CLEAR(self->types_adhoc_old);
+    return PyInt_FromSsize_t(old_limit);
+}
+
 PyDoc_STRVAR(ffi_memmove_doc,
 "ffi.memmove(dest, src, n) copies n bytes of memory from src to dest.\n"
 "\n"
@@ -1094,6 +1538,25 @@ PyDoc_STRVAR(ffi_release_doc,
 "cdata object and cannot be freed independently.  It might be fixed in\n"
 "future releases of cffi.");
 
+PyDoc_STRVAR(ffi_free_list_stats_doc,
+"Return a dict with statistics about the free lists of small objects\n"
+"allocated by ffi.new(): 'hits' and 'misses' count the allocations\n"
+"that could or could not reuse a cached block; 'cached' and\n"
+"'cached_bytes' give the current content of the free lists; and\n"
+"'limit' is the maximum number of blocks cached per size class.");
+
+#define ffi_free_list_stats  b_free_list_stats  /* ffi_free_list_stats() =>
+                                b_free_list_stats() from _cffi_backend.c */
+
+PyDoc_STRVAR(ffi_trim_free_lists_doc,
+"Free all the blocks cached in the free lists of small objects\n"
+"allocated by ffi.new(), and return their number.  If 'limit' is\n"
+"given, it becomes the new maximum number of blocks cached per size\n"
+"class; 0 disables the free lists.");
+
+#define ffi_trim_free_lists  b_trim_free_lists  /* ffi_trim_free_lists() =>
+                                b_trim_free_lists() from _cffi_backend.c */
+
 #define ffi_release  b_release     /* ffi_release() => b_release()
                                       from _cffi_backend.c */
 
@@ -1104,11 +1567,22 @@ static PyMethodDef ffi_methods[] = {
  {"alignof",    (PyCFunction)ffi_alignof,    METH_O,       ffi_alignof_doc},
  {"def_extern", (PyCFunction)ffi_def_extern, METH_VKW,     ffi_def_extern_doc},
  {"callback",   (PyCFunction)ffi_callback,   METH_VKW,     ffi_callback_doc},
+ {"callback_factory",(PyCFunction)ffi_callback_factory,METH_VKW,
+                                                    ffi_callback_factory_doc},
  {"cast",       (PyCFunction)ffi_cast,       METH_VARARGS, ffi_cast_doc},
  {"dlclose",    (PyCFunction)ffi_dlclose,    METH_VARARGS, ffi_dlclose_doc},
  {"dlopen",     (PyCFunction)ffi_dlopen,     METH_VARARGS, ffi_dlopen_doc},
  {"from_buffer",(PyCFunction)ffi_from_buffer,METH_VKW,     ffi_from_buffer_doc},
+ {"closure_stats",(PyCFunction)ffi_closure_stats,METH_NOARGS,
+                                                       ffi_closure_stats_doc},
+ {"drain_destructors",(PyCFunction)ffi_drain_destructors,METH_NOARGS,
+                                                   ffi_drain_destructors_doc},
+ {"external_memory_stats",(PyCFunction)ffi_external_memory_stats,
+                          METH_NOARGS,  ffi_external_memory_stats_doc},
+ {"free_list_stats",(PyCFunction)ffi_free_list_stats,METH_NOARGS,
+                                                     ffi_free_list_stats_doc},
  {"from_handle",(PyCFunction)ffi_from_handle,METH_O,       ffi_from_handle_doc},
+ {"gather",     (PyCFunction)ffi_gather,     METH_VKW,     ffi_gather_doc},
  {"gc",         (PyCFunction)ffi_gc,         METH_VKW,     ffi_gc_doc},
  {"getctype",   (PyCFunction)ffi_getctype,   METH_VKW,     ffi_getctype_doc},
 #ifdef MS_WIN32
@@ -1118,13 +1592,29 @@ static PyMethodDef ffi_methods[] = {
  {"integer_const",(PyCFunction)ffi_int_const,METH_VKW,     ffi_int_const_doc},
  {"list_types", (PyCFunction)ffi_list_types, METH_NOARGS,  ffi_list_types_doc},
  {"memmove",    (PyCFunction)ffi_memmove,    METH_VKW,     ffi_memmove_doc},
+ {"memoryview", (PyCFunction)ffi_memoryview, METH_VKW,     ffi_memoryview_doc},
  {"new",        (PyCFunction)ffi_new,        METH_VKW,     ffi_new_doc},
 {"new_allocator",(PyCFunction)ffi_new_allocator,METH_VKW,ffi_new_allocator_doc},
+ {"new_arena",  (PyCFunction)ffi_new_arena,  METH_VKW,     ffi_new_arena_doc},
  {"new_handle", (PyCFunction)ffi_new_handle, METH_O,       ffi_new_handle_doc},
+ {"new_handle_table",(PyCFunction)ffi_new_handle_table,METH_NOARGS,
+                                                    ffi_new_handle_table_doc},
  {"offsetof",   (PyCFunction)ffi_offsetof,   METH_VARARGS, ffi_offsetof_doc},
+ {"preload_types",(PyCFunction)ffi_preload_types,METH_NOARGS,
+                                                       ffi_preload_types_doc},
  {"release",    (PyCFunction)ffi_release,    METH_O,       ffi_release_doc},
+ {"scatter",    (PyCFunction)ffi_scatter,    METH_VKW,     ffi_scatter_doc},
+ {"set_external_memory_threshold",
+             (PyCFunction)ffi_set_external_memory_threshold,
+                          METH_O,       ffi_set_external_memory_threshold_doc},
+ {"set_type_cache_limit",(PyCFunction)ffi_set_type_cache_limit,METH_O,
+                                                ffi_set_type_cache_limit_doc},
  {"sizeof",     (PyCFunction)ffi_sizeof,     METH_O,       ffi_sizeof_doc},
  {"string",     (PyCFunction)ffi_string,     METH_VKW,     ffi_string_doc},
+ {"trim_free_lists",(PyCFunction)ffi_trim_free_lists,METH_VKW,
+                                                     ffi_trim_free_lists_doc},
+ {"type_cache_stats",(PyCFunction)ffi_type_cache_stats,METH_NOARGS,
+                                                    ffi_type_cache_stats_doc},
  {"typeof",     (PyCFunction)ffi_typeof,     METH_O,       ffi_typeof_doc},
  {"unpack",     (PyCFunction)ffi_unpack,     METH_VKW,     ffi_unpack_doc},
  {NULL}
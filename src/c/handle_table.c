@@ -0,0 +1,255 @@
+/* Implementation of ffi.new_handle_table(): an alternative to
+ * ffi.new_handle() and ffi.from_handle().  The handles are not the
+ * address of a cdata object, but the index of a slot in a growable
+ * table, combined with a generation counter that is incremented when
+ * the slot is released.  So looking up a handle does not allocate, and
+ * looking up a handle that was already released raises KeyError
+ * instead of crashing (as long as the slot was not reused 2**N times,
+ * with N = 32 on 64-bit machines and N = 12 on 32-bit machines).
+ *
+ * A handle is the integer ((generation << HT_INDEX_BITS) | (index + 1)),
+ * which is never zero.  new() returns it as a 'void *' cdata.
+ */
+
+#if SIZE_MAX > 0xFFFFFFFF
+#  define HT_INDEX_BITS    32
+#else
+#  define HT_INDEX_BITS    20
+#endif
+#define HT_INDEX_MASK      (((size_t)1 << HT_INDEX_BITS) - 1)
+#define HT_GEN_MASK        ((~(size_t)0) >> HT_INDEX_BITS)
+#define HT_MAX_SLOTS       ((Py_ssize_t)(HT_INDEX_MASK - 1))
+
+struct ht_slot_s {
+    PyObject *obj;           /* NULL if the slot is free */
+    size_t generation;
+    Py_ssize_t next_free;    /* if free: index of the next free slot, or -1 */
+};
+
+typedef struct {
+    PyObject_HEAD
+    struct ht_slot_s *ht_slots;
+    Py_ssize_t ht_allocated;   /* number of slots in 'ht_slots' */
+    Py_ssize_t ht_used;        /* number of live handles */
+    Py_ssize_t ht_first_free;  /* index of the first free slot, or -1 */
+} HandleTableObject;
+
+static PyTypeObject HandleTable_Type;
+
+static int ht_grow(HandleTableObject *ht)
+{
+    struct ht_slot_s *slots;
+    Py_ssize_t i, newsize;
+
+    if (ht->ht_allocated >= HT_MAX_SLOTS) {
+        PyErr_SetString(PyExc_OverflowError,
+                        "too many live handles in this handle table");
+        return -1;
+    }
+    newsize = ht->ht_allocated < 8 ? 16 : ht->ht_allocated * 2;
+    if (newsize > HT_MAX_SLOTS)
+        newsize = HT_MAX_SLOTS;
+    slots = PyMem_Realloc(ht->ht_slots, newsize * sizeof(struct ht_slot_s));
+    if (slots == NULL) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    /* chain the new slots in the free list, in increasing order */
+    for (i = ht->ht_allocated; i < newsize; i++) {
+        slots[i].obj = NULL;
+        slots[i].generation = 0;
+        slots[i].next_free = i + 1 < newsize ? i + 1 : ht->ht_first_free;
+    }
+    ht->ht_first_free = ht->ht_allocated;
+    ht->ht_slots = slots;
+    ht->ht_allocated = newsize;
+    return 0;
+}
+
+static Py_ssize_t ht_lookup(HandleTableObject *ht, PyObject *arg)
+{
+    /* returns the index of the live slot corresponding to the handle
+       'arg', or -1 with an exception set */
+    size_t h;
+    Py_ssize_t index;
+
+    if (CData_Check(arg)) {
+        CDataObject *cd = (CDataObject *)arg;
+        if (!(cd->c_type->ct_flags & (CT_POINTER | CT_FUNCTIONPTR))) {
+            PyErr_Format(PyExc_TypeError,
+                         "expected a pointer cdata or an integer, got "
+                         "cdata '%s'", cd->c_type->ct_name);
+            return -1;
+        }
+        h = (size_t)cd->c_data;
+    }
+    else {
+        h = (size_t)PyLong_AsVoidPtr(arg);
+        if (h == 0 && PyErr_Occurred())
+            return -1;
+    }
+    index = (Py_ssize_t)(h & HT_INDEX_MASK) - 1;
+    if (index < 0 || index >= ht->ht_allocated ||
+            ht->ht_slots[index].obj == NULL ||
+            ht->ht_slots[index].generation != (h >> HT_INDEX_BITS)) {
+        PyErr_Format(PyExc_KeyError,
+                     "invalid or already released handle %p", (void *)h);
+        return -1;
+    }
+    return index;
+}
+
+static PyObject *ht_new(HandleTableObject *ht, PyObject *x)
+{
+    struct ht_slot_s *slot;
+    Py_ssize_t index;
+    size_t h;
+
+    if (ht->ht_first_free < 0 && ht_grow(ht) < 0)
+        return NULL;
+    index = ht->ht_first_free;
+    slot = &ht->ht_slots[index];
+    ht->ht_first_free = slot->next_free;
+    Py_INCREF(x);
+    slot->obj = x;
+    ht->ht_used++;
+
+    h = (slot->generation << HT_INDEX_BITS) | (size_t)(index + 1);
+    /* g_ct_voidp is equal to <ctype 'void *'> */
+    return new_simple_cdata((char *)h, g_ct_voidp);
+}
+
+static PyObject *ht_get(HandleTableObject *ht, PyObject *arg)
+{
+    PyObject *x;
+    Py_ssize_t index = ht_lookup(ht, arg);
+    if (index < 0)
+        return NULL;
+    x = ht->ht_slots[index].obj;
+    Py_INCREF(x);
+    return x;
+}
+
+static PyObject *ht_release(HandleTableObject *ht, PyObject *arg)
+{
+    struct ht_slot_s *slot;
+    PyObject *x;
+    Py_ssize_t index = ht_lookup(ht, arg);
+    if (index < 0)
+        return NULL;
+    slot = &ht->ht_slots[index];
+    x = slot->obj;               /* the reference is passed to the caller */
+    slot->obj = NULL;
+    slot->generation = (slot->generation + 1) & HT_GEN_MASK;
+    slot->next_free = ht->ht_first_free;
+    ht->ht_first_free = index;
+    ht->ht_used--;
+    return x;
+}
+
+static Py_ssize_t ht_length(HandleTableObject *ht)
+{
+    return ht->ht_used;
+}
+
+static int ht_traverse(HandleTableObject *ht, visitproc visit, void *arg)
+{
+    Py_ssize_t i;
+    for (i = 0; i < ht->ht_allocated; i++)
+        Py_VISIT(ht->ht_slots[i].obj);
+    return 0;
+}
+
+static int ht_clear(HandleTableObject *ht)
+{
+    /* release all the handles, but keep the table usable */
+    Py_ssize_t i;
+    for (i = 0; i < ht->ht_allocated; i++) {
+        struct ht_slot_s *slot = &ht->ht_slots[i];
+        if (slot->obj != NULL) {
+            Py_CLEAR(slot->obj);
+            slot->generation = (slot->generation + 1) & HT_GEN_MASK;
+            slot->next_free = ht->ht_first_free;
+            ht->ht_first_free = i;
+            ht->ht_used--;
+        }
+    }
+    return 0;
+}
+
+static void ht_dealloc(HandleTableObject *ht)
+{
+    PyObject_GC_UnTrack(ht);
+    ht_clear(ht);
+    PyMem_Free(ht->ht_slots);
+    Py_TYPE(ht)->tp_free((PyObject *)ht);
+}
+
+PyDoc_STRVAR(ht_new_doc,
+"Return a new handle, as a non-NULL 'void *', that refers to the given\n"
+"Python object until it is released.");
+
+PyDoc_STRVAR(ht_get_doc,
+"Return the Python object of the given handle, which can be a 'void *'\n"
+"cdata or an integer.  Raises KeyError if the handle was released.");
+
+PyDoc_STRVAR(ht_release_doc,
+"Release the given handle and return its Python object.  Raises\n"
+"KeyError if the handle was already released.");
+
+static PyMethodDef ht_methods[] = {
+    {"new",     (PyCFunction)ht_new,     METH_O, ht_new_doc},
+    {"get",     (PyCFunction)ht_get,     METH_O, ht_get_doc},
+    {"release", (PyCFunction)ht_release, METH_O, ht_release_doc},
+    {NULL}
+};
+
+static PySequenceMethods ht_as_sequence = {
+    (lenfunc)ht_length,                         /* sq_length */
+};
+
+static PyTypeObject HandleTable_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_cffi_backend.HandleTable",
+    sizeof(HandleTableObject),
+    0,
+    (destructor)ht_dealloc,                     /* tp_dealloc */
+    0,                                          /* tp_print */
+    0,                                          /* tp_getattr */
+    0,                                          /* tp_setattr */
+    0,                                          /* tp_compare */
+    0,                                          /* tp_repr */
+    0,                                          /* tp_as_number */
+    &ht_as_sequence,                            /* tp_as_sequence */
+    0,                                          /* tp_as_mapping */
+    0,                                          /* tp_hash */
+    0,                                          /* tp_call */
+    0,                                          /* tp_str */
+    PyObject_GenericGetAttr,                    /* tp_getattro */
+    0,                                          /* tp_setattro */
+    0,                                          /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC,    /* tp_flags */
+    0,                                          /* tp_doc */
+    (traverseproc)ht_traverse,                  /* tp_traverse */
+    (inquiry)ht_clear,                          /* tp_clear */
+    0,                                          /* tp_richcompare */
+    0,                                          /* tp_weaklistoffset */
+    0,                                          /* tp_iter */
+    0,                                          /* tp_iternext */
+    ht_methods,                                 /* tp_methods */
+};
+
+static PyObject *handle_table_create(void)
+{
+    HandleTableObject *ht;
+
+    ht = PyObject_GC_New(HandleTableObject, &HandleTable_Type);
+    if (ht == NULL)
+        return NULL;
+    ht->ht_slots = NULL;
+    ht->ht_allocated = 0;
+    ht->ht_used = 0;
+    ht->ht_first_free = -1;
+    PyObject_GC_Track(ht);
+    return (PyObject *)ht;
+}
@@ -289,6 +289,12 @@ static PyObject *lib_build_and_cache_attr(LibObject *lib, PyObject *name,
         x = lib_build_cpython_func(lib, g, s, METH_O);
         break;
 
+#ifdef METH_FASTCALL
+    case _CFFI_OP_CPYTHON_BLTN_F:
+        x = lib_build_cpython_func(lib, g, s, METH_FASTCALL);
+        break;
+#endif
+
     case _CFFI_OP_CONSTANT_INT:
     case _CFFI_OP_ENUM:
     {
@@ -507,6 +513,40 @@ static PyObject *_lib_dict(LibObject *lib)
     return NULL;
 }
 
+static PyObject *lib_preload(LibObject *lib, PyObject *noarg)
+{
+    /* Build and cache the objects for all the globals now, instead of
+       lazily when each name is first accessed.  Returns the time it
+       took, in seconds, as measured by time.perf_counter(). */
+    const struct _cffi_global_s *g = lib->l_types_builder->ctx.globals;
+    int i, total = lib->l_types_builder->ctx.num_globals;
+    PyObject *t0, *t1 = NULL, *result = NULL;
+    PyObject *name = NULL, *x;
+
+    t0 = _ffi_perf_counter();
+    if (t0 == NULL)
+        return NULL;
+
+    for (i = 0; i < total; i++) {
+        name = PyText_FromString(g[i].name);
+        if (name == NULL)
+            goto error;
+        LIB_GET_OR_CACHE_ADDR(x, lib, name, goto error);
+        Py_CLEAR(name);
+    }
+
+    t1 = _ffi_perf_counter();
+    if (t1 == NULL)
+        goto error;
+    result = PyNumber_Subtract(t1, t0);
+
+ error:
+    Py_XDECREF(name);
+    Py_XDECREF(t1);
+    Py_DECREF(t0);
+    return result;
+}
+
 static PyObject *lib_getattr(LibObject *lib, PyObject *name)
 {
     const char *p;
@@ -532,6 +572,10 @@ static PyObject *lib_getattr(LibObject *lib, PyObject *name)
         PyErr_Clear();
         return _lib_dict(lib);
     }
+    if (strcmp(p, "__cffi_preload__") == 0) {
+        PyErr_Clear();
+        return PyObject_GenericGetAttr((PyObject *)lib, name);
+    }
     if (strcmp(p, "__class__") == 0) {
         PyErr_Clear();
         x = (PyObject *)&PyModule_Type;
@@ -583,8 +627,15 @@ static PyObject *lib_dir(PyObject *self, PyObject *noarg)
     return _lib_dir1((LibObject *)self, 0);
 }
 
+PyDoc_STRVAR(lib_preload_doc,
+"Build all the functions, constants and global variables of this lib\n"
+"now, instead of lazily the first time each one is accessed.  Returns\n"
+"the time it took, in seconds.");
+
 static PyMethodDef lib_methods[] = {
     {"__dir__",   lib_dir,  METH_NOARGS},
+    {"__cffi_preload__", (PyCFunction)lib_preload, METH_NOARGS,
+                                                   lib_preload_doc},
     {NULL,        NULL}           /* sentinel */
 };
 
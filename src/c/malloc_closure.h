@@ -62,16 +62,23 @@ emutramp_enabled_check (void)
 #endif
 
 
-/* 'allocate_num_pages' is dynamically adjusted starting from one
-   page.  It grows by a factor of PAGE_ALLOCATION_GROWTH_RATE.  This is
-   meant to handle both the common case of not needing a lot of pages,
-   and the rare case of needing many of them.  Systems in general have a
-   limit of how many mmap'd blocks can be open.
+/* The closures are allocated out of "chunks" of pages obtained with
+   mmap() or VirtualAlloc().  The number of pages of a new chunk is
+   dynamically adjusted: it is 1 + (PAGE_ALLOCATION_GROWTH_RATE - 1)
+   times the number of pages already mapped.  This is meant to handle
+   both the common case of not needing a lot of pages, and the rare
+   case of needing many of them.  Systems in general have a limit of
+   how many mmap'd blocks can be open.
+
+   Each chunk has its own free list.  When all the closures of a chunk
+   are freed, the chunk is unmapped---unless the other chunks have
+   fewer than CLOSURE_FREE_SLOTS_HIGH_WATER free slots, in which case
+   it is kept to avoid unmapping and remapping pages all the time.
+   The chunk headers themselves are allocated with malloc().
 */
 
 #define PAGE_ALLOCATION_GROWTH_RATE  1.3
-
-static Py_ssize_t allocate_num_pages = 0;
+#define CLOSURE_FREE_SLOTS_HIGH_WATER  1024
 
 /* #define MALLOC_CLOSURE_DEBUG */ /* enable for some debugging output */
 
@@ -82,13 +89,26 @@ union mmaped_block {
     union mmaped_block *next;
 };
 
-static union mmaped_block *free_list = 0;
+struct closure_chunk_s {
+    struct closure_chunk_s *next_chunk;
+    union mmaped_block *items;     /* the mmaped pages */
+    union mmaped_block *free_list;
+    Py_ssize_t num_pages;
+    Py_ssize_t count;              /* number of items */
+    Py_ssize_t num_used;
+};
+
+static struct closure_chunk_s *closure_chunks = NULL;
 static Py_ssize_t _pagesize = 0;
+static Py_ssize_t closure_mapped_pages = 0;
+static Py_ssize_t closure_num_used = 0;
+static Py_ssize_t closure_num_free = 0;
 
-static void more_core(void)
+static struct closure_chunk_s *more_core(void)
 {
+    struct closure_chunk_s *chunk;
     union mmaped_block *item;
-    Py_ssize_t count, i;
+    Py_ssize_t count, i, num_pages;
 
 /* determine the pagesize */
 #ifdef MS_WIN32
@@ -109,12 +129,15 @@ static void more_core(void)
     if (_pagesize <= 0)
         _pagesize = 4096;
 
-    /* bump 'allocate_num_pages' */
-    allocate_num_pages = 1 + (
-        (Py_ssize_t)(allocate_num_pages * PAGE_ALLOCATION_GROWTH_RATE));
+    num_pages = 1 + (Py_ssize_t)(closure_mapped_pages *
+                                 (PAGE_ALLOCATION_GROWTH_RATE - 1.0));
 
     /* calculate the number of mmaped_blocks to allocate */
-    count = (allocate_num_pages * _pagesize) / sizeof(union mmaped_block);
+    count = (num_pages * _pagesize) / sizeof(union mmaped_block);
+
+    chunk = (struct closure_chunk_s *)malloc(sizeof(struct closure_chunk_s));
+    if (chunk == NULL)
+        return NULL;
 
     /* allocate a memory block */
 #ifdef MS_WIN32
@@ -122,55 +145,111 @@ static void more_core(void)
                                            count * sizeof(union mmaped_block),
                                            MEM_COMMIT,
                                            PAGE_EXECUTE_READWRITE);
-    if (item == NULL)
-        return;
+    if (item == NULL) {
+        free(chunk);
+        return NULL;
+    }
 #else
     {
     int prot = PROT_READ | PROT_WRITE | PROT_EXEC;
     if (is_emutramp_enabled ())
         prot &= ~PROT_EXEC;
     item = (union mmaped_block *)mmap(NULL,
-                        allocate_num_pages * _pagesize,
+                        num_pages * _pagesize,
                         prot,
                         MAP_PRIVATE | MAP_ANONYMOUS,
                         -1,
                         0);
-    if (item == (void *)MAP_FAILED)
-        return;
+    if (item == (void *)MAP_FAILED) {
+        free(chunk);
+        return NULL;
+    }
     }
 #endif
 
 #ifdef MALLOC_CLOSURE_DEBUG
     printf("block at %p allocated (%ld bytes), %ld mmaped_blocks\n",
-           item, (long)(allocate_num_pages * _pagesize), (long)count);
+           item, (long)(num_pages * _pagesize), (long)count);
 #endif
-    /* put them into the free list */
+    chunk->items = item;
+    chunk->num_pages = num_pages;
+    chunk->count = count;
+    chunk->num_used = 0;
+    chunk->free_list = NULL;
+    /* put them into the free list of the chunk */
     for (i = 0; i < count; ++i) {
-        item->next = free_list;
-        free_list = item;
+        item->next = chunk->free_list;
+        chunk->free_list = item;
         ++item;
     }
+    chunk->next_chunk = closure_chunks;
+    closure_chunks = chunk;
+    closure_mapped_pages += num_pages;
+    closure_num_free += count;
+    return chunk;
+}
+
+static void less_core(struct closure_chunk_s *chunk)
+{
+    /* unmap the chunk, which must be entirely free */
+    struct closure_chunk_s **pp = &closure_chunks;
+    while (*pp != chunk)
+        pp = &(*pp)->next_chunk;
+    *pp = chunk->next_chunk;
+
+#ifdef MALLOC_CLOSURE_DEBUG
+    printf("block at %p released (%ld bytes)\n",
+           chunk->items, (long)(chunk->num_pages * _pagesize));
+#endif
+#ifdef MS_WIN32
+    VirtualFree(chunk->items, 0, MEM_RELEASE);
+#else
+    munmap(chunk->items, chunk->num_pages * _pagesize);
+#endif
+    closure_mapped_pages -= chunk->num_pages;
+    closure_num_free -= chunk->count;
+    free(chunk);
 }
 
 /******************************************************************/
 
-/* put the item back into the free list */
+/* put the item back into the free list of its chunk */
 static void cffi_closure_free(ffi_closure *p)
 {
     union mmaped_block *item = (union mmaped_block *)p;
-    item->next = free_list;
-    free_list = item;
+    struct closure_chunk_s *chunk = closure_chunks;
+
+    while (!(item >= chunk->items && item < chunk->items + chunk->count))
+        chunk = chunk->next_chunk;
+
+    item->next = chunk->free_list;
+    chunk->free_list = item;
+    chunk->num_used--;
+    closure_num_used--;
+    closure_num_free++;
+
+    if (chunk->num_used == 0 &&
+            closure_num_free - chunk->count >= CLOSURE_FREE_SLOTS_HIGH_WATER)
+        less_core(chunk);
 }
 
-/* return one item from the free list, allocating more if needed */
+/* return one item from the free list of a chunk, allocating more if
+   needed */
 static ffi_closure *cffi_closure_alloc(void)
 {
     union mmaped_block *item;
-    if (!free_list)
-        more_core();
-    if (!free_list)
+    struct closure_chunk_s *chunk = closure_chunks;
+
+    while (chunk != NULL && chunk->free_list == NULL)
+        chunk = chunk->next_chunk;
+    if (chunk == NULL)
+        chunk = more_core();
+    if (chunk == NULL)
         return NULL;
-    item = free_list;
-    free_list = item->next;
+    item = chunk->free_list;
+    chunk->free_list = item->next;
+    chunk->num_used++;
+    closure_num_used++;
+    closure_num_free--;
     return &item->closure;
 }
@@ -11,6 +11,12 @@ typedef struct {
     Py_ssize_t mb_size;
     PyObject  *mb_keepalive;
     PyObject  *mb_weakreflist;    /* weakref support */
+    /* the following fields are only used by ffi.memoryview() to export
+       typed items; for ffi.buffer(), mb_format is NULL */
+    PyObject  *mb_format;         /* bytes: the PEP 3118 format */
+    Py_ssize_t mb_itemsize;
+    int        mb_ndim;
+    Py_ssize_t *mb_shape;         /* mb_ndim shapes, then mb_ndim strides */
 } MiniBufferObj;
 
 static Py_ssize_t mb_length(MiniBufferObj *self)
@@ -110,9 +116,36 @@ static PyObject *mb_str(MiniBufferObj *self)
 
 static int mb_getbuf(MiniBufferObj *self, Py_buffer *view, int flags)
 {
-    return PyBuffer_FillInfo(view, (PyObject *)self,
-                             self->mb_data, self->mb_size,
-                             /*readonly=*/0, flags);
+    if (self->mb_format == NULL || (flags & PyBUF_ND) != PyBUF_ND) {
+        /* plain unsigned bytes */
+        return PyBuffer_FillInfo(view, (PyObject *)self,
+                                 self->mb_data, self->mb_size,
+                                 /*readonly=*/0, flags);
+    }
+    if ((flags & PyBUF_F_CONTIGUOUS) == PyBUF_F_CONTIGUOUS &&
+            self->mb_ndim > 1) {
+        PyErr_SetString(PyExc_BufferError,
+                        "the buffer is C-contiguous, not Fortran-contiguous");
+        view->obj = NULL;
+        return -1;
+    }
+    view->obj = (PyObject *)self;
+    Py_INCREF(self);
+    view->buf = self->mb_data;
+    view->len = self->mb_size;
+    view->readonly = 0;
+    view->itemsize = self->mb_itemsize;
+    view->format = NULL;
+    if (flags & PyBUF_FORMAT)
+        view->format = PyBytes_AS_STRING(self->mb_format);
+    view->ndim = self->mb_ndim;
+    view->shape = self->mb_shape;
+    view->strides = NULL;
+    if ((flags & PyBUF_STRIDES) == PyBUF_STRIDES)
+        view->strides = self->mb_shape + self->mb_ndim;
+    view->suboffsets = NULL;
+    view->internal = NULL;
+    return 0;
 }
 
 static PySequenceMethods mb_as_sequence = {
@@ -143,6 +176,8 @@ mb_dealloc(MiniBufferObj *ob)
     if (ob->mb_weakreflist != NULL)
         PyObject_ClearWeakRefs((PyObject *)ob);
     Py_XDECREF(ob->mb_keepalive);
+    Py_XDECREF(ob->mb_format);
+    PyMem_Free(ob->mb_shape);
     Py_TYPE(ob)->tp_free((PyObject *)ob);
 }
 
@@ -402,6 +437,10 @@ static PyObject *minibuffer_new(char *data, Py_ssize_t size,
         ob->mb_size = size;
         ob->mb_keepalive = keepalive; Py_INCREF(keepalive);
         ob->mb_weakreflist = NULL;
+        ob->mb_format = NULL;
+        ob->mb_itemsize = 1;
+        ob->mb_ndim = 1;
+        ob->mb_shape = NULL;
         PyObject_GC_Track(ob);
     }
     return (PyObject *)ob;
@@ -1045,6 +1045,21 @@ def test_call_function_0_pretend_bool_result():
     assert f(40, -40) is False
     pytest.raises(ValueError, f, 40, 2)
 
+def test_call_function_0_various_ways():
+    BSignedChar = new_primitive_type("signed char")
+    BFunc0 = new_function_type((BSignedChar, BSignedChar), BSignedChar, False)
+    f = cast(BFunc0, _testfunc(0))
+    assert f(*(40, 2)) == 42
+    assert f.__call__(40, 2) == 42
+    assert list(map(f, [1, 2], [3, 4])) == [4, 6]
+    assert sorted([5, 1, 3], key=lambda x: f(x, 0)) == [1, 3, 5]
+    pytest.raises(TypeError, f, 40)
+    pytest.raises(TypeError, f, 40, 2, 1)
+    pytest.raises(TypeError, f, 40, b=2)
+    pytest.raises(TypeError, f, **{'a': 40, 'b': 2})
+    pytest.raises(RuntimeError, cast(BFunc0, 0), 40, 2)
+    pytest.raises(TypeError, cast(BSignedChar, 40), 2)
+
 def test_call_function_1():
     BInt = new_primitive_type("int")
     BLong = new_primitive_type("long")
@@ -1244,6 +1259,22 @@ def test_call_function_9():
     BSShort = new_primitive_type("short")
     assert f(3, cast(BSChar, -3), cast(BUChar, 200), cast(BSShort, -5)) == 192
 
+def test_call_function_9_many_shapes():
+    # more different calls than the size of the internal cache of
+    # cif_descriptions for variadic functions, done several times
+    BInt = new_primitive_type("int")
+    BSChar = new_primitive_type("signed char")
+    BFunc9 = new_function_type((BInt,), BInt, True)    # vararg
+    f = cast(BFunc9, _testfunc(9))
+    for j in range(3):
+        for n in range(12):
+            args = [cast(BInt, i + 1) for i in range(n)]
+            assert f(n, *args) == n * (n + 1) // 2
+            args = [cast(BSChar, -i - 1) for i in range(n)]
+            assert f(n, *args) == -n * (n + 1) // 2
+        pytest.raises(TypeError, f, 2, cast(BInt, 5), 6)
+        assert f(2, cast(BInt, 5), cast(BInt, 6)) == 11
+
 def test_call_function_24():
     BFloat = new_primitive_type("float")
     BFloatComplex = new_primitive_type("float _Complex")
@@ -1375,6 +1406,29 @@ def test_callback():
     e = pytest.raises(TypeError, f)
     assert str(e.value) == "'int(*)(int)' expects 1 arguments, got 0"
 
+def test_callback_many_arguments():
+    # enough arguments to need a large exchange buffer in cdata_call()
+    BDouble = new_primitive_type("double")
+    BFunc = new_function_type((BDouble,) * 50, BDouble, False)
+    f = callback(BFunc, lambda *args: sum(args))
+    assert f(*range(50)) == sum(range(50))
+    e = pytest.raises(TypeError, f, *range(49))
+    assert str(e.value).endswith("expects 50 arguments, got 49")
+
+def test_callback_small_numbers_of_arguments():
+    # around the limit where general_invoke_callback() stops using an
+    # array on the stack for the arguments
+    BInt = new_primitive_type("int")
+    for n in range(12):
+        BFunc = new_function_type((BInt,) * n, BInt, False)
+        seen = []
+        def cb(*args):
+            seen.append(args)
+            return len(args)
+        f = callback(BFunc, cb)
+        assert f(*range(100, 100 + n)) == n
+        assert seen == [tuple(range(100, 100 + n))]
+
 
 def test_callback_exception():
     def check_value(x):
@@ -2978,6 +3032,60 @@ def test_newp_from_bytearray_doesnt_work():
     p[1:3] = bytearray(b"XY")
     assert list(p) == [b"f", b"X", b"Y", b".", b"\x00"]
 
+def test_call_with_buffer_argument():
+    import array
+    BDouble = new_primitive_type("double")
+    BInt = new_primitive_type("int")
+    BChar = new_primitive_type("char")
+    BVoid = new_void_type()
+    def cb(p, n):
+        total = sum([p[i] for i in range(n)])
+        p[0] = total
+        return total
+    BFunc = new_function_type((new_pointer_type(BDouble), BInt), BDouble)
+    f = callback(BFunc, cb)
+    a = array.array('d', [1.5, 2.5, 3.5])
+    assert f(a, 3) == 7.5
+    assert a[0] == 7.5          # no copy: the array was modified
+    m = memoryview(a)
+    assert f(m[1:], 2) == 6.0
+    assert a.tolist() == [7.5, 6.0, 3.5]
+    pytest.raises(TypeError, f, array.array('f', [1.5]), 1)
+    pytest.raises(TypeError, f, array.array('i', [1, 2]), 1)
+    pytest.raises(TypeError, f, array.array('q', [1, 2]), 1)
+    pytest.raises((TypeError, BufferError), f, m[::2], 2)
+    #
+    BFunc = new_function_type((new_pointer_type(BChar),), BInt)
+    f = callback(BFunc, lambda p: ord(p[0]))
+    assert f(bytearray(b"A")) == 65
+    assert f(memoryview(b"B")) == 66     # a read-only buffer
+    assert f(array.array('b', [67])) == 67
+    pytest.raises(TypeError, f, array.array('h', [68]))
+    #
+    BFunc = new_function_type((new_pointer_type(BVoid),), BInt)
+    f = callback(BFunc, lambda p: cast(new_pointer_type(BInt), p)[0])
+    assert f(array.array('i', [-42])) == -42
+
+def test_call_with_buffer_argument_kept_exported():
+    # the buffer stays exported during the call, so the object cannot
+    # be resized, e.g. by another thread, while C code uses the pointer
+    BChar = new_primitive_type("char")
+    BInt = new_primitive_type("int")
+    ba = bytearray(b"hello")
+    seen = []
+    def cb(p):
+        try:
+            ba.extend(b"x" * 1000)
+        except BufferError as e:
+            seen.append(e)
+        return ord(p[4])
+    BFunc = new_function_type((new_pointer_type(BChar),), BInt)
+    f = callback(BFunc, cb)
+    assert f(ba) == ord("o")
+    assert len(seen) == 1
+    ba.extend(b"!")       # works again after the call
+    assert ba == b"hello!"
+
 def test_string_assignment_to_byte_array():
     BByteArray = new_array_type(
         new_pointer_type(new_primitive_type("unsigned char")), None)
@@ -4206,6 +4314,296 @@ def test_unpack():
     pytest.raises(ValueError, unpack, p0, -1)
     pytest.raises(ValueError, unpack, p, -1)
 
+def test_unpack_as():
+    import array
+    for typename, samples in [
+            ("uint8_t",  [0, 2**8-1]),
+            ("uint16_t", [0, 2**16-1]),
+            ("uint32_t", [0, 2**32-1]),
+            ("uint64_t", [0, 2**64-1]),
+            ("int8_t",  [-2**7, 2**7-1]),
+            ("int16_t", [-2**15, 2**15-1]),
+            ("int32_t", [-2**31, 2**31-1]),
+            ("int64_t", [-2**63, 2**63-1]),
+            ("float", [0.0, 10.5]),
+            ("double", [12.34, 56.78]),
+            ]:
+        BItem = new_primitive_type(typename)
+        BArray = new_array_type(new_pointer_type(BItem), None)
+        p = newp(BArray, samples + [0])
+        n = len(samples)
+        a = unpack(p, n, as_="array")
+        assert isinstance(a, array.array)
+        assert a.itemsize == sizeof(BItem)
+        assert a.tolist() == samples
+        m = unpack(p, n, as_="memoryview")
+        assert isinstance(m, memoryview)
+        assert m.itemsize == sizeof(BItem)
+        assert m.format == a.typecode
+        assert m.tolist() == samples
+        b = unpack(p, n, as_="bytes")
+        assert b == buffer(p, n * sizeof(BItem))[:]
+        assert b == a.tobytes() == m.tobytes()
+        # the memoryview refers to the original memory, the others are copies
+        p[0] = samples[1]
+        assert m[0] == samples[1]
+        assert a[0] == samples[0]
+        m[1] = samples[0]
+        assert p[1] == samples[0]
+        del p
+        import gc; gc.collect()
+        assert m[1] == samples[0]     # 'p' is kept alive
+    #
+    BBool = new_primitive_type("_Bool")
+    p = newp(new_array_type(new_pointer_type(BBool), None), [True, False])
+    assert unpack(p, 2, as_="memoryview").tolist() == [True, False]
+    assert unpack(p, 2, as_="bytes") == b"\x01\x00"
+    pytest.raises(TypeError, unpack, p, 2, as_="array")
+    BChar = new_primitive_type("char")
+    p = newp(new_array_type(new_pointer_type(BChar), None), b"abc")
+    assert unpack(p, 3, as_="memoryview").tolist() == [b"a", b"b", b"c"]
+    assert unpack(p, 3, as_="bytes") == b"abc"
+    pytest.raises(TypeError, unpack, p, 3, as_="array")
+    #
+    BInt = new_primitive_type("int")
+    BStruct = new_struct_type("foo")
+    BStructPtr = new_pointer_type(BStruct)
+    complete_struct_or_union(BStruct, [('a1', BInt, -1),
+                                       ('a2', BInt, -1)])
+    p = newp(new_array_type(BStructPtr, None), [[4, 5], [6, 7]])
+    assert unpack(p, 2, as_="bytes") == buffer(p)[:]
+    pytest.raises(TypeError, unpack, p, 2, as_="array")
+    pytest.raises(TypeError, unpack, p, 2, as_="memoryview")
+    BLongDouble = new_primitive_type("long double")
+    p = newp(new_array_type(new_pointer_type(BLongDouble), None), 2)
+    pytest.raises(TypeError, unpack, p, 2, as_="memoryview")
+    #
+    p = newp(new_array_type(new_pointer_type(BInt), None), 3)
+    assert unpack(p, 0, as_="array").tolist() == []
+    assert unpack(p, 0, as_="memoryview").tolist() == []
+    assert unpack(p, 0, as_="bytes") == b""
+    pytest.raises(ValueError, unpack, p, 3, as_="list")
+    pytest.raises(ValueError, unpack, p, -1, as_="bytes")
+    pytest.raises(OverflowError, unpack, p, sys.maxsize, as_="bytes")
+    pytest.raises(RuntimeError, unpack, cast(new_pointer_type(BInt), 0), 3,
+                  as_="array")
+    BStruct = new_struct_type("bar")
+    e = pytest.raises(ValueError, unpack, cast(new_pointer_type(BStruct), 42),
+                      5, as_="bytes")
+    assert str(e.value) == "'bar *' points to items of unknown size"
+
+def test_typed_memoryview():
+    BInt = new_primitive_type("int")
+    BDouble = new_primitive_type("double")
+    BChar = new_primitive_type("char")
+    BShort = new_primitive_type("short")
+    BDoubleArray = new_array_type(new_pointer_type(BDouble), None)
+    p = newp(BDoubleArray, [1.5, 2.5, 3.5])
+    m = typed_memoryview(p)
+    assert m.format == 'd'
+    assert m.itemsize == sizeof(BDouble)
+    assert m.shape == (3,)
+    assert m.tolist() == [1.5, 2.5, 3.5]
+    m[1] = -4.0
+    assert p[1] == -4.0
+    assert typed_memoryview(p, 2).tolist() == [1.5, -4.0]
+    assert typed_memoryview(p + 1).tolist() == [-4.0]
+    # ffi.buffer() is still a buffer of bytes
+    assert memoryview(buffer(p)).format == 'B'
+    #
+    BInt8 = new_array_type(new_pointer_type(BInt), 8)
+    BInt4x8 = new_array_type(new_pointer_type(BInt8), 4)
+    p = newp(new_pointer_type(BInt4x8), None)
+    p[0][1][2] = 42
+    m = typed_memoryview(p[0])
+    assert m.format == 'i'
+    assert m.ndim == 2
+    assert m.shape == (4, 8)
+    assert m.strides == (8 * sizeof(BInt), sizeof(BInt))
+    assert m.c_contiguous
+    assert m[1, 2] == 42
+    assert m.nbytes == sizeof(BInt4x8)
+    assert typed_memoryview(p).shape == (1, 4, 8)
+    #
+    BStruct = new_struct_type("struct foo")
+    BStructPtr = new_pointer_type(BStruct)
+    complete_struct_or_union(BStruct, [('a1', BChar, -1),
+                                       ('a2', BDouble, -1),
+                                       ('a3', new_array_type(
+                                           new_pointer_type(BShort), 3), -1)])
+    p = newp(new_array_type(BStructPtr, None), 2)
+    m = typed_memoryview(p)
+    pad1 = alignof(BDouble) - 1
+    pad2 = sizeof(BStruct) - (alignof(BDouble) + sizeof(BDouble) +
+                              3 * sizeof(BShort))
+    assert m.format == 'T{c:a1:%dxd:a2:(3)h:a3:%dx}' % (pad1, pad2)
+    assert m.itemsize == sizeof(BStruct)
+    assert m.shape == (2,)
+    assert m.tobytes() == buffer(p)[:]
+    #
+    BPacked = new_struct_type("struct packed")
+    complete_struct_or_union(BPacked, [('a1', BChar, -1),
+                                       ('a2', BDouble, -1)],
+                             None, -1, -1, SF_PACKED)
+    assert sizeof(BPacked) == 1 + sizeof(BDouble)
+    m = typed_memoryview(newp(new_pointer_type(BPacked), None))
+    assert m.format == 'T{^c:a1:d:a2:}'
+    #
+    BUnion = new_union_type("union u")
+    complete_struct_or_union(BUnion, [('a1', BInt, -1)])
+    pytest.raises(TypeError, typed_memoryview,
+                  newp(new_pointer_type(BUnion), None))
+    BBits = new_struct_type("struct bits")
+    complete_struct_or_union(BBits, [('a1', BInt, 3)])
+    e = pytest.raises(TypeError, typed_memoryview,
+                      newp(new_pointer_type(BBits), None))
+    assert str(e.value) == ("cannot describe 'struct bits' as a buffer "
+                            "format: it contains bit fields")
+    BVoidP = new_pointer_type(new_void_type())
+    pytest.raises(TypeError, typed_memoryview, cast(BVoidP, 0))
+    pytest.raises(TypeError, typed_memoryview, cast(BInt, 0))
+    pytest.raises(RuntimeError, typed_memoryview,
+                  cast(new_pointer_type(BInt), 0))
+    m = typed_memoryview(newp(new_array_type(new_pointer_type(BVoidP), 2)))
+    assert m.format == 'P'
+    assert m.tolist() == [0, 0]
+
+def test_gather_scatter():
+    BInt = new_primitive_type("int")
+    BDouble = new_primitive_type("double")
+    BChar = new_primitive_type("char")
+    BStruct = new_struct_type("struct point")
+    BStructPtr = new_pointer_type(BStruct)
+    complete_struct_or_union(BStruct, [('x', BDouble, -1),
+                                       ('c', BChar, -1),
+                                       ('y', BInt, -1),
+                                       ('b', BInt, 3),
+                                       ('p', BStructPtr, -1)])
+    BArray = new_array_type(BStructPtr, None)
+    p = newp(BArray, [(1.5, b'a', 10), (2.5, b'b', 20), (3.5, b'c', 30)])
+    assert gather(p, 'x') == [1.5, 2.5, 3.5]
+    assert gather(p, 'c') == [b'a', b'b', b'c']
+    assert gather(p, 'y') == [10, 20, 30]
+    assert gather(p, 'y', 2) == [10, 20]
+    assert gather(p + 1, 'y', 2) == [20, 30]
+    assert gather(p, 'b') == [0, 0, 0]
+    assert gather(p, 'p') == [cast(BStructPtr, 0)] * 3
+    #
+    assert scatter(p, 'y', [-5, -6]) is None
+    assert [p[i].y for i in range(3)] == [-5, -6, 30]
+    scatter(p, 'x', (1, 2, 3))
+    assert [p[i].x for i in range(3)] == [1.0, 2.0, 3.0]
+    scatter(p + 1, 'b', [-1, 3])
+    assert gather(p, 'b') == [0, -1, 3]
+    scatter(p, 'p', [p + 2, p])
+    assert p[0].p == p + 2 and p[1].p == p
+    assert [p[i].y for i in range(3)] == [-5, -6, 30]   # unchanged
+    #
+    pytest.raises(OverflowError, scatter, p, 'b', [4])
+    pytest.raises(TypeError, scatter, p, 'y', [1, "foo"])
+    assert p[0].y == 1      # the first value was written
+    pytest.raises(TypeError, scatter, p, 'y', 42)
+    pytest.raises(IndexError, scatter, p, 'y', [1, 2, 3, 4])
+    e = pytest.raises(KeyError, gather, p, 'z')
+    assert str(e.value) == "\"'struct point' has no field 'z'\""
+    pytest.raises(KeyError, scatter, p, 'z', [])
+    pytest.raises(TypeError, gather, cast(BStructPtr, p), 'x')
+    assert gather(cast(BStructPtr, p), 'x', 3) == [1.0, 2.0, 3.0]
+    pytest.raises(RuntimeError, gather, cast(BStructPtr, 0), 'x', 3)
+    pytest.raises(TypeError, gather, newp(new_pointer_type(BInt)), 'x', 1)
+    pytest.raises(TypeError, gather, p[0], 'x', 1)
+    # the length cannot be larger than the array
+    e = pytest.raises(IndexError, gather, p, 'x', 100000)
+    assert str(e.value) == ("gather(): length 100000 is larger than the "
+                            "array length 3")
+
+def test_gather_scatter_buffer():
+    import array
+    BInt = new_primitive_type("int")
+    BDouble = new_primitive_type("double")
+    BStruct = new_struct_type("struct point")
+    BStructPtr = new_pointer_type(BStruct)
+    complete_struct_or_union(BStruct, [('x', BDouble, -1),
+                                       ('y', BInt, -1),
+                                       ('b', BInt, 3)])
+    BArray = new_array_type(BStructPtr, None)
+    p = newp(BArray, [(1.5, 10), (2.5, 20), (3.5, 30)])
+    out = array.array('d', [0.0] * 3)
+    assert gather(p, 'x', out=out) is out
+    assert list(out) == [1.5, 2.5, 3.5]
+    out = array.array('i', [0] * 4)
+    gather(p, 'y', 2, out)
+    assert list(out) == [10, 20, 0, 0]
+    gather(cast(BStructPtr, p + 1), 'y', out=array.array('i', [0]))
+    out = bytearray(8 * 3)
+    gather(p, 'x', out=memoryview(out).cast('d'))
+    assert memoryview(out).cast('d').tolist() == [1.5, 2.5, 3.5]
+    pytest.raises(IndexError, gather, p, 'x', out=array.array('d', [0.0]))
+    pytest.raises(TypeError, gather, p, 'x', out=array.array('f', [0] * 3))
+    pytest.raises(TypeError, gather, p, 'y', out=array.array('d', [0] * 3))
+    pytest.raises(TypeError, gather, p, 'b', out=array.array('i', [0] * 3))
+    pytest.raises(BufferError, gather, p, 'x', out=b'\x00' * 24)
+    pytest.raises(TypeError, gather, p, 'x', out=[0, 0, 0])
+    #
+    scatter(p, 'x', array.array('d', [-1.0, -2.0]))
+    scatter(p + 1, 'y', array.array('i', [-5, -6]))
+    assert gather(p, 'x') == [-1.0, -2.0, 3.5]
+    assert gather(p, 'y') == [10, -5, -6]
+    # buffers of another type are used as sequences of Python objects
+    scatter(p, 'x', array.array('i', [7, 8, 9]))
+    assert gather(p, 'x') == [7.0, 8.0, 9.0]
+    scatter(p, 'b', array.array('i', [1, 2]))
+    assert gather(p, 'b') == [1, 2, 0]
+    pytest.raises(IndexError, scatter, p, 'y', array.array('i', [0] * 4))
+    assert gather(p, 'y') == [10, -5, -6]      # unchanged
+
+def test_newp_array_of_primitives_from_list():
+    for typename, minimum, maximum in [
+            ("int8_t",  -2**7, 2**7-1),
+            ("int16_t", -2**15, 2**15-1),
+            ("int32_t", -2**31, 2**31-1),
+            ("int64_t", -2**63, 2**63-1),
+            ("uint8_t",  0, 2**8-1),
+            ("uint16_t", 0, 2**16-1),
+            ("uint32_t", 0, 2**32-1),
+            ("uint64_t", 0, 2**64-1),
+            ]:
+        BItem = new_primitive_type(typename)
+        BArray = new_array_type(new_pointer_type(BItem), None)
+        samples = [minimum, maximum, 0, 1, 42]
+        for seq in [samples, tuple(samples)]:
+            p = newp(BArray, seq)
+            assert len(p) == len(samples)
+            assert unpack(p, len(samples)) == samples
+        pytest.raises(OverflowError, newp, BArray, [0, 1, maximum + 1])
+        pytest.raises(OverflowError, newp, BArray, [0, 1, minimum - 1])
+        pytest.raises(OverflowError, newp, BArray, [2**200])
+        pytest.raises(TypeError, newp, BArray, [0, 1.5])
+        pytest.raises(TypeError, newp, BArray, [0, None])
+        # items that are not plain ints still go through the generic path
+        p = newp(BArray, [True, cast(BItem, 5), 3])
+        assert list(p) == [1, 5, 3]
+    #
+    BBool = new_primitive_type("_Bool")
+    BBoolArray = new_array_type(new_pointer_type(BBool), None)
+    p = newp(BBoolArray, [True, False, 1, 0])
+    assert unpack(p, 4) == [True, False, True, False]
+    pytest.raises(OverflowError, newp, BBoolArray, [True, 2])
+    pytest.raises(TypeError, newp, BBoolArray, [True, 1.0])
+    #
+    for typename in ["float", "double"]:
+        BItem = new_primitive_type(typename)
+        BArray = new_array_type(new_pointer_type(BItem), None)
+        p = newp(BArray, (1.5, -2.25, 3, 2**10))
+        assert unpack(p, 4) == [1.5, -2.25, 3.0, 1024.0]
+        pytest.raises(TypeError, newp, BArray, [1.5, "x"])
+    #
+    BInt = new_primitive_type("int")
+    BArray = new_array_type(new_pointer_type(BInt), 3)
+    p = newp(BArray, [1, 2])
+    assert list(p) == [1, 2, 0]
+    pytest.raises(IndexError, newp, BArray, [1, 2, 3, 4])
+
 def test_cdata_dir():
     BInt = new_primitive_type("int")
     p = cast(BInt, 42)
@@ -61,6 +61,19 @@ extern "C" {
 #include <stddef.h>
 #include "parse_c_type.h"
 
+/* Functions with more than one argument are exposed with METH_FASTCALL
+   when it is available, i.e. on CPython if Py_LIMITED_API is not defined
+   or is at least 3.10.  This requires a version of _cffi_backend that
+   knows about _CFFI_OP_CPYTHON_BLTN_F, hence the bumped version tag. */
+#if defined(METH_FASTCALL) && !defined(PYPY_VERSION)
+#  define _CFFI_USE_FASTCALL
+#  define _CFFI_OP_CPYTHON_BLTN_VF    _CFFI_OP_CPYTHON_BLTN_F
+#  define _CFFI_VERSION_FASTCALL(v)   ((v) > 0x2901 ? (v) : 0x2901)
+#else
+#  define _CFFI_OP_CPYTHON_BLTN_VF    _CFFI_OP_CPYTHON_BLTN_V
+#  define _CFFI_VERSION_FASTCALL(v)   (v)
+#endif
+
 /* this block of #ifs should be kept exactly identical between
    c/_cffi_backend.c, cffi/vengine_cpy.py, cffi/vengine_gen.py
    and cffi/_cffi_include.h */
@@ -222,7 +235,10 @@ extern "C" {
     ((int(*)(PyObject *))_cffi_exports[26])
 #define _cffi_from_c_wchar3216_t                                         \
     ((PyObject *(*)(int))_cffi_exports[27])
-#define _CFFI_NUM_EXPORTS 28
+#define _cffi_prepare_pointer_call_argument_keepalive                    \
+    ((Py_ssize_t(*)(struct _cffi_ctypedescr *,                           \
+                    PyObject *, char **, PyObject **))_cffi_exports[28])
+#define _CFFI_NUM_EXPORTS 29
 
 struct _cffi_ctypedescr;
 
@@ -315,9 +331,35 @@ union _cffi_union_alignment_u {
 
 struct _cffi_freeme_s {
     struct _cffi_freeme_s *next;
+    PyObject *keepalive;     /* if not NULL, released after the call */
     union _cffi_union_alignment_u alignment;
 };
 
+_CFFI_UNUSED_FN static Py_ssize_t
+_cffi_prepare_pointer_argument(struct _cffi_ctypedescr *ctptr, PyObject *arg,
+                               char **output_data,
+                               struct _cffi_freeme_s **freeme)
+{
+    PyObject *keepalive = NULL;
+    Py_ssize_t datasize = _cffi_prepare_pointer_call_argument_keepalive(
+                              ctptr, arg, output_data, &keepalive);
+    if (keepalive != NULL) {
+        /* 'arg' is an object with the buffer interface: keep it
+           exported until the call returns */
+        struct _cffi_freeme_s *fp = (struct _cffi_freeme_s *)PyObject_Malloc(
+            offsetof(struct _cffi_freeme_s, alignment));
+        if (fp == NULL) {
+            Py_DECREF(keepalive);
+            PyErr_NoMemory();
+            return -1;
+        }
+        fp->next = *freeme;
+        fp->keepalive = keepalive;
+        *freeme = fp;
+    }
+    return datasize;
+}
+
 _CFFI_UNUSED_FN static int
 _cffi_convert_array_argument(struct _cffi_ctypedescr *ctptr, PyObject *arg,
                              char **output_data, Py_ssize_t datasize,
@@ -334,6 +376,7 @@ _cffi_convert_array_argument(struct _cffi_ctypedescr *ctptr, PyObject *arg,
         if (fp == NULL)
             return -1;
         fp->next = *freeme;
+        fp->keepalive = NULL;
         *freeme = fp;
         p = *output_data = (char *)&fp->alignment;
     }
@@ -346,6 +389,7 @@ _cffi_free_array_arguments(struct _cffi_freeme_s *freeme)
 {
     do {
         void *p = (void *)freeme;
+        Py_XDECREF(freeme->keepalive);
         freeme = freeme->next;
         PyObject_Free(p);
     } while (freeme != NULL);
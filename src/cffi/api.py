@@ -98,7 +98,8 @@ class FFI(object):
             self.CData, self.CType = backend._get_types()
         self.buffer = backend.buffer
 
-    def cdef(self, csource, override=False, packed=False, pack=None):
+    def cdef(self, csource, override=False, packed=False, pack=None,
+             release_gil=True):
         """Parse the given C source.  This registers all declared functions,
         types, and global variables.  The functions and global variables can
         then be accessed via either 'ffi.dlopen()' or 'ffi.verify()'.
@@ -108,8 +109,12 @@ class FFI(object):
         Alternatively, 'pack' can be a small integer, and requests for
         alignment greater than that are ignored (pack=1 is equivalent to
         packed=True).
+        If 'release_gil' is specified as False, calls to the functions
+        declared inside this cdef don't release the GIL and don't save
+        or restore 'errno'.  Use it only for very short functions.
         """
-        self._cdef(csource, override=override, packed=packed, pack=pack)
+        self._cdef(csource, override=override, packed=packed, pack=pack,
+                   release_gil=release_gil)
 
     def embedding_api(self, csource, packed=False, pack=None):
         self._cdef(csource, packed=packed, pack=pack, dllexport=True)
@@ -274,7 +279,10 @@ class FFI(object):
         'alloc' is called with the size as argument.  If it returns NULL, a
         MemoryError is raised.  'free' is called with the result of 'alloc'
         as argument.  Both can be either Python function or directly C
-        functions.  If 'free' is None, then no free function is called.
+        functions.  If they are C functions with the signatures
+        'void *(size_t)' and 'void(void *)', they are called directly
+        without going through Python.  If 'free' is None, then no free
+        function is called.
         If both 'alloc' and 'free' are None, the default is used.
 
         If 'should_clear_after_alloc' is set to False, then the memory
@@ -290,6 +298,38 @@ class FFI(object):
             return allocator(cdecl, init)
         return allocate
 
+    def new_arena(self, chunk_size=65536, debug=False):
+        """Return a new arena.  Its method new() behaves like ffi.new(),
+        but carves the memory out of chunks of 'chunk_size' bytes.  All
+        this memory is freed at once by release(), or at the end of a
+        'with' statement.  The cdata objects obtained from the arena must
+        not be used after that.
+
+        If 'debug' is True, then release() fills the memory with the byte
+        0xDD instead of freeing it, and a RuntimeWarning is issued if this
+        memory is found modified when it is really freed.
+        """
+        compiled_ffi = self._backend.FFI()
+        return _Arena(self, compiled_ffi.new_arena(chunk_size, debug))
+
+    def free_list_stats(self):
+        """Return a dict with statistics about the free lists of small
+        objects allocated by ffi.new(): 'hits' and 'misses' count the
+        allocations that could or could not reuse a cached block;
+        'cached' and 'cached_bytes' give the current content of the free
+        lists; and 'limit' is the maximum number of blocks cached per
+        size class.
+        """
+        return self._backend.free_list_stats()
+
+    def trim_free_lists(self, limit=-1):
+        """Free all the blocks cached in the free lists of small objects
+        allocated by ffi.new(), and return their number.  If 'limit' is
+        given, it becomes the new maximum number of blocks cached per
+        size class; 0 disables the free lists.
+        """
+        return self._backend.trim_free_lists(limit)
+
     def cast(self, cdecl, source):
         """Similar to a C cast: returns an instance of the named C
         type initialized with the given 'source'.  The source is
@@ -317,7 +357,7 @@ class FFI(object):
         """
         return self._backend.string(cdata, maxlen)
 
-    def unpack(self, cdata, length):
+    def unpack(self, cdata, length, as_=None):
         """Unpack an array of C data of the given length,
         returning a Python string/unicode/list.
 
@@ -331,8 +371,52 @@ class FFI(object):
         If 'cdata' is a pointer to anything else, returns a list of
         'length' items.  This is a faster equivalent to:
         [cdata[i] for i in range(length)]
+
+        With 'as_', returns instead a copy of the raw bytes (as_='bytes'),
+        an array.array copy (as_='array'), or a typed memoryview that
+        refers to the original memory (as_='memoryview').  The last two
+        are only for primitive number types.
+        """
+        if as_ is None:
+            return self._backend.unpack(cdata, length)
+        return self._backend.unpack(cdata, length, as_)
+
+    def memoryview(self, cdata, length=-1):
+        """Return a memoryview of the C data pointed to by the given
+        'cdata', which must be a pointer or an array.  Unlike
+        ffi.buffer(), the memoryview has the PEP 3118 format, itemsize
+        and shape of the C type: for example 'd' for 'double[]', 'T{...}'
+        for structs, and a shape of (4, 8) for 'int[4][8]'.  'length' is
+        the number of items; by default it is the length of the array,
+        or 1 for a pointer.
         """
-        return self._backend.unpack(cdata, length)
+        return self._backend.typed_memoryview(cdata, length)
+
+    def gather(self, cdata, fieldname, length=-1, out=None):
+        """Read the field 'fieldname' of all the structs in the array
+        'cdata', returning a Python list.  This is a faster equivalent
+        to: [cdata[i].fieldname for i in range(length)].  'length'
+        defaults to the length of the array; it is required if 'cdata'
+        is a pointer.
+
+        If 'out' is given, it must be a writable buffer with items of
+        the field's type, like an array.array or a numpy array; the
+        values are copied into it, and 'out' is returned instead of a
+        list.  In that case 'length' defaults to the size of 'out' for
+        a pointer.
+        """
+        return self._backend.gather(cdata, fieldname, length, out)
+
+    def scatter(self, cdata, fieldname, values):
+        """Write the field 'fieldname' of the structs in the array
+        'cdata' from the items of the sequence 'values'.  This is a
+        faster equivalent to:
+        for i, value in enumerate(values): cdata[i].fieldname = value
+
+        'values' can also be a buffer with items of the field's type,
+        like an array.array or a numpy array, which is copied directly.
+        """
+        self._backend.scatter(cdata, fieldname, values)
 
    #def buffer(self, cdata, size=-1):
    #    """Return a read-write buffer object that references the raw C data
@@ -402,6 +486,20 @@ class FFI(object):
         else:
             return callback_decorator_wrap(python_callable)  # direct mode
 
+    def callback_factory(self, cdecl, error=None, onerror=None,
+                         pool_size=64):
+        """Return a factory that makes callbacks of the C function pointer
+        type 'cdecl'.  Calling the factory with a Python callable returns
+        a callback object, like ffi.callback(cdecl, python_callable,
+        error, onerror).  It is faster if many callbacks are made with the
+        same type: the closures of the callbacks that are gone are kept
+        (up to 'pool_size') and reused.
+        """
+        if isinstance(cdecl, basestring):
+            cdecl = self._typeof(cdecl, consider_function_as_funcptr=True)
+        compiled_ffi = self._backend.FFI()
+        return compiled_ffi.callback_factory(cdecl, error, onerror, pool_size)
+
     def getctype(self, cdecl, replace_with=''):
         """Return a string giving the C type 'cdecl', which may be itself
         a string or a <ctype> object.  If 'replace_with' is given, it gives
@@ -418,18 +516,59 @@ class FFI(object):
             replace_with = ' ' + replace_with
         return self._backend.getcname(cdecl, replace_with)
 
-    def gc(self, cdata, destructor, size=0):
+    def gc(self, cdata, destructor, size=0, deferred=False):
         """Return a new cdata object that points to the same
         data.  Later, when this new cdata object is garbage-collected,
         'destructor(old_cdata_object)' will be called.
 
         The optional 'size' gives an estimate of the size, used to
-        trigger the garbage collection more eagerly.  So far only used
-        on PyPy.  It tells the GC that the returned object keeps alive
-        roughly 'size' bytes of external memory.
+        trigger the garbage collection more eagerly.  It tells the GC
+        that the returned object keeps alive roughly 'size' bytes of
+        external memory.  See ffi.external_memory_stats().
+
+        If 'deferred' is True, the destructor is not called when the
+        object is garbage-collected, but only queued; see
+        ffi.drain_destructors().
         """
+        if deferred:
+            return self._backend.gcp(cdata, destructor, size, deferred)
         return self._backend.gcp(cdata, destructor, size)
 
+    def closure_stats(self):
+        """Return a dict about the memory used by ffi.callback():
+        'mapped_pages' and 'chunks' give the number of pages of executable
+        memory and the number of blocks of pages currently mapped,
+        'page_size' the size of a page, 'live_closures' the number of
+        callbacks alive, and 'free_slots' the number of callbacks that
+        can still be created without mapping more pages.
+        """
+        return self._backend.closure_stats()
+
+    def drain_destructors(self):
+        """Call the destructors queued by the objects returned by
+        ffi.gc(..., deferred=True) that were garbage-collected.  They are
+        called in the order in which these objects were garbage-collected.
+        Returns the number of destructors called.
+        """
+        return self._backend.drain_destructors()
+
+    def external_memory_stats(self):
+        """Return a dict about the external memory declared with
+        ffi.gc(..., size=n): 'bytes' is the total size currently held by
+        the living objects, 'threshold' is the growth of 'bytes' after
+        which a full garbage collection is scheduled, and 'collections'
+        counts these collections so far.
+        """
+        return self._backend.external_memory_stats()
+
+    def set_external_memory_threshold(self, threshold):
+        """Set the growth, in bytes, of the external memory declared with
+        ffi.gc(..., size=n) after which a full garbage collection is
+        scheduled.  0 disables these collections.  Returns the previous
+        threshold.
+        """
+        return self._backend.set_external_memory_threshold(threshold)
+
     def _get_cached_btype(self, type):
         assert self._lock.acquire(False) is False
         # call me with the lock!
@@ -543,6 +682,18 @@ class FFI(object):
     def from_handle(self, x):
         return self._backend.from_handle(x)
 
+    def new_handle_table(self):
+        """Return a new handle table.  Its method new(x) returns a
+        'void *' handle that refers to the Python object 'x', like
+        ffi.new_handle(), but the handle stays valid until it is
+        explicitly released with release(handle).  get(handle) returns
+        the Python object, or raises KeyError if the handle was already
+        released.  The handles are small integers (a table index and a
+        generation counter), not addresses.
+        """
+        compiled_ffi = self._backend.FFI()
+        return compiled_ffi.new_handle_table()
+
     def release(self, x):
         self._backend.release(x)
 
@@ -800,6 +951,24 @@ class FFI(object):
         unions.sort()
         return (typedefs, structs, unions)
 
+    def preload_types(self):
+        """Build now all the types declared in this FFI instance: the
+        typedefs, the structs and unions with their fields, and the enums.
+        Otherwise, they are built lazily the first time they are used.
+        For example, call it before forking worker processes, so that they
+        all start with the types already built.  Returns the time it took,
+        in seconds.
+        """
+        import time
+        t0 = time.perf_counter()
+        for key in list(self._parser._declarations):
+            if key.startswith('typedef '):
+                self._typeof(key[8:], consider_function_as_funcptr=True)
+            elif key.startswith(('struct ', 'union ', 'enum ')):
+                if '$' not in key:
+                    self._typeof(key)
+        return time.perf_counter() - t0
+
 
 def _load_backend_lib(backend, name, flags):
     import os
@@ -833,9 +1002,12 @@ def _make_ffi_library(ffi, libname, flags):
     #
     def accessor_function(name):
         key = 'function ' + name
-        tp, _ = ffi._parser._declarations[key]
+        tp, quals = ffi._parser._declarations[key]
         BType = ffi._get_cached_btype(tp)
-        value = backendlib.load_function(BType, name)
+        if quals & model.Q_KEEP_GIL:
+            value = backendlib.load_function(BType, name, False)
+        else:
+            value = backendlib.load_function(BType, name)
         library.__dict__[name] = value
     #
     def accessor_variable(name):
@@ -963,3 +1135,34 @@ def _builtin_function_type(func):
     else:
         with ffi._lock:
             return ffi._get_cached_btype(tp)
+
+
+class _Arena(object):
+    # wraps the arena of the backend, so that new() accepts the types
+    # declared with this FFI's cdef()
+
+    def __init__(self, ffi, arena):
+        self._ffi = ffi
+        self._arena = arena
+
+    def new(self, cdecl, init=None):
+        if isinstance(cdecl, basestring):
+            cdecl = self._ffi._typeof(cdecl)
+        return self._arena.new(cdecl, init)
+
+    def release(self):
+        self._arena.release()
+
+    @property
+    def released(self):
+        return self._arena.released
+
+    @property
+    def allocated(self):
+        return self._arena.allocated
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._arena.release()
@@ -1100,7 +1100,7 @@ class CTypesLibrary(object):
         self.backend = backend
         self.cdll = cdll
 
-    def load_function(self, BType, name):
+    def load_function(self, BType, name, release_gil=True):
         c_func = getattr(self.cdll, name)
         funcobj = BType._from_ctypes(c_func)
         funcobj._name = name
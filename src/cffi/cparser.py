@@ -5,16 +5,7 @@ try:
     from . import _pycparser as pycparser
 except ImportError:
     import pycparser
-import weakref, re, sys
-
-try:
-    if sys.version_info < (3,):
-        import thread as _thread
-    else:
-        import _thread
-    lock = _thread.allocate_lock()
-except ImportError:
-    lock = None
+import weakref, re, sys, os
 
 def _workaround_for_static_import_finders():
     # Issue #392: packaging tools like cx_Freeze can not find these
@@ -34,7 +25,6 @@ _r_partial_enum = re.compile(r"=\s*\.\.\.\s*[,}]|\.\.\.\s*\}")
 _r_enum_dotdotdot = re.compile(r"__dotdotdot\d+__$")
 _r_partial_array = re.compile(r"\[\s*\.\.\.\s*\]")
 _r_words = re.compile(r"\w+|\S")
-_parser_cache = None
 _r_int_literal = re.compile(r"-?0?x?[0-9a-f]+[lu]*$", re.IGNORECASE)
 _r_stdcall1 = re.compile(r"\b(__stdcall|WINAPI)\b")
 _r_stdcall2 = re.compile(r"[(]\s*(__stdcall|WINAPI)\b")
@@ -47,11 +37,106 @@ _r_int_dotdotdot = re.compile(r"(\b(int|long|short|signed|unsigned|char)\s*)+"
                               r"\.\.\.")
 _r_float_dotdotdot = re.compile(r"\b(double|float)\s*\.\.\.")
 
+# A CParser instance is not thread-safe, but it can be reused for
+# the next parse.  Instead of a single one protected by a lock, we keep
+# a pool of idle instances: each parse takes one out of the pool, or
+# makes a new one, and puts it back afterwards.  So the number of
+# instances is the maximum number of parses done in parallel.  The
+# list methods pop() and append() are atomic.
+_parser_pool = []
+
 def _get_parser():
-    global _parser_cache
-    if _parser_cache is None:
-        _parser_cache = pycparser.CParser()
-    return _parser_cache
+    try:
+        return _parser_pool.pop()
+    except IndexError:
+        return pycparser.CParser()
+
+def _release_parser(parser):
+    _parser_pool.append(parser)
+
+# ____________________________________________________________
+# Opt-in on-disk cache of the result of parsing a cdef().  Only used
+# for the first cdef() of a Parser: the result of the later ones
+# depends on what was already declared, and the new declarations may
+# refer to the existing type objects, which must not be duplicated.
+
+_cdef_cache_dir = None
+_CDEF_CACHE_ATTRS = ('_declarations', '_anonymous_counter', '_int_constants',
+                     '_recomplete', '_uses_new_feature')
+
+def set_cdef_cache_dir(dirname):
+    """Set the directory in which the results of parsing cdef() sources
+    are cached, or None to use the CFFI_CDEF_CACHE_DIR environment
+    variable.  If neither is set, there is no cache."""
+    global _cdef_cache_dir
+    _cdef_cache_dir = dirname
+
+def _get_cdef_cache_dir():
+    return _cdef_cache_dir or os.environ.get('CFFI_CDEF_CACHE_DIR')
+
+def _cdef_cache_filename(dirname, csource, options):
+    import hashlib
+    from . import __version__
+    key = [__version__, pycparser.__version__, sys.version]
+    # a development checkout of cffi can change without changing the
+    # version number
+    for modfile in (__file__, model.__file__):
+        try:
+            key.append(str(os.stat(modfile).st_mtime))
+        except OSError:
+            pass
+    key.append(repr(sorted(options.items())))
+    key.append(csource)
+    key = '\x00'.join(key).encode('utf-8')
+    return os.path.join(dirname,
+                        '_cffi_cdef_%s.pickle' % hashlib.sha256(key).hexdigest())
+
+# The types like 'FILE' are shared by all the Parsers, and some of them
+# are compared by identity.  They are pickled by name, in order to load
+# the very same objects.
+
+def _cdef_cache_load(filename, parser):
+    import pickle
+
+    class Unpickler(pickle.Unpickler):
+        def persistent_load(self, commontype):
+            return resolve_common_type(parser, commontype)[0]
+
+    try:
+        with open(filename, 'rb') as f:
+            state = Unpickler(f).load()
+    except Exception:     # missing, unreadable or corrupted: parse again
+        return None
+    if (not isinstance(state, dict) or
+            sorted(state) != sorted(_CDEF_CACHE_ATTRS)):
+        return None
+    return state
+
+def _cdef_cache_save(filename, state):
+    import pickle, tempfile
+    from .commontypes import _CACHE
+    common = dict([(id(tp), commontype)
+                   for commontype, (tp, _) in _CACHE.items()])
+
+    class Pickler(pickle.Pickler):
+        def persistent_id(self, obj):
+            return common.get(id(obj))
+
+    dirname = os.path.dirname(filename)
+    try:
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    except OSError:
+        return      # the cache is only an optimization
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            Pickler(f, pickle.HIGHEST_PROTOCOL).dump(state)
+        os.replace(tmpname, filename)   # atomic, for concurrent processes
+    except Exception:
+        try:
+            os.unlink(tmpname)
+        except OSError:
+            pass
 
 def _workaround_for_old_pycparser(csource):
     # Workaround for a pycparser issue (fixed between pycparser 2.10 and
@@ -331,15 +416,13 @@ class Parser(object):
         csourcelines.append(csource)
         csourcelines.append('')   # see test_missing_newline_bug
         fullcsource = '\n'.join(csourcelines)
-        if lock is not None:
-            lock.acquire()     # pycparser is not thread-safe...
+        parser = _get_parser()     # not shared with other threads
         try:
-            ast = _get_parser().parse(fullcsource)
+            ast = parser.parse(fullcsource)
         except pycparser.c_parser.ParseError as e:
             self.convert_pycparser_error(e, csource)
         finally:
-            if lock is not None:
-                lock.release()
+            _release_parser(parser)
         # csource will be used to find buggy source text
         return ast, macros, csource
 
@@ -368,7 +451,7 @@ class Parser(object):
         raise CDefError(msg)
 
     def parse(self, csource, override=False, packed=False, pack=None,
-                    dllexport=False):
+                    dllexport=False, release_gil=True):
         if packed:
             if packed != True:
                 raise ValueError("'packed' should be False or True; use "
@@ -386,11 +469,31 @@ class Parser(object):
         try:
             self._options = {'override': override,
                              'packed': pack,
-                             'dllexport': dllexport}
-            self._internal_parse(csource)
+                             'dllexport': dllexport,
+                             'release_gil': release_gil}
+            cache_dir = _get_cdef_cache_dir()
+            if cache_dir and self._is_empty():
+                self._cached_internal_parse(csource, cache_dir)
+            else:
+                self._internal_parse(csource)
         finally:
             self._options = prev_options
 
+    def _is_empty(self):
+        return not (self._declarations or self._int_constants or
+                    self._anonymous_counter or self._recomplete)
+
+    def _cached_internal_parse(self, csource, cache_dir):
+        filename = _cdef_cache_filename(cache_dir, csource, self._options)
+        state = _cdef_cache_load(filename, self)
+        if state is not None:
+            self.__dict__.update(state)
+            return
+        self._internal_parse(csource)
+        state = dict([(name, getattr(self, name))
+                      for name in _CDEF_CACHE_ATTRS])
+        _cdef_cache_save(filename, state)
+
     def _internal_parse(self, csource):
         ast, macros, csource = self._parse(csource)
         # add the macros
@@ -504,6 +607,9 @@ class Parser(object):
             tag = 'extern_python_plus_c '
         else:
             tag = 'function '
+            if not self._options.get('release_gil', True):
+                self._declare(tag + decl.name, tp, quals=model.Q_KEEP_GIL)
+                return
         self._declare(tag + decl.name, tp)
 
     def _parse_decl(self, decl):
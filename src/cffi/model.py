@@ -8,6 +8,8 @@ from .error import CDefError, VerificationError, VerificationMissing
 Q_CONST    = 0x01
 Q_RESTRICT = 0x02
 Q_VOLATILE = 0x04
+# not a C qualifier: on functions declared with cdef(release_gil=False)
+Q_KEEP_GIL = 0x08
 
 def qualify(quals, replace_with):
     if quals & Q_CONST:
@@ -6,6 +6,7 @@ from .cffi_opcode import *
 VERSION_BASE = 0x2601
 VERSION_EMBEDDED = 0x2701
 VERSION_CHAR16CHAR32 = 0x2801
+VERSION_BUFFER_ARGS = 0x2902
 
 USE_LIMITED_API = (sys.platform != 'win32' or sys.version_info < (3, 0) or
                    sys.version_info >= (3, 5))
@@ -125,6 +126,7 @@ class TypenameExpr:
 
 class Recompiler:
     _num_externpy = 0
+    _num_fastcall = 0
 
     def __init__(self, ffi, module_name, target_is_python=False):
         self.ffi = ffi
@@ -445,18 +447,21 @@ class Recompiler:
         prnt('#  endif')
         prnt('#  endif')
         prnt('#elif PY_MAJOR_VERSION >= 3')
+        version = '0x%x' % (self._version,)
+        if self._num_fastcall > 0:
+            version = '_CFFI_VERSION_FASTCALL(%s)' % (version,)
         prnt('PyMODINIT_FUNC')
         prnt('PyInit_%s(void)' % (base_module_name,))
         prnt('{')
-        prnt('  return _cffi_init("%s", 0x%x, &_cffi_type_context);' % (
-            self.module_name, self._version))
+        prnt('  return _cffi_init("%s", %s, &_cffi_type_context);' % (
+            self.module_name, version))
         prnt('}')
         prnt('#else')
         prnt('PyMODINIT_FUNC')
         prnt('init%s(void)' % (base_module_name,))
         prnt('{')
-        prnt('  _cffi_init("%s", 0x%x, &_cffi_type_context);' % (
-            self.module_name, self._version))
+        prnt('  _cffi_init("%s", %s, &_cffi_type_context);' % (
+            self.module_name, version))
         prnt('}')
         prnt('#endif')
         prnt()
@@ -584,9 +589,10 @@ class Recompiler:
                           ' _cffi_free_array_arguments(large_args_free);')
 
     def _convert_funcarg_to_c_ptr_or_array(self, tp, fromvar, tovar, errcode):
-        self._prnt('  datasize = _cffi_prepare_pointer_call_argument(')
-        self._prnt('      _cffi_type(%d), %s, (char **)&%s);' % (
-            self._gettypenum(tp), fromvar, tovar))
+        self.needs_version(VERSION_BUFFER_ARGS)
+        self._prnt('  datasize = _cffi_prepare_pointer_argument(')
+        self._prnt('      _cffi_type(%d), %s, (char **)&%s, &large_args_free);'
+                   % (self._gettypenum(tp), fromvar, tovar))
         self._prnt('  if (datasize != 0) {')
         self._prnt('    %s = ((size_t)datasize) <= 640 ? '
                    '(%s)alloca((size_t)datasize) : NULL;' % (
@@ -706,8 +712,17 @@ class Recompiler:
         #
         prnt('#ifndef PYPY_VERSION')        # ------------------------------
         #
+        if numargs > 1:
+            # METH_FASTCALL if available, else METH_VARARGS
+            prnt('#ifdef _CFFI_USE_FASTCALL')
+            prnt('static PyObject *')
+            prnt('_cffi_f_%s(PyObject *self, PyObject *const *args, '
+                 'Py_ssize_t nargs)' % (name,))
+            prnt('#else')
         prnt('static PyObject *')
         prnt('_cffi_f_%s(PyObject *self, PyObject *%s)' % (name, argname))
+        if numargs > 1:
+            prnt('#endif')
         prnt('{')
         #
         context = 'argument of %s' % name
@@ -737,24 +752,44 @@ class Recompiler:
             for i in rng:
                 prnt('  PyObject *arg%d;' % i)
             prnt()
+            prnt('#ifdef _CFFI_USE_FASTCALL')
+            prnt('  if (nargs != %d) {' % len(rng))
+            prnt('    PyErr_Format(PyExc_TypeError, "%%.200s expected %%zd '
+                 'arguments, got %%zd", "%s", (Py_ssize_t)%d, nargs);' % (
+                name, len(rng)))
+            prnt('    return NULL;')
+            prnt('  }')
+            for i in rng:
+                prnt('  arg%d = args[%d];' % (i, i))
+            prnt('#else')
             prnt('  if (!PyArg_UnpackTuple(args, "%s", %d, %d, %s))' % (
                 name, len(rng), len(rng),
                 ', '.join(['&arg%d' % i for i in rng])))
             prnt('    return NULL;')
+            prnt('#endif')
+            self._num_fastcall += 1
         prnt()
         #
+        # in case of error, release the arguments converted so far: some
+        # are allocated, and some keep a buffer exported
+        errcode = 'return NULL'
+        if freelines:
+            errcode = '{ %s %s; }' % (' '.join(sorted(freelines)), errcode)
         for i, type in enumerate(tp.args):
-            self._convert_funcarg_to_c(type, 'arg%d' % i, 'x%d' % i,
-                                       'return NULL')
+            self._convert_funcarg_to_c(type, 'arg%d' % i, 'x%d' % i, errcode)
             prnt()
         #
-        prnt('  Py_BEGIN_ALLOW_THREADS')
-        prnt('  _cffi_restore_errno();')
         call_arguments = ['x%d' % i for i in range(len(tp.args))]
         call_arguments = ', '.join(call_arguments)
-        prnt('  { %s%s(%s); }' % (result_code, name, call_arguments))
-        prnt('  _cffi_save_errno();')
-        prnt('  Py_END_ALLOW_THREADS')
+        if self._current_quals & model.Q_KEEP_GIL:
+            # declared in a cdef(release_gil=False)
+            prnt('  { %s%s(%s); }' % (result_code, name, call_arguments))
+        else:
+            prnt('  Py_BEGIN_ALLOW_THREADS')
+            prnt('  _cffi_restore_errno();')
+            prnt('  { %s%s(%s); }' % (result_code, name, call_arguments))
+            prnt('  _cffi_save_errno();')
+            prnt('  Py_END_ALLOW_THREADS')
         prnt()
         #
         prnt('  (void)self; /* unused */')
@@ -837,10 +872,15 @@ class Recompiler:
         elif numargs == 1:
             meth_kind = OP_CPYTHON_BLTN_O   # 'METH_O'
         else:
-            meth_kind = OP_CPYTHON_BLTN_V   # 'METH_VARARGS'
+            # 'METH_FASTCALL' or 'METH_VARARGS', see _cffi_include.h
+            meth_kind = None
+        if meth_kind is None:
+            type_op = CffiOp(None, '_CFFI_OP(_CFFI_OP_CPYTHON_BLTN_VF, %d)'
+                                   % (type_index,))
+        else:
+            type_op = CffiOp(meth_kind, type_index)
         self._lsts["global"].append(
-            GlobalExpr(name, '_cffi_f_%s' % name,
-                       CffiOp(meth_kind, type_index),
+            GlobalExpr(name, '_cffi_f_%s' % name, type_op,
                        size='_cffi_d_%s' % name))
 
     # ----------
@@ -1,4 +1,4 @@
-import sys, platform
+import sys, platform, array
 import pytest
 from testing.cffi0 import backend_tests, test_function, test_ownlib
 from testing.support import u
@@ -23,6 +23,22 @@ class TestFFI(backend_tests.BackendTests,
         assert str(e.value) == ("struct foo_s(*)(): "
             "callback with unsupported argument or return type or with '...'")
 
+    def test_cdef_release_gil_false(self):
+        if sys.version_info < (3, 9) or '__pypy__' in sys.builtin_module_names:
+            pytest.skip("only on CPython >= 3.9")
+        ffi = FFI(backend=self.Backend())
+        ffi.cdef("int PyGILState_Check(void);", release_gil=False)
+        try:
+            lib = ffi.dlopen(None)
+            lib.PyGILState_Check
+        except (OSError, AttributeError):
+            pytest.skip("cannot find PyGILState_Check() with dlopen(None)")
+        assert lib.PyGILState_Check() == 1
+        ffi = FFI(backend=self.Backend())
+        ffi.cdef("int PyGILState_Check(void);")
+        lib = ffi.dlopen(None)
+        assert lib.PyGILState_Check() == 0
+
     def test_inspecttype(self):
         ffi = FFI(backend=self.Backend())
         assert ffi.typeof("long").kind == "primitive"
@@ -58,6 +74,18 @@ class TestFFI(backend_tests.BackendTests,
         assert tb.tb_frame.f_code.co_name == 'cb'
         assert tb.tb_frame.f_locals['n'] == 234
 
+    def test_callback_factory(self):
+        ffi = FFI(backend=self.Backend())
+        factory = ffi.callback_factory("int(*)(int)", error=42,
+                                       onerror=lambda *args: None)
+        assert factory.ctype == ffi.typeof("int(*)(int)")
+        a = factory(lambda n: n * 2)
+        b = factory(lambda n: undefined_name)
+        assert a(21) == 42
+        assert b(21) == 42
+        del a
+        assert factory.pooled == 1
+
     def test_ffi_new_allocator_2(self):
         ffi = FFI(backend=self.Backend())
         seen = []
@@ -129,6 +157,57 @@ class TestFFI(backend_tests.BackendTests,
         alloc5 = ffi.new_allocator(myalloc5)
         pytest.raises(MemoryError, alloc5, "int[5]")
 
+    def test_ffi_new_allocator_c_functions(self):
+        if sys.platform == 'win32':
+            pytest.skip("no 'malloc' in dlopen(None) on Windows")
+        ffi = FFI(backend=self.Backend())
+        ffi.cdef("void *malloc(size_t); void free(void *);")
+        lib = ffi.dlopen(None)
+        alloc1 = ffi.new_allocator(lib.malloc, lib.free)
+        p1 = alloc1("int[10]")
+        assert ffi.typeof(p1) == ffi.typeof("int[10]")
+        assert list(p1) == [0] * 10
+        p1[9] = 42
+        p2 = alloc1("struct { int a; } *", [123])
+        assert p2.a == 123
+        ffi.release(p1)
+        ffi.release(p2)
+        del p1, p2
+        #
+        # check with callbacks that the C functions are really called
+        seen = []
+        keepalive = {}
+        @ffi.callback("void *(size_t)")
+        def myalloc(size):
+            seen.append(size)
+            raw = ffi.new("char[]", size)
+            keepalive[ffi.cast("intptr_t", raw)] = raw
+            return raw
+        @ffi.callback("void(void *)")
+        def myfree(raw):
+            seen.append(keepalive.pop(ffi.cast("intptr_t", raw)))
+        alloc2 = ffi.new_allocator(myalloc, myfree,
+                                   should_clear_after_alloc=False)
+        p1 = alloc2("int[5]")
+        assert seen == [20]
+        raw1 = list(keepalive.values())[0]
+        assert ffi.cast("intptr_t", p1) == ffi.cast("intptr_t", raw1)
+        ffi.release(p1)
+        assert seen == [20, raw1]
+        assert keepalive == {}
+        #
+        alloc3 = ffi.new_allocator(myalloc)    # no 'free'
+        p1 = alloc3("int[2]")
+        del p1
+        assert len(keepalive) == 1
+        #
+        # a C function returning NULL
+        @ffi.callback("void *(size_t)")
+        def myalloc_null(size):
+            return ffi.NULL
+        alloc4 = ffi.new_allocator(myalloc_null, lib.free)
+        pytest.raises(MemoryError, alloc4, "int[5]")
+
     def test_new_struct_containing_struct_containing_array_varsize(self):
         ffi = FFI(backend=self.Backend())
         ffi.cdef("""
@@ -581,6 +660,33 @@ class TestBitfield:
         p = ffi.new("int[]", [-123456789])
         assert ffi.unpack(p, 1) == [-123456789]
 
+    def test_gather_scatter(self):
+        ffi = FFI()
+        ffi.cdef("struct point { int x, y; };")
+        p = ffi.new("struct point[]", [[1, 2], [3, 4], [5, 6]])
+        assert ffi.gather(p, "y") == [2, 4, 6]
+        ffi.scatter(p, "x", [7, 8])
+        assert ffi.gather(p, "x") == [7, 8, 5]
+        assert ffi.gather(p + 1, "x", 2) == [8, 5]
+        out = array.array('i', [0] * 3)
+        assert ffi.gather(p, "y", out=out) is out
+        assert list(out) == [2, 4, 6]
+        ffi.scatter(p, "x", array.array('i', [-1, -2, -3]))
+        assert ffi.gather(p, "x") == [-1, -2, -3]
+
+    def test_new_arena(self):
+        ffi = FFI()
+        ffi.cdef("struct point { int x, y; };")
+        with ffi.new_arena() as arena:
+            p = arena.new("struct point *", [1, 2])
+            q = arena.new("struct point[]", 3)
+            assert p.y == 2
+            assert ffi.typeof(q) is ffi.typeof("struct point[]")
+            assert len(q) == 3 and q[2].x == 0
+            assert arena.allocated >= 4 * ffi.sizeof("struct point")
+        assert arena.released
+        pytest.raises(ValueError, arena.new, "int *")
+
     def test_negative_array_size(self):
         ffi = FFI()
         pytest.raises(ValueError, ffi.cast, "int[-5]", 0)
@@ -618,3 +618,91 @@ def test_missing_newline_bug():
     ffi = FFI(backend=FakeBackend())
     ffi.cdef("#pragma foobar")
     ffi.cdef("#pragma foobar")    # used to crash the second time
+
+def test_cdef_cache_dir():
+    import tempfile, os
+    from testing.udir import udir
+    from cffi import cparser
+    tmpdir = tempfile.mkdtemp(dir=str(udir))
+    csource = """
+        typedef struct { int x; } foo_t;
+        FILE *myfile;
+        int f(foo_t *);
+        #define FOO 42
+    """
+    cparser.set_cdef_cache_dir(tmpdir)
+    try:
+        ffi = FFI(backend=FakeBackend())
+        ffi.cdef(csource)
+        assert len(os.listdir(tmpdir)) == 1
+        #
+        # a fresh Parser loads the same result from the cache
+        seen = []
+        def no_parse(self, csource):
+            seen.append(csource)
+            raise AssertionError("should not be called")
+        prev_internal_parse = cparser.Parser._internal_parse
+        cparser.Parser._internal_parse = no_parse
+        try:
+            ffi2 = FFI(backend=FakeBackend())
+            ffi2.cdef(csource)
+        finally:
+            cparser.Parser._internal_parse = prev_internal_parse
+        assert seen == []
+        decls = ffi2._parser._declarations
+        assert sorted(decls) == sorted(ffi._parser._declarations)
+        assert ffi2._parser._int_constants == {'FOO': 42}
+        tp, quals = decls['function f']
+        assert tp.args[0].totype is decls['typedef foo_t'][0]
+        tp, quals = decls['variable myfile']
+        assert tp.totype is ffi2._parser.parse_type("FILE")
+        #
+        # other options or further cdefs don't use the same cache entry
+        ffi3 = FFI(backend=FakeBackend())
+        ffi3.cdef(csource, packed=True)
+        assert len(os.listdir(tmpdir)) == 2
+        ffi3.cdef("int g(foo_t *);")
+        assert len(os.listdir(tmpdir)) == 2
+        #
+        # a corrupted cache file is ignored
+        for fn in os.listdir(tmpdir):
+            with open(os.path.join(tmpdir, fn), 'wb') as f:
+                f.write(b'garbage')
+        ffi4 = FFI(backend=FakeBackend())
+        ffi4.cdef(csource)
+        assert sorted(ffi4._parser._declarations) == sorted(decls)
+    finally:
+        cparser.set_cdef_cache_dir(None)
+
+def test_parse_in_parallel():
+    import threading
+    from cffi import cparser
+    # two threads must be able to be inside the C parser at the same time
+    barrier = threading.Barrier(2, timeout=10)
+    class WaitingParser(object):
+        def __init__(self):
+            self.parser = cparser.pycparser.CParser()
+        def parse(self, text):
+            barrier.wait()
+            return self.parser.parse(text)
+    #
+    prev_pool = cparser._parser_pool[:]
+    cparser._parser_pool[:] = [WaitingParser(), WaitingParser()]
+    results = {}
+    def run(i):
+        try:
+            ffi = FFI(backend=FakeBackend())
+            ffi.cdef("int f%d(int);" % i)
+            results[i] = sorted(ffi._parser._declarations)
+        except Exception as e:
+            results[i] = e
+    try:
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(cparser._parser_pool) == 2     # both were put back
+    finally:
+        cparser._parser_pool[:] = prev_pool
+    assert results == {0: ['function f0'], 1: ['function f1']}
@@ -65,6 +65,55 @@ def test_ffi_cache_type_globally():
     t2 = ffi2.typeof("int *")
     assert t1 is t2
 
+def test_ffi_type_cache_bounded():
+    import weakref, gc
+    ffi = _cffi1_backend.FFI()
+    assert ffi.type_cache_stats() == {'hits': 0, 'misses': 0, 'names': 0,
+                                      'adhoc': 0, 'limit': 1000}
+    assert ffi.set_type_cache_limit(20) == 1000
+    t1 = ffi.typeof("int")
+    assert ffi.typeof("int") is t1
+    t2 = ffi.typeof("char[1]")
+    w2 = weakref.ref(t2)
+    del t2
+    stats = ffi.type_cache_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2
+    assert stats['names'] == 1 and stats['adhoc'] == 1
+    #
+    for i in range(2, 100):
+        p = ffi.new("char[%d]" % i)
+        assert len(p) == i
+        p = ffi.cast("char(*)[%d]" % i, 0)
+    stats = ffi.type_cache_stats()
+    assert stats['names'] == 1          # "int" is still cached
+    assert 0 < stats['adhoc'] <= 20
+    assert ffi.typeof("int") is t1
+    gc.collect()
+    assert w2() is None                 # "char[1]" was dropped
+    #
+    # only the exact names are cached forever, not variants of them
+    for i in range(1, 100):
+        assert ffi.typeof("int" + " " * i) is t1
+    assert ffi.typeof("const int") is t1
+    assert ffi.typeof("signed") is t1
+    stats = ffi.type_cache_stats()
+    assert stats['names'] == 1 and stats['adhoc'] <= 20
+    #
+    # a string that is used again survives
+    ffi.set_type_cache_limit(4)
+    t3 = ffi.typeof("short *")
+    w3 = weakref.ref(t3)
+    del t3
+    for i in range(20):
+        ffi.typeof("int[%d]" % i)
+        assert w3() is ffi.typeof("short *") is not None
+    assert ffi.type_cache_stats()['adhoc'] <= 4
+    #
+    assert ffi.set_type_cache_limit(0) == 4
+    assert ffi.typeof("long *") is ffi.typeof("long *")
+    assert ffi.type_cache_stats()['adhoc'] == 0
+    pytest.raises(ValueError, ffi.set_type_cache_limit, -1)
+
 def test_ffi_invalid():
     ffi = _cffi1_backend.FFI()
     # array of 10 times an "int[]" is invalid
@@ -429,6 +478,304 @@ def test_ffi_new_allocator_4():
     alloc5 = ffi.new_allocator(myalloc5)
     pytest.raises(MemoryError, alloc5, "int[5]")
 
+def test_ffi_new_handle_table():
+    ffi = _cffi1_backend.FFI()
+    table = ffi.new_handle_table()
+    assert len(table) == 0
+    o1 = [1, 2]
+    o2 = object()
+    h1 = table.new(o1)
+    h2 = table.new(o2)
+    h3 = table.new(o1)
+    assert ffi.typeof(h1) == ffi.typeof("void *")
+    assert h1 != ffi.NULL and h1 != h2 and h1 != h3
+    assert len(table) == 3
+    assert table.get(h1) is o1
+    assert table.get(h2) is o2
+    assert table.get(h3) is o1
+    assert table.get(int(ffi.cast("uintptr_t", h2))) is o2
+    assert table.get(ffi.cast("char *", h2)) is o2
+    #
+    assert table.release(h2) is o2
+    assert len(table) == 2
+    pytest.raises(KeyError, table.get, h2)
+    pytest.raises(KeyError, table.release, h2)
+    # the slot is reused, but the old handle stays invalid
+    h4 = table.new(o2)
+    assert h4 != h2
+    assert table.get(h4) is o2
+    pytest.raises(KeyError, table.get, h2)
+    #
+    pytest.raises(KeyError, table.get, ffi.NULL)
+    pytest.raises(KeyError, table.get, 0)
+    pytest.raises(KeyError, table.get, 12345678)
+    pytest.raises(KeyError, table.get, ffi.new("int *"))
+    pytest.raises(TypeError, table.get, ffi.cast("int", 1))
+    pytest.raises(TypeError, table.get, "foo")
+    #
+    handles = [table.new(i) for i in range(1000)]
+    assert len(table) == 1003
+    for i, h in enumerate(handles):
+        assert table.get(h) == i
+    for h in handles:
+        table.release(h)
+    assert len(table) == 3
+
+def test_ffi_new_handle_table_keepalive():
+    import gc, weakref
+    ffi = _cffi1_backend.FFI()
+    table = ffi.new_handle_table()
+    class X(object):
+        pass
+    x = X()
+    wr = weakref.ref(x)
+    h = table.new(x)
+    del x
+    gc.collect()
+    assert table.get(h) is wr()
+    table.release(h)
+    gc.collect()
+    assert wr() is None
+    # a cycle through the table is collected
+    x = X()
+    wr = weakref.ref(x)
+    x.table = table
+    x.h = table.new(x)
+    del x, table
+    gc.collect()
+    assert wr() is None
+
+def test_ffi_closure_stats():
+    ffi = _cffi1_backend.FFI()
+    stats = ffi.closure_stats()
+    assert sorted(stats) == ['chunks', 'free_slots', 'live_closures',
+                             'mapped_pages', 'page_size']
+    if sys.platform == 'darwin' or sys.platform.startswith('netbsd'):
+        pytest.skip("libffi's closure allocator is used")
+    live = stats['live_closures']
+    cbs = [ffi.callback("int(int)", lambda x: x + i) for i in range(5000)]
+    stats = ffi.closure_stats()
+    assert stats['live_closures'] == live + 5000
+    assert stats['mapped_pages'] >= 1 and stats['chunks'] >= 1
+    assert stats['page_size'] > 0
+    assert cbs[1234](10) == 10 + 4999
+    mapped = stats['mapped_pages']
+    del cbs
+    stats = ffi.closure_stats()
+    assert stats['live_closures'] == live
+    # most of the pages were given back, but not necessarily all
+    assert stats['mapped_pages'] < mapped
+    assert stats['free_slots'] > 0
+
+def test_ffi_callback_factory():
+    ffi = _cffi1_backend.FFI()
+    seen = []
+    factory = ffi.callback_factory("int(int)", error=-42, pool_size=2,
+                                   onerror=lambda *args: seen.append(args[0]))
+    assert factory.ctype is ffi.typeof("int(*)(int)")
+    assert factory.pooled == 0
+    cb1 = factory(lambda x: x + 1)
+    cb2 = factory(lambda x: 1 // 0)
+    assert ffi.typeof(cb1) is factory.ctype
+    assert repr(cb1).startswith("<cdata 'int(*)(int)' calling <function")
+    assert cb1(41) == 42
+    assert cb2(41) == -42
+    assert seen == [ZeroDivisionError]
+    cb3 = factory(lambda x: x * 3)
+    addresses = set([ffi.cast("intptr_t", cb) for cb in [cb1, cb2, cb3]])
+    del cb1, cb2, cb3
+    assert factory.pooled == 2       # the third closure was freed
+    cb4 = factory(lambda x: x - 1)
+    assert factory.pooled == 1
+    assert ffi.cast("intptr_t", cb4) in addresses
+    assert cb4(41) == 40
+    factory.trim()
+    assert factory.pooled == 0
+    assert cb4(5) == 4
+    del cb4
+    assert factory.pooled == 1
+    #
+    pytest.raises(TypeError, factory, 42)
+    pytest.raises(TypeError, ffi.callback_factory, "int")
+    pytest.raises(TypeError, ffi.callback_factory, "int(int)", onerror=42)
+    pytest.raises(ValueError, ffi.callback_factory, "int(int)",
+                  pool_size=-1)
+
+def test_ffi_gc_external_memory():
+    ffi = _cffi1_backend.FFI()
+    stats = ffi.external_memory_stats()
+    assert sorted(stats) == ['bytes', 'collections', 'threshold']
+    start = stats['bytes']
+    p = ffi.gc(ffi.new("int *"), lambda p: None, size=1000)
+    assert ffi.external_memory_stats()['bytes'] == start + 1000
+    q = ffi.gc(ffi.new("int *"), lambda p: None, size=500)
+    assert ffi.external_memory_stats()['bytes'] == start + 1500
+    del p
+    assert ffi.external_memory_stats()['bytes'] == start + 500
+    ffi.release(q)
+    assert ffi.external_memory_stats()['bytes'] == start
+    del q
+    assert ffi.external_memory_stats()['bytes'] == start
+    q = ffi.gc(ffi.new("int *"), lambda p: None, size=500)
+    ffi.gc(q, None)     # removing the destructor forgets the size too
+    assert ffi.external_memory_stats()['bytes'] == start
+    pytest.raises(ValueError, ffi.set_external_memory_threshold, -1)
+
+def test_ffi_gc_deferred():
+    ffi = _cffi1_backend.FFI()
+    ffi.drain_destructors()
+    seen = []
+    p1 = ffi.gc(ffi.new("int *", 1), lambda p: seen.append(p[0]),
+                deferred=True)
+    p2 = ffi.gc(ffi.new("int *", 2), lambda p: seen.append(p[0]),
+                deferred=True)
+    p3 = ffi.gc(ffi.new("int *", 3), lambda p: seen.append(p[0]))
+    del p2
+    del p1
+    del p3
+    assert seen == [3]         # only the non-deferred one was called
+    assert ffi.drain_destructors() == 2
+    assert seen == [3, 2, 1]   # in the order in which they died
+    assert ffi.drain_destructors() == 0
+    #
+    # ffi.release() calls the destructor immediately
+    p4 = ffi.gc(ffi.new("int *", 4), lambda p: seen.append(p[0]),
+                deferred=True)
+    ffi.release(p4)
+    assert seen == [3, 2, 1, 4]
+    del p4
+    assert ffi.drain_destructors() == 0
+    #
+    # a destructor that creates more deferred garbage
+    def destructor(p):
+        seen.append(p[0])
+        ffi.gc(ffi.new("int *", 6), lambda p: seen.append(p[0]),
+               deferred=True)
+    p5 = ffi.gc(ffi.new("int *", 5), destructor, deferred=True)
+    del p5
+    assert ffi.drain_destructors() == 1
+    assert seen == [3, 2, 1, 4, 5]
+    assert ffi.drain_destructors() == 1
+    assert seen == [3, 2, 1, 4, 5, 6]
+
+def test_ffi_gc_external_memory_collect():
+    if '__pypy__' in sys.builtin_module_names:
+        pytest.skip("CPython only")
+    ffi = _cffi1_backend.FFI()
+    class X(object):
+        pass
+    old_threshold = ffi.set_external_memory_threshold(10000)
+    try:
+        collections = ffi.external_memory_stats()['collections']
+        for i in range(100):
+            x = X()
+            x.cyclic = x
+            x.p = ffi.gc(ffi.new("int *"), lambda p: None, size=1000)
+            del x
+        for i in range(100):
+            pass     # give a chance to the pending collections to run
+        stats = ffi.external_memory_stats()
+        assert stats['collections'] > collections
+        assert stats['bytes'] < 100 * 1000
+    finally:
+        assert ffi.set_external_memory_threshold(old_threshold) == 10000
+
+def test_ffi_free_lists():
+    ffi = _cffi1_backend.FFI()
+    stats = ffi.free_list_stats()
+    assert sorted(stats) == ['cached', 'cached_bytes', 'hits', 'limit',
+                             'misses']
+    limit = stats['limit']
+    try:
+        ffi.trim_free_lists(limit=10)
+        assert ffi.free_list_stats()['cached'] == 0
+        p = ffi.new("int[5]")
+        p[2] = 42
+        del p
+        assert ffi.free_list_stats()['cached'] == 1
+        hits = ffi.free_list_stats()['hits']
+        p = ffi.new("int[5]")
+        assert list(p) == [0] * 5      # cleared again
+        assert ffi.free_list_stats()['hits'] == hits + 1
+        assert ffi.free_list_stats()['cached'] == 0
+        #
+        lst = [ffi.new("int[5]") for i in range(20)]
+        del lst
+        assert ffi.free_list_stats()['cached'] == 10
+        assert ffi.free_list_stats()['cached_bytes'] >= 10 * 20
+        assert ffi.trim_free_lists() == 10
+        assert ffi.free_list_stats()['cached'] == 0
+        #
+        ffi.trim_free_lists(limit=0)
+        p = ffi.new("int[5]")
+        del p
+        assert ffi.free_list_stats()['cached'] == 0
+        # large objects are never cached
+        ffi.trim_free_lists(limit=10)
+        p = ffi.new("char[1000]")
+        del p
+        assert ffi.free_list_stats()['cached'] == 0
+    finally:
+        ffi.trim_free_lists(limit=limit)
+
+def test_ffi_new_arena():
+    ffi = _cffi1_backend.FFI()
+    with ffi.new_arena(chunk_size=64) as arena:
+        assert not arena.released
+        p1 = arena.new("int[]", [1, 2, 3])
+        p2 = arena.new("long double *", 4.5)
+        p3 = arena.new("char[]", 1000)      # larger than a chunk
+        p4 = arena.new("int[4]")
+        assert ffi.typeof(p1) is ffi.typeof("int[]")
+        assert list(p1) == [1, 2, 3]
+        assert float(p2[0]) == 4.5
+        assert len(p3) == 1000 and p3[999] == b'\x00'
+        assert list(p4) == [0, 0, 0, 0]
+        for p in [p1, p2, p3, p4]:
+            align = ffi.alignof("long double")
+            assert int(ffi.cast("uintptr_t", p)) % align == 0
+        assert arena.allocated >= 12 + ffi.sizeof("long double") + 1000 + 16
+        ffi.release(p4)     # no effect
+    assert arena.released
+    e = pytest.raises(ValueError, arena.new, "int *")
+    assert str(e.value) == "cannot allocate from an arena that was released"
+    arena.release()     # no effect
+    pytest.raises(ValueError, ffi.new_arena, chunk_size=0)
+
+def test_ffi_new_arena_keepalive():
+    ffi = _cffi1_backend.FFI()
+    arena = ffi.new_arena()
+    p = arena.new("int[]", [42, 43])
+    del arena
+    import gc; gc.collect()
+    assert list(p) == [42, 43]      # the arena is kept alive by 'p'
+
+def test_ffi_new_arena_debug():
+    import gc, warnings
+    ffi = _cffi1_backend.FFI()
+    arena = ffi.new_arena(debug=True)
+    p = arena.new("unsigned char[]", 4)
+    arena.release()
+    assert list(p) == [0xDD] * 4
+    del arena, p
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always")
+        gc.collect()
+    assert w == []
+    #
+    arena = ffi.new_arena(debug=True)
+    p = arena.new("unsigned char[]", 4)
+    arena.release()
+    p[2] = 0    # use after release
+    del arena
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always")
+        del p
+        gc.collect()
+    assert len(w) == 1
+    assert w[0].category is RuntimeWarning
+    assert "modified after release()" in str(w[0].message)
+
 def test_bool_issue228():
     ffi = _cffi1_backend.FFI()
     fntype = ffi.typeof("int(*callback)(bool is_valid)")
@@ -529,6 +876,27 @@ def test_unpack():
     p = ffi.new("int[]", [-123456789])
     assert ffi.unpack(p, 1) == [-123456789]
 
+def test_unpack_as():
+    ffi = _cffi1_backend.FFI()
+    p = ffi.new("double[]", [1.5, -2.5, 3.0])
+    assert ffi.unpack(p, 3, as_="array").tolist() == [1.5, -2.5, 3.0]
+    m = ffi.unpack(p, 3, as_="memoryview")
+    assert m.format == 'd' and m.tolist() == [1.5, -2.5, 3.0]
+    assert ffi.unpack(p, 3, as_="bytes") == ffi.buffer(p)[:]
+    assert ffi.unpack(p, 3, as_=None) == [1.5, -2.5, 3.0]
+
+def test_memoryview():
+    ffi = _cffi1_backend.FFI()
+    p = ffi.new("int[4][8]")
+    p[3][7] = 42
+    m = ffi.memoryview(p)
+    assert m.format == 'i'
+    assert m.shape == (4, 8)
+    assert m[3, 7] == 42
+    m = ffi.memoryview(p[3], 2)
+    assert m.shape == (2,) and m.tolist() == [0, 0]
+    pytest.raises(TypeError, ffi.memoryview, ffi.cast("int", 42))
+
 def test_negative_array_size():
     ffi = _cffi1_backend.FFI()
     pytest.raises(ffi.error, ffi.cast, "int[-5]", 0)
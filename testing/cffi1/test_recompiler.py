@@ -307,6 +307,23 @@ def test_dir():
     lib.__dict__['ff'] = "??"
     assert lib.ff(10) == 15
 
+def test_lib_preload():
+    ffi = FFI()
+    ffi.cdef("int ff(int); extern int aa; static const int my_constant;")
+    lib = verify(ffi, 'test_lib_preload', """
+        #define my_constant  (-45)
+        int aa = 5;
+        int ff(int x) { return x+aa; }
+    """)
+    t = lib.__cffi_preload__()
+    assert isinstance(t, float) and t >= 0.0
+    ff = lib.ff
+    assert lib.__cffi_preload__() >= 0.0     # no-op the second time
+    assert lib.ff is ff
+    assert lib.ff(10) == 15
+    assert lib.my_constant == -45
+    assert dir(lib) == ['aa', 'ff', 'my_constant']
+
 def test_verify_opaque_struct():
     ffi = FFI()
     ffi.cdef("struct foo_s;")
@@ -903,6 +920,39 @@ def test_unpack_args():
     assert st1(e7.value) in ["foo2 expected 2 arguments, got 3",
                              "foo2() takes exactly 2 arguments (3 given)"]
 
+def test_unpack_args_fastcall():
+    # without Py_LIMITED_API, functions with several arguments use
+    # METH_FASTCALL on CPython; check that they behave the same
+    ffi = FFI()
+    ffi.cdef("int foo2(int, int); double foo3(int, double, char *);")
+    lib = verify(ffi, "test_unpack_args_fastcall", """
+    int foo2(int a, int b) { return a - b; }
+    double foo3(int a, double b, char *c) { return a + b + c[0]; }
+    """, define_macros=[('_CFFI_NO_LIMITED_API', None)])
+    assert lib.foo2(50, 8) == 42
+    assert lib.foo3(1, 0.5, ffi.new("char[]", b"\x02")) == 3.5
+    e1 = pytest.raises(TypeError, lib.foo2, 42)
+    e2 = pytest.raises(TypeError, lib.foo3, 1, 2, 3, 4)
+    pytest.raises(TypeError, lib.foo2, 1, "x")
+    assert str(e1.value).endswith("foo2 expected 2 arguments, got 1")
+    assert str(e2.value).endswith("foo3 expected 3 arguments, got 4")
+    assert ffi.addressof(lib, "foo2")(5, 3) == 2
+
+def test_cdef_release_gil_false():
+    ffi = FFI()
+    ffi.cdef("int has_gil_0(void); int has_gil_2(int, int);",
+             release_gil=False)
+    ffi.cdef("int has_gil_released(void);")
+    lib = verify(ffi, "test_cdef_release_gil_false", """
+    int has_gil_0(void) { return PyGILState_Check(); }
+    int has_gil_2(int a, int b) { return PyGILState_Check() + a + b; }
+    int has_gil_released(void) { return PyGILState_Check(); }
+    """, define_macros=[('_CFFI_NO_LIMITED_API', None)])
+    if '__pypy__' not in sys.builtin_module_names:
+        assert lib.has_gil_0() == 1
+        assert lib.has_gil_2(10, 20) == 31
+        assert lib.has_gil_released() == 0
+
 def test_address_of_function():
     ffi = FFI()
     ffi.cdef("long myfunc(long x);")
@@ -1036,6 +1086,40 @@ def test_call_with_incomplete_structs():
     assert lib.getx(lib.myglob) == 42.5
     assert lib.getx(lib.increment(lib.myglob)) == 43.5
 
+def test_call_with_buffer_argument():
+    import array
+    ffi = FFI()
+    ffi.cdef("double sum3(double *); int call_with(char *, int(*)(void));")
+    lib = verify(ffi, 'test_call_with_buffer_argument', """
+        double sum3(double *p) { p[1] = 0.5; return p[0] + p[2]; }
+        int call_with(char *p, int(*cb)(void)) { return cb() + p[4]; }
+    """)
+    a = array.array('d', [1.5, 2.5, 3.5])
+    assert lib.sum3(a) == 5.0
+    assert a.tolist() == [1.5, 0.5, 3.5]
+    with pytest.raises(TypeError):
+        lib.sum3(array.array('f', [1.5, 2.5, 3.5]))
+    #
+    # the buffer stays exported until the call returns
+    ba = bytearray(b"hello")
+    seen = []
+    @ffi.callback("int(*)(void)")
+    def cb():
+        try:
+            ba.extend(b"x" * 1000)
+        except BufferError as e:
+            seen.append(e)
+        return 0
+    assert lib.call_with(ba, cb) == ord("o")
+    assert len(seen) == 1
+    ba.extend(b"!")
+    assert ba == b"hello!"
+    # also released if a following argument is invalid
+    with pytest.raises(TypeError):
+        lib.call_with(ba, 42)
+    ba.extend(b"!")
+    assert ba == b"hello!!"
+
 def test_struct_array_guess_length_2():
     ffi = FFI()
     ffi.cdef("struct foo_s { int a[...][...]; };")
@@ -1823,6 +1907,59 @@ def test_extern_python_stdcall():
     assert lib.mycb1(200) == 242
     assert lib.indirect_call(300) == 342
 
+def test_extern_python_subinterpreters():
+    _testcapi = pytest.importorskip("_testcapi")
+    if not hasattr(_testcapi, 'run_in_subinterp'):
+        pytest.skip("no _testcapi.run_in_subinterp()")
+    import subprocess
+    ffi = FFI()
+    ffi.cdef("""
+        extern "Python" int bar(int);
+        int call_bar(int);
+    """)
+    verify(ffi, 'test_extern_python_subinterpreters', """
+        static int bar(int);
+        static int call_bar(int x) { return bar(x); }
+    """, no_cpp=True)
+    # Run in a new process, so that the first ffi.def_extern() is done
+    # by a subinterpreter.  The subinterpreters are created one after
+    # the other, so the second one is likely to get the same address as
+    # the first one; this must not make cffi_call_python() think that
+    # there is still only one interpreter using ffi.def_extern().
+    def_extern_in_subinterp = """if 1:
+        import sys; sys.path.insert(0, %r)
+        from _CFFI_test_extern_python_subinterpreters import ffi, lib
+        @ffi.def_extern()
+        def bar(x):
+            return x * 2
+    """ % (str(udir),)
+    f = open(str(udir.join('run_subinterp.py')), 'w')
+    f.write('import sys; sys.path = %r\n' % ([str(udir)] + sys.path,))
+    f.write('import _testcapi\n')
+    f.write('from _CFFI_test_extern_python_subinterpreters import ffi, lib\n')
+    f.write('code = %r\n' % (def_extern_in_subinterp,))
+    f.write('assert _testcapi.run_in_subinterp(code) == 0\n')
+    f.write('assert lib.call_bar(21) == 0\n')
+    f.write('assert _testcapi.run_in_subinterp(code) == 0\n')
+    f.write('assert lib.call_bar(21) == 0\n')
+    f.write('@ffi.def_extern()\n')
+    f.write('def bar(x):\n')
+    f.write('    return x + 1\n')
+    f.write('assert lib.call_bar(21) == 22\n')
+    f.write('assert lib.call_bar(41) == 42\n')
+    f.write('assert _testcapi.run_in_subinterp(code) == 0\n')
+    f.write('assert lib.call_bar(21) == 22\n')
+    f.write('print("ok")\n')
+    f.close()
+    popen = subprocess.Popen([sys.executable, 'run_subinterp.py'],
+                             cwd=str(udir), stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+    out, err = popen.communicate()
+    assert popen.returncode == 0, err
+    assert out == b"ok\n"
+    assert err.count(b"@ffi.def_extern() was not called in the current "
+                     b"subinterpreter") == 2
+
 def test_extern_python_plus_c():
     ffi = FFI()
     ffi.cdef("""
@@ -1974,6 +2111,29 @@ def test_introspect_order():
                                 ['CFFIa', 'CFFIcc', 'CFFIccc'],
                                 ['CFFIaa', 'CFFIaaa', 'CFFIg'])
 
+def test_preload_types():
+    SOURCE = """
+        typedef struct { int a; } foo_t;
+        struct bar_s { foo_t *p; long b; };
+        union baz_u { int x; char c; };
+        enum e1 { AA, BB };
+        typedef int (*fn_t)(struct bar_s *);
+        typedef int fnraw_t(int);
+    """
+    ffi = FFI()
+    ffi.cdef(SOURCE)
+    t = ffi.preload_types()      # on the pure Python FFI
+    assert isinstance(t, float) and t >= 0.0
+    verify(ffi, "test_preload_types", SOURCE)
+    t = ffi.preload_types()      # on the FFI of the compiled module
+    assert isinstance(t, float) and t >= 0.0
+    assert ffi.typeof("struct bar_s").fields[1][0] == 'b'
+    assert ffi.typeof("foo_t").fields[0][0] == 'a'
+    assert ffi.typeof("union baz_u").kind == 'union'
+    assert ffi.typeof("enum e1").elements == {0: 'AA', 1: 'BB'}
+    assert ffi.typeof("fn_t").kind == 'function'
+    pytest.raises(ffi.error, ffi.typeof, "fnraw_t")
+
 def test_bool_in_cpp():
     # this works when compiled as C, but in cffi < 1.7 it fails as C++
     ffi = FFI()